@@ -0,0 +1,26 @@
+# bench/_common.py
+"""Shared setup for the benchmark scripts: run them from the repo root as ``python bench/<name>.py``"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# config.py refuses to import without a bot token; benchmarks never reach Telegram
+os.environ.setdefault("BOT_TOKEN", "123456:bench-token")
+
+
+def timed(func, *args, repeat=3, **kwargs):
+    """Best wall time of ``repeat`` runs, in seconds, and the last result"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def table(headers, rows):
+    """Print rows as an aligned plain-text table"""
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    for row in [headers, ["-" * w for w in widths], *rows]:
+        print("  ".join(str(cell).rjust(w) for cell, w in zip(row, widths)))
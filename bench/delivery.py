@@ -0,0 +1,158 @@
+# bench/delivery.py
+"""Telegram API calls and result latency per /by request, against a fake transport.
+
+Every call to the fake Bot API takes ``--rtt`` seconds and is counted by
+method; editing a deleted message fails as it does on Telegram. Requests
+wait ``--upstream`` seconds for the bypass bot, then their result is shown
+in one of three ways:
+
+- before: the old flow. It sends a chat action and a status reply,
+  animates the status message, edits it to "Bypass Complete", sleeps one
+  second, deletes it and sends the result.
+- EDIT_RESULTS=false: the status reply and animation are kept, and the
+  result goes out as a new message.
+- EDIT_RESULTS=true: the status message is edited into the result.
+
+    python bench/delivery.py [--requests 20] [--upstream 3] [--rtt 0.05]
+"""
+import io
+import time
+import asyncio
+import argparse
+import contextlib
+from collections import Counter
+from types import SimpleNamespace
+import _common
+from _common import table
+
+from plugins import bypass_handler
+
+METHODS = ["send_chat_action", "send_message", "edit_message_text", "delete_messages"]
+
+
+class FakeTelegram:
+    """Bot API stand-in: counts calls and answers each after one round trip"""
+
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.calls = Counter()
+        self.deleted = set()
+        self._next_id = 0
+
+    async def _call(self, method):
+        self.calls[method] += 1
+        await asyncio.sleep(self.rtt)
+
+    async def send_chat_action(self, chat_id, action):
+        await self._call("send_chat_action")
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._call("send_message")
+        self._next_id += 1
+        return FakeMessage(self, chat_id, self._next_id)
+
+    async def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        await self._call("edit_message_text")
+        if message_id in self.deleted:
+            raise RuntimeError("MESSAGE_ID_INVALID")
+
+    async def delete_messages(self, chat_id, message_ids):
+        await self._call("delete_messages")
+        self.deleted.add(message_ids)
+
+
+class FakeMessage:
+    def __init__(self, transport, chat_id, message_id):
+        self.transport = transport
+        self.chat = SimpleNamespace(id=chat_id)
+        self.id = message_id
+
+    async def reply(self, text, **kwargs):
+        return await self.transport.send_message(self.chat.id, text)
+
+    async def reply_chat_action(self, action):
+        await self.transport.send_chat_action(self.chat.id, action)
+
+    async def edit_text(self, text, **kwargs):
+        await self.transport.edit_message_text(self.chat.id, self.id, text)
+
+    async def delete(self):
+        await self.transport.delete_messages(self.chat.id, self.id)
+
+
+RESULT_TEXT = "✨ **Bypass Successful!** ✨\n\n**🚀 Bypassed Link:** [Bypassed Link](https://example.com/file)"
+
+
+async def old_request(transport, user_message, upstream):
+    # The handle_by and handle_bypass_response steps before the status message was reused
+    await user_message.reply_chat_action("typing")
+    status = await user_message.reply("🚀 Initiating bypass process...")
+    asyncio.create_task(bypass_handler.animate_processing_message(status, 20))
+    await asyncio.sleep(upstream)
+    replied = time.perf_counter()
+    await status.edit_text("✅ **Bypass Complete!** Sending results...")
+    await asyncio.sleep(1)
+    await status.delete()
+    await transport.send_message(user_message.chat.id, RESULT_TEXT)
+    return time.perf_counter() - replied
+
+
+async def new_request(transport, user_message, upstream):
+    status = await user_message.reply("🚀 Initiating bypass process...")
+    if not bypass_handler.EDIT_RESULTS:
+        asyncio.create_task(bypass_handler.animate_processing_message(status, 20))
+    await asyncio.sleep(upstream)
+    replied = time.perf_counter()
+    await bypass_handler.show_result({
+        "status_chat_id": status.chat.id,
+        "status_msg_id": status.id,
+        "group_id": user_message.chat.id,
+        "original_msg_id": user_message.id,
+    }, RESULT_TEXT)
+    return time.perf_counter() - replied
+
+
+async def run_mode(request, requests, upstream, rtt):
+    transport = FakeTelegram(rtt)
+    bypass_handler.bot_instance = transport
+    messages = [FakeMessage(transport, -100 - n, 1) for n in range(requests)]
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(request(transport, message, upstream) for message in messages))
+    total = time.perf_counter() - started
+    # Let the animations run into the deleted or finished message and stop
+    while len(asyncio.all_tasks()) > 1:
+        await asyncio.sleep(0.1)
+    return transport.calls, sum(latencies) / len(latencies), total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--upstream", type=float, default=3, help="seconds until the bypass bot replies")
+    parser.add_argument("--rtt", type=float, default=0.05, help="seconds per Bot API call")
+    args = parser.parse_args()
+
+    rows = []
+    for name, request, edit_results in (
+        ("before", old_request, False),
+        ("EDIT_RESULTS=false", new_request, False),
+        ("EDIT_RESULTS=true", new_request, True),
+    ):
+        bypass_handler.EDIT_RESULTS = edit_results
+        # The handlers log every call; keep the table readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            calls, latency, total = asyncio.run(run_mode(request, args.requests, args.upstream, args.rtt))
+        per_request = {method: calls[method] / args.requests for method in METHODS}
+        rows.append([
+            name, *(f"{per_request[method]:g}" for method in METHODS),
+            f"{sum(per_request.values()):g}", f"{latency * 1000:.0f}", f"{total:.2f}",
+        ])
+
+    print(f"{args.requests} requests side by side, bypass bot replies after {args.upstream:g}s, "
+          f"{args.rtt * 1000:g}ms per API call")
+    table(["mode", "chat action", "send", "edit", "delete", "calls/request",
+           "reply to result (ms)", "wall (s)"], rows)
+
+
+if __name__ == "__main__":
+    main()
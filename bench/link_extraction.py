@@ -0,0 +1,142 @@
+# bench/link_extraction.py
+"""Link extraction from Telegram entities against the regex scans it replaced.
+
+Builds /by messages and upstream bot replies the way Telegram delivers them,
+text plus URL and TEXT_LINK entities (some messages hide a link behind
+"here"), and extracts their links three ways: the old str.replace and regex
+passes, the compiled regex fallback without entities, and the entity path.
+The last row of each kind adds the url_key dedupe and matching that the bot
+runs on the extracted links.
+
+    python bench/link_extraction.py [--messages 10000] [--links 5]
+"""
+import re
+import random
+import argparse
+import _common
+from _common import timed, table
+
+from pyrogram.types import MessageEntity
+from pyrogram.enums import MessageEntityType
+from plugins.bypass_handler import raw_links, extract_multiple_links, links_in_text
+
+HOSTS = ["gplinks.co", "bit.ly", "mega.nz", "linkvertise.com", "pixeldrain.com"]
+
+
+def old_extract_multiple_links(text):
+    # The extraction handle_by ran before entities were used
+    text = text.replace("/by", "").replace("!by", "").strip()
+    text = re.sub(r'^/by\s*|^!by\s*', '', text, flags=re.IGNORECASE).strip()
+    urls = re.findall(r'https?://[^\s,\n]+', text)
+    cleaned_urls = []
+    for url in urls:
+        url = re.sub(r'[,\.\)]+$', '', url)
+        if url:
+            cleaned_urls.append(url)
+    return cleaned_urls
+
+
+def old_reply_links(text):
+    # The scan handle_bypass_response ran over every upstream reply
+    links = []
+    for url in re.findall(r'https?://[^\s\)]+', text):
+        url = re.sub(r'[,\.\)]+$', '', url)
+        if url:
+            links.append(url)
+    return links
+
+
+def utf16_len(text):
+    return len(text.encode("utf-16-le")) // 2
+
+
+class Builder:
+    """Accumulates text and the entities Telegram would attach to it"""
+
+    def __init__(self):
+        self.parts = []
+        self.offset = 0
+        self.entities = []
+
+    def add(self, text, url=None, hidden=False):
+        if url is not None:
+            kind = MessageEntityType.TEXT_LINK if hidden else MessageEntityType.URL
+            self.entities.append(MessageEntity(
+                type=kind, offset=self.offset, length=utf16_len(text), url=url if hidden else None
+            ))
+        self.parts.append(text)
+        self.offset += utf16_len(text)
+
+    def build(self):
+        return "".join(self.parts), self.entities
+
+
+def link(rng):
+    return f"https://{rng.choice(HOSTS)}/{rng.choice(['file', 'go', 's'])}/{rng.randrange(1 << 32):08x}"
+
+
+def by_message(rng, links):
+    builder = Builder()
+    builder.add("/by 🎬 Episode links, ")
+    for _ in range(links):
+        url = link(rng)
+        if rng.random() < 0.1:
+            builder.add("here", url, hidden=True)
+        else:
+            builder.add(url, url)
+        builder.add(rng.choice([", ", "\n", " "]))
+    return builder.build()
+
+
+def reply_message(rng, links):
+    builder = Builder()
+    builder.add("✅ Bypassed Successfully\n\n")
+    for _ in range(links):
+        original = link(rng)
+        builder.add("🔗 Original Link:- ")
+        builder.add(original, original)
+        builder.add("\n📥 Bypassed Link:- ")
+        destination = link(rng)
+        builder.add(destination, destination)
+        builder.add("\n\n")
+    builder.add("⚡ Powered by @DD_Bypass_Bot")
+    return builder.build()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--links", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    requests = [by_message(rng, args.links) for _ in range(args.messages)]
+    replies = [reply_message(rng, args.links) for _ in range(args.messages)]
+
+    def per_message(func, messages):
+        elapsed, found = timed(lambda: sum(len(func(text, entities)) for text, entities in messages))
+        return f"{elapsed / len(messages) * 1e6:.2f}", found
+
+    rows = []
+    for name, func in (
+        ("/by: old replace + regex passes", lambda text, entities: old_extract_multiple_links(text)),
+        ("/by: compiled regex, no entities", lambda text, entities: raw_links(text)),
+        ("/by: entities", raw_links),
+        ("/by: entities + dedupe", extract_multiple_links),
+    ):
+        rows.append([name, *per_message(func, requests)])
+    for name, func in (
+        ("reply: old regex scan", lambda text, entities: old_reply_links(text)),
+        ("reply: compiled regex, no entities", lambda text, entities: raw_links(text)),
+        ("reply: entities", raw_links),
+        ("reply: entities + url_key set", links_in_text),
+    ):
+        rows.append([name, *per_message(func, replies)])
+
+    print(f"{args.messages} messages of each kind, {args.links} links per message, "
+          f"{args.messages * args.links} links sent per kind (about 10% of /by links hidden behind text)")
+    table(["extraction", "us/message", "links found"], rows)
+
+
+if __name__ == "__main__":
+    main()
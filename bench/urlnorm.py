@@ -0,0 +1,140 @@
+# bench/urlnorm.py
+"""URL canonicalization over a large synthetic link corpus.
+
+The corpus mixes the spellings users paste for the same link: case changes,
+tracking parameters, needless percent-escapes, default ports, fragments,
+markdown wrappers and trailing punctuation. The script times canonicalize()
+with a cold and a warm cache, url_key() and per-message dedupe(). It then
+matches upstream replies to pending requests two ways: the old substring scan
+over every pending request, and a url_key index.
+
+    python bench/urlnorm.py [--links 50000] [--pending 2000]
+"""
+import random
+import argparse
+import _common
+from _common import timed, table
+
+from plugins.urlnorm import canonicalize, url_key, dedupe, find_urls
+
+HOSTS = ["gplinks.co", "bit.ly", "mega.nz", "linkvertise.com", "pixeldrain.com", "shrinkme.io", "bücher.example"]
+TRACKING = ["utm_source=tg", "fbclid=IwAR0abc", "utm_medium=social&utm_campaign=x"]
+
+
+def base_links(count, rng):
+    links = []
+    for n in range(count):
+        host = rng.choice(HOSTS)
+        path = f"/{rng.choice(['file', 'go', 'u', 'api'])}/{n:x}{rng.randrange(1 << 20):05x}"
+        query = f"?id={n}" if rng.random() < 0.3 else ""
+        links.append(f"https://{host}{path}{query}")
+    return links
+
+
+def spelling(link, rng):
+    """One of the ways a user pastes the same link"""
+    variant = rng.randrange(8)
+    if variant == 1:
+        _, rest = link.split("://", 1)
+        host, _, tail = rest.partition("/")
+        return f"HTTPS://{host.upper()}/{tail}"
+    if variant == 2:
+        return link + ("&" if "?" in link else "?") + rng.choice(TRACKING)
+    if variant == 3:
+        # Needlessly escape the first character of the last path segment
+        cut = link.rindex("/") + 1
+        return f"{link[:cut]}%{ord(link[cut]):02X}{link[cut + 1:]}"
+    if variant == 4:
+        host_end = link.index("/", 8)
+        return link[:host_end] + ":443" + link[host_end:]
+    if variant == 5:
+        return link + "#section"
+    if variant == 6:
+        return f"[link]({link})"
+    if variant == 7:
+        return link + rng.choice([".", ",", ")", "!", "*"])
+    return link
+
+
+def corpus(links, rng):
+    base = base_links(max(1, links // 4), rng)
+    return base, [spelling(rng.choice(base), rng) for _ in range(links)]
+
+
+def message(base, rng):
+    """A /by message with five links, each pasted twice in different spellings"""
+    links = [spelling(link, rng) for link in rng.sample(base, 5) for _ in range(2)]
+    rng.shuffle(links)
+    return "/by " + " ".join(links)
+
+
+def canonicalize_all(urls, cold):
+    if cold:
+        canonicalize.cache_clear()
+    for url in urls:
+        canonicalize(url)
+
+
+def dedupe_messages(messages):
+    return sum(len(dedupe(find_urls(text))) for text in messages)
+
+
+def substring_match(replies, pending):
+    # The old handle_bypass_response: scan every pending request for each reply
+    matched = 0
+    for reply in replies:
+        for link in pending:
+            if link in reply:
+                matched += 1
+                break
+    return matched
+
+
+def indexed_match(replies, index):
+    matched = 0
+    for reply in replies:
+        if any(url_key(url) in index for url in find_urls(reply)):
+            matched += 1
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--links", type=int, default=50000)
+    parser.add_argument("--pending", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    base, urls = corpus(args.links, rng)
+    messages = [message(base, rng) for _ in range(args.links // 10)]
+    # A hot working set that fits the canonicalize cache, as in a busy chat
+    hot = [rng.choice(urls[:4096]) for _ in range(len(urls))]
+
+    rows = []
+    cold, _ = timed(canonicalize_all, urls, True)
+    rows.append(["canonicalize, cold cache", f"{cold / len(urls) * 1e6:.2f}"])
+    canonicalize_all(hot, True)
+    warm, _ = timed(canonicalize_all, hot, False)
+    rows.append(["canonicalize, warm cache", f"{warm / len(hot) * 1e6:.2f}"])
+    keyed, _ = timed(lambda: [url_key(url) for url in urls])
+    rows.append(["url_key", f"{keyed / len(urls) * 1e6:.2f}"])
+    deduped, kept = timed(dedupe_messages, messages)
+    rows.append(["dedupe, per 10-link message", f"{deduped / len(messages) * 1e6:.2f}"])
+
+    pending = rng.sample(urls, min(args.pending, len(urls)))
+    index = {url_key(url) for url in pending}
+    replies = [f"Original Link:- {url}\nBypassed Link:- https://dest.example/x" for url in rng.sample(urls, 2000)]
+    scanned, by_substring = timed(substring_match, replies, pending)
+    rows.append([f"match reply, substring over {len(pending)} pending", f"{scanned / len(replies) * 1e6:.2f}"])
+    looked_up, by_key = timed(indexed_match, replies, index)
+    rows.append(["match reply, url_key index", f"{looked_up / len(replies) * 1e6:.2f}"])
+
+    print(f"{len(urls)} links: {len(set(urls))} distinct spellings, "
+          f"{len({url_key(url) for url in urls})} distinct links by url_key")
+    print(f"dedupe kept {kept} of {len(messages) * 10} links in {len(messages)} messages; "
+          f"replies matched: {by_substring} by substring, {by_key} by url_key")
+    table(["operation", "us"], rows)
+
+
+if __name__ == "__main__":
+    main()
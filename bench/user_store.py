@@ -0,0 +1,107 @@
+# bench/user_store.py
+"""User store engines compared: the JSON file against SQLite in WAL mode.
+
+Every engine starts from the same user_data.json-style snapshot, then runs
+the calls /by and the admin commands make: quota checks and increments,
+premium and ban lookups, new users and a full userbase page-through. The
+JSON engine rewrites its whole file on every write, as the bot always did.
+
+    python bench/user_store.py [--users 20000] [--ops 2000]
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import _common
+from _common import table
+
+from database.json_store import JSONStorage
+from database.sqlite_store import SQLiteStore
+from database.storage import CachedStorage
+
+DAY = "2026-01-01"
+
+
+def snapshot(users, seed=1):
+    rng = random.Random(seed)
+    ids = [str(1_000_000 + n) for n in range(users)]
+    premium = rng.sample(ids, users // 20)
+    return {
+        "total_users": ids,
+        "premium_users": premium,
+        "premium_expiry": {uid: time.time() + 30 * 86400 for uid in premium},
+        "banned_users": rng.sample(ids, users // 100),
+        "daily_usage": {uid: {DAY: rng.randint(1, 3)} for uid in rng.sample(ids, users // 10)},
+        "admin_id": 1,
+    }
+
+
+def engines(workdir, data):
+    json_path = os.path.join(workdir, "user_data.json")
+    with open(json_path, "w") as f:
+        json.dump(data, f)
+    yield "json", JSONStorage(json_path)
+    yield "sqlite", SQLiteStore(os.path.join(workdir, "users.sqlite3"))
+    yield "sqlite+cache", CachedStorage(SQLiteStore(os.path.join(workdir, "cached.sqlite3")))
+
+
+def per_op(func, ops):
+    started = time.perf_counter()
+    for n in range(ops):
+        func(n)
+    return (time.perf_counter() - started) / ops * 1e6
+
+
+def run_engine(store, data, ops, seed=2):
+    rng = random.Random(seed)
+    # Requests come from a few hundred active users, not the whole userbase
+    active = rng.sample(data["total_users"], min(500, len(data["total_users"])))
+    picks = [rng.choice(active) for _ in range(ops)]
+    timings = {}
+
+    started = time.perf_counter()
+    store.open()
+    if store.name != "json":
+        store.import_user_data(data)
+    timings["open+import (ms)"] = (time.perf_counter() - started) * 1000
+
+    timings["quota check (us)"] = per_op(lambda n: store.get_usage(picks[n], DAY), ops)
+    timings["premium+ban (us)"] = per_op(lambda n: (store.is_premium(picks[n]), store.is_banned(picks[n])), ops)
+    # Writes are fewer: each JSON write rewrites the whole file
+    writes = max(1, ops // 10)
+    timings["quota incr (us)"] = per_op(lambda n: store.incr_usage(picks[n], DAY), writes)
+    timings["new user (us)"] = per_op(lambda n: store.add_user(f"new-{n}"), writes)
+
+    started = time.perf_counter()
+    cursor, seen = None, 0
+    while True:
+        page, cursor = store.page_users(cursor, 500)
+        seen += len(page)
+        if cursor is None:
+            break
+    timings["page all users (ms)"] = (time.perf_counter() - started) * 1000
+    store.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+
+    data = snapshot(args.users)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, store in engines(workdir, data):
+            results[name] = run_engine(store, data, args.ops)
+
+    print(f"{args.users} users, {args.ops} reads and {max(1, args.ops // 10)} writes per operation")
+    metrics = list(next(iter(results.values())))
+    table(["operation", *results], [[metric, *(f"{results[name][metric]:.1f}" for name in results)] for metric in metrics])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# bench/workers.py
+"""Handler throughput against the Pyrogram worker count.
+
+Pyrogram runs ``workers`` tasks that each await one handler at a time. The
+simulated /by handler does a short blocking save (the old ``_save_data``)
+and then waits on the network; it runs either with the save on the event
+loop, as before, or on the bounded executor through ``run_blocking``.
+
+    python bench/workers.py [--updates 400] [--save-ms 5] [--network-ms 50]
+"""
+import asyncio
+import argparse
+import time
+import _common
+from _common import table
+
+from plugins.concurrency import run_blocking
+
+
+def blocking_save(seconds):
+    time.sleep(seconds)
+
+
+async def handler_inline(save, network):
+    blocking_save(save)
+    await asyncio.sleep(network)
+
+
+async def handler_offloaded(save, network):
+    await run_blocking(blocking_save, save)
+    await asyncio.sleep(network)
+
+
+async def dispatch(handler, workers, updates, save, network):
+    """Updates per second through ``workers`` Pyrogram-style worker tasks"""
+    queue = asyncio.Queue()
+    for _ in range(updates):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            await handler(save, network)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return updates / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=400)
+    parser.add_argument("--save-ms", type=float, default=5)
+    parser.add_argument("--network-ms", type=float, default=50)
+    parser.add_argument("--workers", default="1,2,4,8,16,32")
+    args = parser.parse_args()
+    save, network = args.save_ms / 1000, args.network_ms / 1000
+
+    rows = []
+    for workers in (int(n) for n in args.workers.split(",")):
+        inline = asyncio.run(dispatch(handler_inline, workers, args.updates, save, network))
+        offloaded = asyncio.run(dispatch(handler_offloaded, workers, args.updates, save, network))
+        rows.append([workers, f"{inline:.0f}", f"{offloaded:.0f}", f"{offloaded / inline:.2f}x"])
+
+    print(f"{args.updates} updates, {args.save_ms:g}ms blocking save + {args.network_ms:g}ms network each")
+    table(["workers", "save on loop (upd/s)", "run_blocking (upd/s)", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,13 @@
 # config.py
 import os
+import socket
+import hashlib
 import logging
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # Bot Configuration
@@ -37,7 +34,20 @@ CHANNEL_ID = int(os.environ.get("CHANNEL_ID", "-1002533804227"))
 BYPASS_API_ID = int(os.environ.get("BYPASS_API_ID", "2359907814"))
 BYPASS_API_HASH = os.environ.get("BYPASS_API_HASH", "db7e21e638bc2359907814f4ed8b48a8")
 BYPASS_SESSION_STRING = os.environ.get("BYPASS_SESSION_STRING")
-BYPASS_BOT_USERNAME = "DD_Bypass_Bot"
+# BYPASS_BOTS: comma-separated upstream bots as "username" or "username:parser"; the first is the primary.
+# Telegram usernames are case-insensitive, so they are kept lower-cased and compared that way
+BYPASS_BOTS = [
+    (username.lower(), parser)
+    for entry in os.environ.get("BYPASS_BOTS", "DD_Bypass_Bot").split(",") if entry.strip()
+    for username, parser in [(entry.strip().lstrip("@").split(":", 1) + ["dd"])[:2]]
+]
+BYPASS_BOT_USERNAME = BYPASS_BOTS[0][0]
+
+# Hedged Requests: resend to the next bot when no reply came within the domain's p90
+HEDGE_REQUESTS = os.environ.get("HEDGE_REQUESTS", "true").lower() == "true"
+HEDGE_BUDGET = float(os.environ.get("HEDGE_BUDGET", 0.1))  # extra sends allowed per primary send
+HEDGE_MIN_DELAY = float(os.environ.get("HEDGE_MIN_DELAY", 3))  # never hedge sooner than this
+HEDGE_DEFAULT_DELAY = float(os.environ.get("HEDGE_DEFAULT_DELAY", 15))  # until a domain has enough samples
 
 # Target Group Configuration
 TARGET_GROUP_ID = int(os.environ.get("TARGET_GROUP_ID", "-1002900244842"))
@@ -45,19 +55,116 @@ TARGET_GROUP_ID = int(os.environ.get("TARGET_GROUP_ID", "-1002900244842"))
 # Admin Configuration
 ADMIN_ID = int(os.environ.get("ADMIN_ID", "7901412493"))
 
+# Button Session Configuration
+SESSION_TTL = int(os.environ.get("SESSION_TTL", 3600))
+CALLBACK_SECRET = os.environ.get("CALLBACK_SECRET")
+
+# Concurrency Configuration
+BOT_WORKERS = int(os.environ.get("BOT_WORKERS", 8))  # Pyrogram update workers
+BLOCKING_WORKERS = int(os.environ.get("BLOCKING_WORKERS", 2))  # threads for file I/O and parsing
+BY_CONCURRENCY = int(os.environ.get("BY_CONCURRENCY", 32))  # /by handlers running at once
+ADMIN_CONCURRENCY = int(os.environ.get("ADMIN_CONCURRENCY", 2))  # admin commands running at once
+BROADCAST_CONCURRENCY = int(os.environ.get("BROADCAST_CONCURRENCY", 1))
+
+# Upstream Connection Configuration
+UPSTREAM_READY_TIMEOUT = float(os.environ.get("UPSTREAM_READY_TIMEOUT", 30))  # max wait for a reconnect
+UPSTREAM_MAX_WAITERS = int(os.environ.get("UPSTREAM_MAX_WAITERS", 100))  # requests allowed to wait
+RECONNECT_BASE_DELAY = float(os.environ.get("RECONNECT_BASE_DELAY", 1))
+RECONNECT_MAX_DELAY = float(os.environ.get("RECONNECT_MAX_DELAY", 60))
+WATCHDOG_INTERVAL = float(os.environ.get("WATCHDOG_INTERVAL", 30))  # seconds between health probes
+BACKFILL_LIMIT = int(os.environ.get("BACKFILL_LIMIT", 100))  # history messages scanned after a reconnect
+PENDING_MAX_AGE = int(os.environ.get("PENDING_MAX_AGE", 1800))  # give up on recovered requests older than this
+
+# Upstream Protection Configuration
+UPSTREAM_REPLY_TIMEOUT = float(os.environ.get("UPSTREAM_REPLY_TIMEOUT", 90))  # no reply by then counts as a failure
+BREAKER_FAILURE_RATE = float(os.environ.get("BREAKER_FAILURE_RATE", 0.5))  # failure share that opens the circuit
+BREAKER_MIN_CALLS = int(os.environ.get("BREAKER_MIN_CALLS", 10))  # outcomes needed before it can open
+BREAKER_WINDOW = float(os.environ.get("BREAKER_WINDOW", 120))  # seconds of outcomes considered
+BREAKER_OPEN_TIME = float(os.environ.get("BREAKER_OPEN_TIME", 30))  # first wait before probing, doubled per failed probe
+BREAKER_MAX_OPEN_TIME = float(os.environ.get("BREAKER_MAX_OPEN_TIME", 300))
+UPSTREAM_LIMIT_INITIAL = int(os.environ.get("UPSTREAM_LIMIT_INITIAL", 8))  # requests in flight to the bypass bot
+UPSTREAM_LIMIT_MIN = int(os.environ.get("UPSTREAM_LIMIT_MIN", 1))
+UPSTREAM_LIMIT_MAX = int(os.environ.get("UPSTREAM_LIMIT_MAX", 32))
+UPSTREAM_TARGET_LATENCY = float(os.environ.get("UPSTREAM_TARGET_LATENCY", 20))  # slower replies shrink the limit
+
+# Scaling Configuration
+# BOT_ROLE: "all" (single process), "frontend" (bot only) or "upstream" (user session only)
+BOT_ROLE = os.environ.get("BOT_ROLE", "all").lower()
+COORDINATION_URL = os.environ.get("COORDINATION_URL")  # e.g. redis://host:6379/0
+COORDINATION_NAMESPACE = os.environ.get("COORDINATION_NAMESPACE", "bypassbot")
+# Pending requests are tied to the worker that sent them, so the id has to survive restarts and
+# redeploys; container hostnames don't. An upstream worker owns one bypass session, so by
+# default the id is derived from that session.
+WORKER_ID = os.environ.get("WORKER_ID") or (
+    "session-" + hashlib.sha256(BYPASS_SESSION_STRING.encode()).hexdigest()[:12]
+    if BYPASS_SESSION_STRING else socket.gethostname()
+)
+WORKER_HEARTBEAT_TTL = int(os.environ.get("WORKER_HEARTBEAT_TTL", 60))  # a worker silent this long is presumed gone
+
+# Season Store Configuration
+SEASON_TTL = int(os.environ.get("SEASON_TTL", 7 * 24 * 3600))  # forget a chat's season after this much idle time
+SEASON_MAX_ENTRIES = int(os.environ.get("SEASON_MAX_ENTRIES", 10000))
+SEASON_SAVE_DELAY = float(os.environ.get("SEASON_SAVE_DELAY", 5))  # seconds to batch changes before writing
+
 # Directories
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# User Store Configuration
+# USER_STORE: "json" (data/user_data.json), "sqlite" (embedded database, WAL mode) or "mongo"
+USER_STORE = os.environ.get("USER_STORE", "json").lower()
+SQLITE_PATH = os.environ.get("SQLITE_PATH", os.path.join(DATA_DIR, "users.sqlite3"))
+STORE_CACHE_TTL = int(os.environ.get("STORE_CACHE_TTL", 300))  # write-through cache for sqlite/mongo
+STORE_CACHE_SIZE = int(os.environ.get("STORE_CACHE_SIZE", 50000))
+USER_PAGE_SIZE = int(os.environ.get("USER_PAGE_SIZE", 500))  # users read per batch by broadcasts
+
+# Metrics Configuration
+METRICS_FILE = os.path.join(DATA_DIR, "metrics.json")
+METRICS_FLUSH_INTERVAL = int(os.environ.get("METRICS_FLUSH_INTERVAL", 60))  # seconds between saves
+
+# Domain Table Configuration
+# JSON object of "host" or "host/path" -> {"type", "emoji", "policy"}, laid over the built-in table
+DOMAIN_TABLE_FILE = os.environ.get("DOMAIN_TABLE_FILE", os.path.join(DATA_DIR, "domains.json"))
+DOMAIN_RELOAD_INTERVAL = int(os.environ.get("DOMAIN_RELOAD_INTERVAL", 30))  # seconds between checks for edits
+
+# Native Resolver Configuration (plain redirect shorteners followed without the bypass bot)
+NATIVE_RESOLVER = os.environ.get("NATIVE_RESOLVER", "true").lower() == "true"
+RESOLVER_MAX_HOPS = int(os.environ.get("RESOLVER_MAX_HOPS", 5))
+RESOLVER_TIMEOUT = float(os.environ.get("RESOLVER_TIMEOUT", 8))  # seconds for a whole redirect chain
+RESOLVER_POOL_SIZE = int(os.environ.get("RESOLVER_POOL_SIZE", 100))  # pooled connections across hosts
+RESOLVER_PER_HOST = int(os.environ.get("RESOLVER_PER_HOST", 4))  # requests in flight per host
+RESOLVER_DNS_TTL = int(os.environ.get("RESOLVER_DNS_TTL", 300))  # seconds to cache DNS answers
+RESOLVE_CACHE_TTL = int(os.environ.get("RESOLVE_CACHE_TTL", 1800))  # seconds a resolved link is reused
+RESOLVE_CACHE_SIZE = int(os.environ.get("RESOLVE_CACHE_SIZE", 20000))
+
+# Negative Cache Configuration (links and domains the bypass bot recently failed on)
+NEGATIVE_TTL = int(os.environ.get("NEGATIVE_TTL", 300))  # first refusal; doubles per repeat failure
+NEGATIVE_MAX_TTL = int(os.environ.get("NEGATIVE_MAX_TTL", 6 * 3600))
+NEGATIVE_CACHE_SIZE = int(os.environ.get("NEGATIVE_CACHE_SIZE", 20000))
+DOMAIN_FAILURE_THRESHOLD = int(os.environ.get("DOMAIN_FAILURE_THRESHOLD", 3))  # failed links before a domain is refused
+UNSUPPORTED_DOMAINS_FILE = os.environ.get("UNSUPPORTED_DOMAINS_FILE", os.path.join(DATA_DIR, "unsupported_domains.txt"))
+BLOOM_ERROR_RATE = float(os.environ.get("BLOOM_ERROR_RATE", 0.0001))
+
+# Progressive Delivery Configuration (multi-link results filled in as links resolve)
+PROGRESS_EDIT_INTERVAL = float(os.environ.get("PROGRESS_EDIT_INTERVAL", 2))  # min seconds between edits of one message
+PROGRESS_BATCH_WINDOW = float(os.environ.get("PROGRESS_BATCH_WINDOW", 0.3))  # wait to send links upstream together
+EDIT_RESULTS = os.environ.get("EDIT_RESULTS", "true").lower() == "true"  # turn the status message into the result; false sends a new message
+
+# Persistent Pyrogram sessions (auth + peer cache); in-memory when unset
+SESSION_DIR = os.environ.get("SESSION_DIR")
+
 # Check required environment variables
 if not BOT_TOKEN:
     raise ValueError("❌ BOT_TOKEN not found in environment variables.")
 
-if not BYPASS_SESSION_STRING:
-    print("⚠️ WARNING: BYPASS_SESSION_STRING not found. Bypass functionality will be limited.")
+def log_config_summary():
+    """Print the configuration banner; called once by the entry point, not on import"""
+    if not BYPASS_SESSION_STRING:
+        print("⚠️ WARNING: BYPASS_SESSION_STRING not found. Bypass functionality will be limited.")
+
+    print("✅ Configuration loaded successfully!")
+    print(f"📱 API_ID: {API_ID}")
+    print(f"🤖 Bot Token: {BOT_TOKEN[:20]}..." if BOT_TOKEN else "❌ Bot Token missing")
+    print(f"👑 Admin ID: {ADMIN_ID}")
+    print(f"📊 Target Group: {TARGET_GROUP_ID}")
 
-print("✅ Configuration loaded successfully!")
-print(f"📱 API_ID: {API_ID}")
-print(f"🤖 Bot Token: {BOT_TOKEN[:20]}..." if BOT_TOKEN else "❌ Bot Token missing")
-print(f"👑 Admin ID: {ADMIN_ID}")
-print(f"📊 Target Group: {TARGET_GROUP_ID}")
@@ -0,0 +1,38 @@
+"""Import data/user_data.json into the SQLite user store.
+
+Usage: python -m database.import_user_data [user_data.json] [users.sqlite3]
+
+Safe to run more than once: users, premiums and bans are upserted and
+daily counters keep the higher of the two values.
+"""
+import os
+import sys
+import time
+from config import DATA_DIR, SQLITE_PATH
+from plugins.atomic_file import load_json
+from database.sqlite_store import SQLiteStore
+
+
+def main(argv):
+    json_path = argv[1] if len(argv) > 1 else os.path.join(DATA_DIR, "user_data.json")
+    sqlite_path = argv[2] if len(argv) > 2 else SQLITE_PATH
+
+    data = load_json(json_path)
+    if data is None:
+        print(f"❌ {json_path} not found")
+        return 1
+
+    store = SQLiteStore(sqlite_path)
+    started = time.monotonic()
+    imported = store.import_user_data(data)
+    took = time.monotonic() - started
+    print(
+        f"✅ Imported {imported} users into {sqlite_path} in {took * 1000:.0f}ms "
+        f"({store.count_premium()} premium, {store.count_banned()} banned)"
+    )
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,237 @@
+import json
+import asyncio
+import threading
+import contextlib
+from plugins.atomic_file import write_atomic, load_json, quarantine
+from plugins.concurrency import run_blocking, running_in_loop
+from .storage import StorageBackend
+
+
+class JSONStorage(StorageBackend):
+    """The original data/user_data.json file as a storage engine.
+
+    Everything lives in memory in the file's own layout, with sets next to
+    the user, premium and ban lists for O(1) lookups. Saves are atomic and,
+    inside the bot, collapse into one background write of the newest state.
+    """
+
+    name = "json"
+
+    def __init__(self, path):
+        self.path = path
+        self.data = None
+        self._users = set()
+        self._premium = set()
+        self._banned = set()
+        self._pending_payload = None
+        self._writer = None
+        self._load_lock = threading.Lock()
+        self._batch_depth = 0
+        self._batch_dirty = False
+
+    def open(self):
+        with self._load_lock:
+            if self.data is None:
+                self._set_data(self._load())
+
+    def _set_data(self, data):
+        for key, default in (("total_users", []), ("banned_users", []), ("premium_users", []),
+                             ("premium_expiry", {}), ("daily_usage", {})):
+            data.setdefault(key, default)
+
+        # Older files could hold integer ids and users only seen in usage or premium
+        data["total_users"] = [str(u) for u in data["total_users"]]
+        data["premium_users"] = [str(u) for u in data["premium_users"]]
+        data["banned_users"] = [str(u) for u in data["banned_users"]]
+        known = set(data["total_users"])
+        for uid in list(data["premium_users"]) + list(data["daily_usage"]):
+            if uid not in known:
+                data["total_users"].append(uid)
+                known.add(uid)
+
+        self.data = data
+        self._users = known
+        self._premium = set(data["premium_users"])
+        self._banned = set(data["banned_users"])
+
+    def _load(self):
+        try:
+            data = load_json(self.path)
+        except ValueError as e:
+            # Never overwrite users, premiums and bans we failed to read
+            print(f"Error loading user data: {e}, creating default data")
+            quarantine(self.path)
+            data = None
+        return data if isinstance(data, dict) else {}
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Hold back saves until the outermost batch ends, then write the file once"""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth and self._batch_dirty:
+                self._batch_dirty = False
+                self._save()
+
+    def _save(self):
+        if self._batch_depth:
+            self._batch_dirty = True
+            return
+        try:
+            payload = json.dumps(self.data, indent=2)
+        except Exception as e:
+            print(f"Error saving user data: {e}")
+            return
+
+        if not running_in_loop():
+            self._write_file(payload)
+            return
+
+        # Inside the bot the write goes to the blocking executor. Saves that land
+        # while one is in flight collapse into a single write of the newest state.
+        self._pending_payload = payload
+        if self._writer is None:
+            self._writer = asyncio.ensure_future(self._write_pending())
+
+    async def _write_pending(self):
+        try:
+            while self._pending_payload is not None:
+                payload, self._pending_payload = self._pending_payload, None
+                await run_blocking(self._write_file, payload)
+        finally:
+            self._writer = None
+
+    def _write_file(self, payload):
+        try:
+            write_atomic(self.path, payload)
+        except Exception as e:
+            print(f"Error saving user data: {e}")
+
+    async def flush(self):
+        while self._writer is not None:
+            await self._writer
+
+    # --- Users ---
+    def add_user(self, user_id):
+        uid = str(user_id)
+        if uid in self._users:
+            return False
+        self._users.add(uid)
+        self.data["total_users"].append(uid)
+        self._save()
+        return True
+
+    def count_users(self):
+        return len(self._users)
+
+    def page_users(self, cursor=None, limit=500):
+        # The list only ever grows at the end, so an offset stays valid between pages
+        start = cursor or 0
+        page = self.data["total_users"][start:start + limit]
+        end = start + len(page)
+        return page, end if end < len(self.data["total_users"]) else None
+
+    # --- Premium tiers ---
+    def is_premium(self, user_id):
+        return str(user_id) in self._premium
+
+    def get_premium_expiry(self, user_id):
+        return self.data["premium_expiry"].get(str(user_id))
+
+    def set_premium_expiry(self, user_id, expires_at):
+        uid = str(user_id)
+        if uid not in self._premium:
+            self._premium.add(uid)
+            self.data["premium_users"].append(uid)
+        if expires_at is None:
+            # The file marks premium without an end date by leaving out the expiry
+            self.data["premium_expiry"].pop(uid, None)
+        else:
+            self.data["premium_expiry"][uid] = expires_at
+        self._save()
+
+    def remove_premium(self, user_id):
+        uid = str(user_id)
+        if uid not in self._premium:
+            return False
+        self._premium.discard(uid)
+        self.data["premium_users"].remove(uid)
+        self.data["premium_expiry"].pop(uid, None)
+        self._save()
+        return True
+
+    def count_premium(self):
+        return len(self._premium)
+
+    def expired_premium(self, now):
+        return [uid for uid, exp in self.data["premium_expiry"].items() if exp is not None and now > exp]
+
+    # --- Bans ---
+    def is_banned(self, user_id):
+        return str(user_id) in self._banned
+
+    def ban(self, user_id):
+        uid = str(user_id)
+        if uid in self._banned:
+            return False
+        self._banned.add(uid)
+        self.data["banned_users"].append(uid)
+        self._save()
+        return True
+
+    def unban(self, user_id):
+        uid = str(user_id)
+        if uid not in self._banned:
+            return False
+        self._banned.discard(uid)
+        self.data["banned_users"].remove(uid)
+        self._save()
+        return True
+
+    def count_banned(self):
+        return len(self._banned)
+
+    # --- Daily quotas ---
+    def get_usage(self, user_id, day):
+        return self.data["daily_usage"].get(str(user_id), {}).get(day, 0)
+
+    def incr_usage(self, user_id, day):
+        days = self.data["daily_usage"].setdefault(str(user_id), {})
+        days[day] = days.get(day, 0) + 1
+        self._save()
+        return days[day]
+
+    def set_usage(self, user_id, day, count):
+        self.data["daily_usage"].setdefault(str(user_id), {})[day] = count
+        self._save()
+
+    def prune_usage(self, before_day):
+        pruned = 0
+        for uid, days in self.data["daily_usage"].items():
+            old = [day for day in days if day < before_day]
+            for day in old:
+                del days[day]
+            pruned += len(old)
+        if pruned:
+            self._save()
+        return pruned
+
+    # --- Settings ---
+    def get_meta(self, key):
+        if key == "admin_id":
+            return self.data.get("admin_id")
+        return self.data.get("meta", {}).get(key)
+
+    def set_meta(self, key, value):
+        if key == "admin_id":
+            self.data["admin_id"] = value
+        else:
+            self.data.setdefault("meta", {})[key] = value
+        self._save()
+
+    def is_empty(self):
+        # The JSON file is the source every other engine imports from
+        return False
@@ -0,0 +1,130 @@
+from datetime import datetime
+from pymongo import ReturnDocument
+from .database import db
+from .storage import StorageBackend
+
+
+def _user_key(user_id):
+    # The existing users collection stores numeric ids
+    uid = str(user_id)
+    return int(uid) if uid.lstrip("-").isdigit() else uid
+
+
+class MongoStorage(StorageBackend):
+    """Users, tiers, bans and quotas in the shared MongoDB cluster.
+
+    Reuses the lazy MongoDatabase connection and its users collection, so
+    the userbase the bot manages and the one main.py used to read are the
+    same. Every call is a network round-trip: run it behind CachedStorage.
+    """
+
+    name = "mongo"
+
+    def __init__(self, database=db):
+        self.database = database
+
+    def _collection(self, name):
+        self.database._connect()
+        return self.database.db[name]
+
+    def open(self):
+        self.database.setup()
+        self._collection("premium").create_index("expires_at")
+        self._collection("usage").create_index([("user_id", 1), ("day", 1)], unique=True)
+        self._collection("usage").create_index("day")
+
+    # --- Users ---
+    def add_user(self, user_id):
+        result = self.database.users.update_one(
+            {"user_id": _user_key(user_id)},
+            {"$setOnInsert": {
+                "user_id": _user_key(user_id),
+                "join_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "is_premium": False,
+            }},
+            upsert=True
+        )
+        return result.upserted_id is not None
+
+    def count_users(self):
+        return self.database.users.estimated_document_count()
+
+    def page_users(self, cursor=None, limit=500):
+        # Keyset paging on the unique user_id index
+        query = {"user_id": {"$gt": cursor}} if cursor is not None else {}
+        docs = self.database.users.find(query, {"user_id": 1}).sort("user_id", 1).limit(limit)
+        page = [doc["user_id"] for doc in docs]
+        return [str(uid) for uid in page], page[-1] if len(page) == limit else None
+
+    # --- Premium tiers ---
+    def is_premium(self, user_id):
+        return self._collection("premium").count_documents({"_id": str(user_id)}, limit=1) > 0
+
+    def get_premium_expiry(self, user_id):
+        doc = self._collection("premium").find_one({"_id": str(user_id)})
+        return doc["expires_at"] if doc else None
+
+    def set_premium_expiry(self, user_id, expires_at):
+        self._collection("premium").update_one(
+            {"_id": str(user_id)}, {"$set": {"expires_at": expires_at}}, upsert=True
+        )
+
+    def remove_premium(self, user_id):
+        return self._collection("premium").delete_one({"_id": str(user_id)}).deleted_count > 0
+
+    def count_premium(self):
+        return self._collection("premium").estimated_document_count()
+
+    def expired_premium(self, now):
+        return [doc["_id"] for doc in self._collection("premium").find({"expires_at": {"$lt": now}}, {"_id": 1})]
+
+    # --- Bans ---
+    def is_banned(self, user_id):
+        return self._collection("bans").count_documents({"_id": str(user_id)}, limit=1) > 0
+
+    def ban(self, user_id):
+        result = self._collection("bans").update_one(
+            {"_id": str(user_id)}, {"$setOnInsert": {"banned_at": datetime.now()}}, upsert=True
+        )
+        return result.upserted_id is not None
+
+    def unban(self, user_id):
+        return self._collection("bans").delete_one({"_id": str(user_id)}).deleted_count > 0
+
+    def count_banned(self):
+        return self._collection("bans").estimated_document_count()
+
+    # --- Daily quotas ---
+    def get_usage(self, user_id, day):
+        doc = self._collection("usage").find_one({"user_id": str(user_id), "day": day})
+        return doc["count"] if doc else 0
+
+    def incr_usage(self, user_id, day):
+        doc = self._collection("usage").find_one_and_update(
+            {"user_id": str(user_id), "day": day},
+            {"$inc": {"count": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["count"]
+
+    def set_usage(self, user_id, day, count):
+        self._collection("usage").update_one(
+            {"user_id": str(user_id), "day": day}, {"$set": {"count": count}}, upsert=True
+        )
+
+    def prune_usage(self, before_day):
+        return self._collection("usage").delete_many({"day": {"$lt": before_day}}).deleted_count
+
+    # --- Settings ---
+    def get_meta(self, key):
+        doc = self._collection("meta").find_one({"_id": key})
+        return doc["value"] if doc else None
+
+    def set_meta(self, key, value):
+        self._collection("meta").update_one({"_id": key}, {"$set": {"value": value}}, upsert=True)
+
+    def close(self):
+        if self.database.client is not None:
+            self.database.client.close()
+            self.database.client = None
@@ -0,0 +1,250 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from .storage import StorageBackend
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    joined_at REAL NOT NULL DEFAULT (strftime('%s', 'now'))
+);
+CREATE TABLE IF NOT EXISTS premium (
+    user_id TEXT PRIMARY KEY,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS premium_expires_at ON premium (expires_at);
+CREATE TABLE IF NOT EXISTS bans (
+    user_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS daily_usage (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+CREATE INDEX IF NOT EXISTS daily_usage_day ON daily_usage (day);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Statements are module constants so sqlite3's per-connection cache
+# prepares each one once and reuses it for every call.
+ADD_USER = "INSERT OR IGNORE INTO users (user_id) VALUES (?)"
+COUNT_USERS = "SELECT COUNT(*) FROM users"
+PAGE_USERS = "SELECT user_id FROM users WHERE user_id > ? ORDER BY user_id LIMIT ?"
+IS_PREMIUM = "SELECT 1 FROM premium WHERE user_id = ?"
+GET_EXPIRY = "SELECT expires_at FROM premium WHERE user_id = ?"
+SET_EXPIRY = (
+    "INSERT INTO premium (user_id, expires_at) VALUES (?, ?) "
+    "ON CONFLICT (user_id) DO UPDATE SET expires_at = excluded.expires_at"
+)
+REMOVE_PREMIUM = "DELETE FROM premium WHERE user_id = ?"
+COUNT_PREMIUM = "SELECT COUNT(*) FROM premium"
+EXPIRED_PREMIUM = "SELECT user_id FROM premium WHERE expires_at < ?"
+IS_BANNED = "SELECT 1 FROM bans WHERE user_id = ?"
+BAN = "INSERT OR IGNORE INTO bans (user_id) VALUES (?)"
+UNBAN = "DELETE FROM bans WHERE user_id = ?"
+COUNT_BANNED = "SELECT COUNT(*) FROM bans"
+GET_USAGE = "SELECT count FROM daily_usage WHERE user_id = ? AND day = ?"
+SET_USAGE = (
+    "INSERT INTO daily_usage (user_id, day, count) VALUES (?, ?, ?) "
+    "ON CONFLICT (user_id, day) DO UPDATE SET count = excluded.count"
+)
+INCR_USAGE = (
+    "INSERT INTO daily_usage (user_id, day, count) VALUES (?, ?, 1) "
+    "ON CONFLICT (user_id, day) DO UPDATE SET count = count + 1"
+)
+PRUNE_USAGE = "DELETE FROM daily_usage WHERE day < ?"
+GET_META = "SELECT value FROM meta WHERE key = ?"
+SET_META = (
+    "INSERT INTO meta (key, value) VALUES (?, ?) "
+    "ON CONFLICT (key) DO UPDATE SET value = excluded.value"
+)
+
+# Files created before premium without expiry was allowed declare expires_at
+# NOT NULL; SQLite cannot drop a constraint in place, so the table is rebuilt.
+PREMIUM_NOT_NULL = "SELECT \"notnull\" FROM pragma_table_info('premium') WHERE name = 'expires_at'"
+REBUILD_PREMIUM = """
+BEGIN IMMEDIATE;
+ALTER TABLE premium RENAME TO premium_old;
+CREATE TABLE premium (
+    user_id TEXT PRIMARY KEY,
+    expires_at REAL
+);
+INSERT INTO premium (user_id, expires_at) SELECT user_id, expires_at FROM premium_old;
+DROP TABLE premium_old;
+CREATE INDEX IF NOT EXISTS premium_expires_at ON premium (expires_at);
+COMMIT;
+"""
+
+
+class SQLiteStore(StorageBackend):
+    """Users, premium tiers, bans and daily usage in one embedded SQLite file.
+
+    The database runs in WAL mode, so reads never wait for a write and a
+    commit is a single append to the log. Every write is its own transaction
+    unless it runs inside ``batch()``, which groups any number of writes into
+    one commit.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    # Autocommit mode: transactions are opened explicitly by batch()
+                    conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                    conn.executescript(SCHEMA)
+                    if conn.execute(PREMIUM_NOT_NULL).fetchone()[0]:
+                        conn.executescript(REBUILD_PREMIUM)
+                    self._conn = conn
+        return self._conn
+
+    def open(self):
+        self.conn
+
+    @contextmanager
+    def batch(self):
+        """Run the enclosed writes in a single transaction"""
+        with self._lock:
+            conn = self.conn
+            outermost = self._batch_depth == 0
+            if outermost:
+                conn.execute("BEGIN IMMEDIATE")
+            self._batch_depth += 1
+            try:
+                yield conn
+            except BaseException:
+                self._batch_depth -= 1
+                if outermost:
+                    conn.execute("ROLLBACK")
+                raise
+            self._batch_depth -= 1
+            if outermost:
+                conn.execute("COMMIT")
+
+    def _write(self, sql, params=()):
+        with self.batch() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def _scalar(self, sql, params=()):
+        with self._lock:
+            row = self.conn.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    # --- Users ---
+    def add_user(self, user_id):
+        return self._write(ADD_USER, (str(user_id),)) > 0
+
+    def count_users(self):
+        return self._scalar(COUNT_USERS)
+
+    def page_users(self, cursor=None, limit=500):
+        # Keyset paging on the primary key: every page is an index range scan
+        with self._lock:
+            page = [row[0] for row in self.conn.execute(PAGE_USERS, (cursor or "", limit))]
+        return page, page[-1] if len(page) == limit else None
+
+    # --- Premium ---
+    def is_premium(self, user_id):
+        # expires_at is NULL for premium without an end date
+        return self._scalar(IS_PREMIUM, (str(user_id),)) is not None
+
+    def get_premium_expiry(self, user_id):
+        return self._scalar(GET_EXPIRY, (str(user_id),))
+
+    def set_premium_expiry(self, user_id, expires_at):
+        self._write(SET_EXPIRY, (str(user_id), expires_at))
+
+    def remove_premium(self, user_id):
+        return self._write(REMOVE_PREMIUM, (str(user_id),)) > 0
+
+    def count_premium(self):
+        return self._scalar(COUNT_PREMIUM)
+
+    def expired_premium(self, now):
+        with self._lock:
+            return [row[0] for row in self.conn.execute(EXPIRED_PREMIUM, (now,))]
+
+    # --- Bans ---
+    def is_banned(self, user_id):
+        return self._scalar(IS_BANNED, (str(user_id),)) is not None
+
+    def ban(self, user_id):
+        return self._write(BAN, (str(user_id),)) > 0
+
+    def unban(self, user_id):
+        return self._write(UNBAN, (str(user_id),)) > 0
+
+    def count_banned(self):
+        return self._scalar(COUNT_BANNED)
+
+    # --- Daily usage ---
+    def get_usage(self, user_id, day):
+        return self._scalar(GET_USAGE, (str(user_id), day)) or 0
+
+    def incr_usage(self, user_id, day):
+        with self.batch() as conn:
+            conn.execute(INCR_USAGE, (str(user_id), day))
+            return conn.execute(GET_USAGE, (str(user_id), day)).fetchone()[0]
+
+    def set_usage(self, user_id, day, count):
+        self._write(SET_USAGE, (str(user_id), day, count))
+
+    def prune_usage(self, before_day):
+        return self._write(PRUNE_USAGE, (before_day,))
+
+    # --- Settings ---
+    def get_meta(self, key):
+        return self._scalar(GET_META, (key,))
+
+    def set_meta(self, key, value):
+        self._write(SET_META, (key, str(value)))
+
+    def import_user_data(self, data):
+        """Load the contents of a user_data.json file in one transaction; returns the users imported"""
+        users = {str(uid) for uid in data.get("total_users", [])}
+        users.update(str(uid) for uid in data.get("premium_users", []))
+        users.update(str(uid) for uid in data.get("daily_usage", {}))
+
+        expiry = data.get("premium_expiry", {})
+        usage = [
+            (str(uid), day, count)
+            for uid, days in data.get("daily_usage", {}).items()
+            for day, count in days.items()
+        ]
+
+        with self.batch() as conn:
+            conn.executemany(ADD_USER, [(uid,) for uid in users])
+            # Premium users without an expiry entry keep premium with no end date
+            conn.executemany(SET_EXPIRY, [
+                (str(uid), float(expiry[str(uid)]) if str(uid) in expiry else None)
+                for uid in data.get("premium_users", [])
+            ])
+            conn.executemany(BAN, [(str(uid),) for uid in data.get("banned_users", [])])
+            conn.executemany(
+                "INSERT INTO daily_usage (user_id, day, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id, day) DO UPDATE SET count = MAX(count, excluded.count)",
+                usage
+            )
+            if data.get("admin_id"):
+                conn.execute(SET_META, ("admin_id", str(data["admin_id"])))
+        return len(users)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,294 @@
+import json
+import contextlib
+from plugins.ttl_cache import TTLCache
+
+
+class StorageBackend:
+    """Interface every user store engine implements.
+
+    Covers users, premium tiers, bans, daily quotas, settings and broadcast
+    cursors. User ids are strings and days are "YYYY-MM-DD". Calls are
+    synchronous; engines are expected to answer them from memory or a local
+    database, or to sit behind CachedStorage.
+    """
+
+    name = "base"
+
+    def open(self):
+        """Load or connect; called once at startup from a worker thread"""
+
+    async def flush(self):
+        """Wait until every accepted write is durable"""
+
+    def close(self):
+        pass
+
+    def batch(self):
+        """Context manager grouping the enclosed writes into one transaction where supported"""
+        return contextlib.nullcontext()
+
+    # --- Users ---
+    def add_user(self, user_id):
+        """Record a user; True if they were new"""
+        raise NotImplementedError
+
+    def count_users(self):
+        raise NotImplementedError
+
+    def page_users(self, cursor=None, limit=500):
+        """Return (user_ids, next_cursor) in a stable order; next_cursor is None at the end"""
+        raise NotImplementedError
+
+    # --- Premium tiers ---
+    def is_premium(self, user_id):
+        raise NotImplementedError
+
+    def get_premium_expiry(self, user_id):
+        """Expiry timestamp of a premium user, None if not premium or without expiry"""
+        raise NotImplementedError
+
+    def set_premium_expiry(self, user_id, expires_at):
+        raise NotImplementedError
+
+    def remove_premium(self, user_id):
+        """Drop a user's premium; True if they had it"""
+        raise NotImplementedError
+
+    def count_premium(self):
+        raise NotImplementedError
+
+    def expired_premium(self, now):
+        """Users whose premium ended before now; premium without an expiry never ends"""
+        raise NotImplementedError
+
+    # --- Bans ---
+    def is_banned(self, user_id):
+        raise NotImplementedError
+
+    def ban(self, user_id):
+        raise NotImplementedError
+
+    def unban(self, user_id):
+        raise NotImplementedError
+
+    def count_banned(self):
+        raise NotImplementedError
+
+    # --- Daily quotas ---
+    def get_usage(self, user_id, day):
+        raise NotImplementedError
+
+    def incr_usage(self, user_id, day):
+        """Add one request to a user's counter for the day and return the new count"""
+        raise NotImplementedError
+
+    def set_usage(self, user_id, day, count):
+        raise NotImplementedError
+
+    def prune_usage(self, before_day):
+        raise NotImplementedError
+
+    # --- Settings and broadcast cursors ---
+    def get_meta(self, key):
+        raise NotImplementedError
+
+    def set_meta(self, key, value):
+        raise NotImplementedError
+
+    def get_cursor(self, name):
+        """Saved position of a paged job such as a broadcast, so a restart resumes it"""
+        raw = self.get_meta(f"cursor:{name}")
+        return json.loads(raw) if raw is not None else None
+
+    def set_cursor(self, name, cursor):
+        self.set_meta(f"cursor:{name}", json.dumps(cursor))
+
+    def is_empty(self):
+        return not self.count_users() and self.get_meta("admin_id") is None
+
+    def import_user_data(self, data):
+        """Load the contents of a user_data.json file; returns the users imported"""
+        users = dict.fromkeys(str(uid) for uid in data.get("total_users", []))
+        users.update(dict.fromkeys(str(uid) for uid in data.get("premium_users", [])))
+        users.update(dict.fromkeys(str(uid) for uid in data.get("daily_usage", {})))
+        expiry = data.get("premium_expiry", {})
+
+        with self.batch():
+            for uid in users:
+                self.add_user(uid)
+            for uid in data.get("premium_users", []):
+                # Premium users without an expiry entry keep premium with no end date
+                exp = expiry.get(str(uid))
+                self.set_premium_expiry(uid, float(exp) if exp is not None else None)
+            for uid in data.get("banned_users", []):
+                self.ban(uid)
+            for uid, days in data.get("daily_usage", {}).items():
+                for day, count in days.items():
+                    self.set_usage(uid, day, max(count, self.get_usage(uid, day)))
+            if data.get("admin_id"):
+                self.set_meta("admin_id", data["admin_id"])
+        return len(users)
+
+
+_MISSING = object()
+
+
+class CachedStorage(StorageBackend):
+    """Write-through cache in front of any engine.
+
+    Reads of premium, ban and quota state are answered from bounded TTL
+    caches; every write goes to the engine first and then updates the cache,
+    so the cache never holds a value the engine rejected. The TTL bounds how
+    stale an entry can get when other replicas write to the same engine.
+    """
+
+    def __init__(self, backend, ttl=300, max_size=50000):
+        self.backend = backend
+        self.name = f"cached-{backend.name}"
+        self._premium = TTLCache(ttl, max_size)
+        self._banned = TTLCache(ttl, max_size)
+        self._usage = TTLCache(ttl, max_size)
+        self._users = TTLCache(ttl, max_size)
+        # Totals are counted once, then kept up to date by the writes that change
+        # them; a recount after the TTL picks up writes made by other replicas
+        self._counts = TTLCache(ttl, 8)
+
+    def _cached(self, cache, key, load):
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = load()
+            cache.set(key, value)
+        return value
+
+    def open(self):
+        self.backend.open()
+
+    async def flush(self):
+        await self.backend.flush()
+
+    def close(self):
+        self.backend.close()
+
+    def batch(self):
+        return self.backend.batch()
+
+    def _count(self, name, load):
+        return self._cached(self._counts, name, load)
+
+    def _adjust(self, name, delta):
+        count = self._counts.get(name)
+        if count is not None:
+            self._counts.set(name, count + delta)
+
+    def add_user(self, user_id):
+        uid = str(user_id)
+        if self._users.get(uid):
+            return False
+        added = self.backend.add_user(uid)
+        self._users.set(uid, True)
+        if added:
+            self._adjust("users", 1)
+        return added
+
+    def count_users(self):
+        return self._count("users", self.backend.count_users)
+
+    def page_users(self, cursor=None, limit=500):
+        return self.backend.page_users(cursor, limit)
+
+    def _premium_state(self, user_id):
+        uid = str(user_id)
+        return self._cached(
+            self._premium, uid,
+            lambda: (self.backend.is_premium(uid), self.backend.get_premium_expiry(uid))
+        )
+
+    def is_premium(self, user_id):
+        return self._premium_state(user_id)[0]
+
+    def get_premium_expiry(self, user_id):
+        return self._premium_state(user_id)[1]
+
+    def set_premium_expiry(self, user_id, expires_at):
+        was_premium = self.is_premium(user_id)
+        self.backend.set_premium_expiry(user_id, expires_at)
+        self._premium.set(str(user_id), (True, expires_at))
+        if not was_premium:
+            self._adjust("premium", 1)
+
+    def remove_premium(self, user_id):
+        removed = self.backend.remove_premium(user_id)
+        self._premium.set(str(user_id), (False, None))
+        if removed:
+            self._adjust("premium", -1)
+        return removed
+
+    def count_premium(self):
+        return self._count("premium", self.backend.count_premium)
+
+    def expired_premium(self, now):
+        return self.backend.expired_premium(now)
+
+    def is_banned(self, user_id):
+        uid = str(user_id)
+        return self._cached(self._banned, uid, lambda: self.backend.is_banned(uid))
+
+    def ban(self, user_id):
+        changed = self.backend.ban(user_id)
+        self._banned.set(str(user_id), True)
+        if changed:
+            self._adjust("banned", 1)
+        return changed
+
+    def unban(self, user_id):
+        changed = self.backend.unban(user_id)
+        self._banned.set(str(user_id), False)
+        if changed:
+            self._adjust("banned", -1)
+        return changed
+
+    def count_banned(self):
+        return self._count("banned", self.backend.count_banned)
+
+    def get_usage(self, user_id, day):
+        key = (str(user_id), day)
+        return self._cached(self._usage, key, lambda: self.backend.get_usage(user_id, day))
+
+    def incr_usage(self, user_id, day):
+        count = self.backend.incr_usage(user_id, day)
+        self._usage.set((str(user_id), day), count)
+        return count
+
+    def set_usage(self, user_id, day, count):
+        self.backend.set_usage(user_id, day, count)
+        self._usage.set((str(user_id), day), count)
+
+    def prune_usage(self, before_day):
+        return self.backend.prune_usage(before_day)
+
+    def get_meta(self, key):
+        return self.backend.get_meta(key)
+
+    def set_meta(self, key, value):
+        self.backend.set_meta(key, value)
+
+    def import_user_data(self, data):
+        imported = self.backend.import_user_data(data)
+        self._counts = TTLCache(self._counts.ttl, 8)
+        return imported
+
+
+def create_storage(engine, **options):
+    """Build the engine named by USER_STORE; remote and on-disk engines get the write-through cache"""
+    if engine == "json":
+        from .json_store import JSONStorage
+        return JSONStorage(options["json_path"])
+    if engine == "sqlite":
+        from .sqlite_store import SQLiteStore
+        backend = SQLiteStore(options["sqlite_path"])
+    elif engine == "mongo":
+        from .mongo_store import MongoStorage
+        backend = MongoStorage()
+    else:
+        raise ValueError(f"Unknown USER_STORE engine: {engine}")
+    return CachedStorage(backend, options.get("cache_ttl", 300), options.get("cache_size", 50000))
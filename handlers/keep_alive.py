@@ -1,4 +1,6 @@
+import sys
 from aiohttp import web
+from config import BOT_ROLE, WORKER_ID
 
 class KeepAliveHandler:
     def __init__(self):
@@ -8,7 +10,36 @@ class KeepAliveHandler:
         """Handle incoming ping requests"""
         return web.Response(text="Bot is alive and running!", status=200)
 
+    async def handle_health(self, request):
+        """Report the upstream circuit breaker, concurrency limit and session reconnects as JSON"""
+        from plugins.breaker import upstream_breaker, upstream_limiter
+        from plugins.coordination import coordinator
+        
+        if BOT_ROLE in ("all", "upstream"):
+            breaker = upstream_breaker.snapshot()
+            limiter = upstream_limiter.snapshot()
+            # The port is bound before the plugins are imported; until then there is no session to report
+            handler = sys.modules.get("plugins.bypass_handler")
+            upstream = handler.upstream.stats() if handler else None
+        else:
+            # Frontends see the state the upstream workers last shared
+            breaker = await coordinator.cache_get("breaker")
+            limiter = None
+            upstream = await coordinator.cache_get("upstream")
+        
+        # Always 200: the process is fine even when the bypass bot is not, and a restart wouldn't help
+        status = "degraded" if breaker and breaker["state"] != "closed" else "ok"
+        return web.json_response({
+            "status": status,
+            "worker": WORKER_ID,
+            "role": BOT_ROLE,
+            "breaker": breaker,
+            "limiter": limiter,
+            "upstream": upstream,
+        })
+
     def setup_routes(self, app):
         """Setup routes for the keep alive handler"""
         app.router.add_get("/keep-alive", self.handle_ping)
-        app.router.add_get("/", self.handle_ping)  # Root path for basic health check
\ No newline at end of file
+        app.router.add_get("/health", self.handle_health)
+        app.router.add_get("/", self.handle_ping)  # Root path for basic health check
@@ -3,6 +3,7 @@ import os
 import asyncio
 import logging
 import sys
+import time
 from aiohttp import web
 from datetime import datetime
 import pyromod.listen
@@ -10,7 +11,6 @@ from pyrogram import Client
 from pyrogram.enums import ParseMode
 from pyrogram.types import BotCommand
 from config import *
-from database.database import full_userbase
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +25,28 @@ name ="""
  BYPASS BOT BY ATHITHAN
 """
 
+class StartupTimeline:
+    """Records when each startup phase began and how long it took"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.phases = []
+
+    async def run(self, name, coro):
+        began = time.monotonic()
+        try:
+            return await coro
+        finally:
+            self.record(name, began)
+
+    def record(self, name, began):
+        self.phases.append((name, began - self.started, time.monotonic() - began))
+
+    def log(self):
+        for name, offset, took in sorted(self.phases, key=lambda phase: phase[1]):
+            logger.info(f"Startup phase '{name}': began at +{offset:.2f}s, took {took:.2f}s")
+        logger.info(f"Startup complete in {time.monotonic() - self.started:.2f}s")
+
 class BypassBot(Client):
     def __init__(self):
         super().__init__(
@@ -33,18 +55,19 @@ class BypassBot(Client):
             api_hash=API_HASH,
             bot_token=BOT_TOKEN,
             plugins=dict(root="plugins"),
-            workers=4,
-            in_memory=True
+            workers=BOT_WORKERS,
+            workdir=SESSION_DIR or Client.WORKDIR,
+            in_memory=not SESSION_DIR
         )
         self.logger = logger
         self.ping_task = None
 
     async def broadcast_to_users(self, message):
         """Send a message to all users in the database."""
+        from plugins.user_manager import user_manager
         try:
-            users = await full_userbase()
             success_count = 0
-            for user_id in users:
+            async for user_id in user_manager.iter_users():
                 try:
                     await self.send_message(chat_id=user_id, text=message)
                     success_count += 1
@@ -56,36 +79,82 @@ class BypassBot(Client):
             logger.error(f"Broadcast failed: {e}")
             return 0
 
+    async def start_web_server(self):
+        app = web.Application()
+        keep_alive_handler = KeepAliveHandler()
+        keep_alive_handler.setup_routes(app)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "0.0.0.0", PORT).start()
+
+    async def login(self):
+        await super().start()
+        me = await self.get_me()
+        self.username = me.username
+        self.uptime = datetime.now()
+
+        # Set bot commands for menu
+        commands = [
+            BotCommand("start", "Start the bot 🚀"),
+            BotCommand("help", "Get help about using the bot ℹ️"),
+            BotCommand("by", "Bypass a shortened URL 🔄"),
+            BotCommand("stats", "Check your usage statistics 📊"),
+            BotCommand("ping", "Check if bot is alive 🏓"),
+            BotCommand("about", "About the bot ℹ️"),
+            BotCommand("broadcast", "Send message to all users (admin only) 📢"),
+            BotCommand("users", "Get user statistics (admin only) 👥"),
+            BotCommand("addpre", "for add pro users"),
+            BotCommand("removepre", "for remove pro users")
+        ]
+        await self.set_bot_commands(commands)
+        logger.info("Bot commands set in menu")
+
+    async def warm_database(self):
+        try:
+            from database.database import db
+            await db.warmup()
+        except Exception as e:
+            logger.error(f"MongoDB warmup failed: {e}")
+
     async def start(self):
+        timeline = StartupTimeline()
         try:
-            await super().start()
-            me = await self.get_me()
-            self.username = me.username
-            self.uptime = datetime.now()
-
-            # Set bot commands for menu
-            commands = [
-                BotCommand("start", "Start the bot 🚀"),
-                BotCommand("help", "Get help about using the bot ℹ️"),
-                BotCommand("by", "Bypass a shortened URL 🔄"),
-                BotCommand("stats", "Check your usage statistics 📊"),
-                BotCommand("ping", "Check if bot is alive 🏓"),
-                BotCommand("about", "About the bot ℹ️"),
-                BotCommand("broadcast", "Send message to all users (admin only) 📢"),
-                BotCommand("users", "Get user statistics (admin only) 👥"),
-                BotCommand("addpre", "for add pro users"),
-                BotCommand("removepre", "for remove pro users")
+            # Bind the port first so health checks pass while everything else warms up
+            await timeline.run("web server", self.start_web_server())
+
+            # Importing the plugins pulls in most of the bot, so it waits until the port is bound
+            began = time.monotonic()
+            from plugins.bypass_handler import connect_upstream, start_tasks, set_bot_instance
+            from plugins.user_manager import user_manager
+            from plugins.season_store import season_store
+            from plugins.metrics import metrics
+            from plugins.negative_cache import negative_cache
+            from plugins.concurrency import run_blocking
+            timeline.record("plugin imports", began)
+
+            phases = [
+                timeline.run("user data", run_blocking(user_manager.initialize)),
+                timeline.run("metrics", run_blocking(metrics.load)),
             ]
-            await self.set_bot_commands(commands)
-            logger.info("Bot commands set in menu")
+            if BOT_ROLE != "upstream":
+                # Upstream workers only hold the user session; frontends own the bot token
+                phases.append(timeline.run("bot login", self.login()))
+                phases.append(timeline.run("database", self.warm_database()))
+                phases.append(timeline.run("season store", run_blocking(season_store.load)))
+                phases.append(timeline.run("unsupported domains", run_blocking(negative_cache.load)))
+            if BOT_ROLE in ("all", "upstream"):
+                phases.append(timeline.run("upstream session", connect_upstream()))
+            await asyncio.gather(*phases)
 
-            # Start web server
-            app = web.Application()
-            keep_alive_handler = KeepAliveHandler()
-            keep_alive_handler.setup_routes(app)
-            runner = web.AppRunner(app)
-            await runner.setup()
-            await web.TCPSite(runner, "0.0.0.0", PORT).start()
+            # Start bypass dispatch/delivery for this worker's role
+            if BOT_ROLE != "upstream":
+                set_bot_instance(self)
+            await timeline.run("background tasks", start_tasks())
+            timeline.log()
+
+            if BOT_ROLE == "upstream":
+                logger.info(f"Upstream worker {WORKER_ID} started")
+                return
 
             # Send startup message to admin
             try:
@@ -112,7 +181,18 @@ class BypassBot(Client):
                 await self.ping_task
             except asyncio.CancelledError:
                 pass
-        await super().stop()
+        from plugins.user_manager import user_manager
+        from plugins.coordination import coordinator
+        from plugins.season_store import season_store
+        from plugins.metrics import metrics
+        from plugins.resolver import resolver
+        await user_manager.flush()
+        await season_store.flush()
+        await metrics.flush()
+        await coordinator.close()
+        await resolver.close()
+        if self.is_connected:
+            await super().stop()
         logger.info("Bot stopped.")
 
     def run(self):
@@ -128,6 +208,7 @@ class BypassBot(Client):
             loop.run_until_complete(self.stop())
 
 if __name__ == "__main__":
+    log_config_summary()
     try:
         BypassBot().run()
     except Exception as e:
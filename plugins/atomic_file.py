@@ -0,0 +1,112 @@
+# plugins/atomic_file.py
+import os
+import json
+import time
+import hashlib
+
+# Next to every file: "<name>.bak" holds the previous generation and
+# "<name>.sha256" the checksums of both generations.
+BACKUP_SUFFIX = ".bak"
+CHECKSUM_SUFFIX = ".sha256"
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _write_synced(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp
+
+def _read_checksums(path):
+    try:
+        with open(path + CHECKSUM_SUFFIX, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_atomic(path, payload):
+    """Replace a file so a crash leaves either the old or the new content, never a torn mix.
+
+    The new content is written to a temp file and fsynced, the checksum sidecar
+    is updated to cover both generations, the current file is rotated to the
+    backup and the temp file renamed into place.
+    """
+    data = payload.encode("utf-8") if isinstance(payload, str) else payload
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = _write_synced(path, data)
+
+    # After a crash between the two renames only the backup exists; it stays the previous generation
+    previous = None
+    current = path if os.path.exists(path) else path + BACKUP_SUFFIX
+    if os.path.exists(current):
+        with open(current, "rb") as f:
+            previous = _digest(f.read())
+
+    # The sidecar must vouch for the new file before it can appear under the real name
+    checksums = json.dumps({"current": _digest(data), "previous": previous}).encode("utf-8")
+    os.replace(_write_synced(path + CHECKSUM_SUFFIX, checksums), path + CHECKSUM_SUFFIX)
+
+    if current == path and previous is not None:
+        os.replace(path, path + BACKUP_SUFFIX)
+    os.replace(tmp, path)
+    _fsync_dir(path)
+
+def load_json(path):
+    """Load a file written by write_atomic, falling back to its backup when it is torn or corrupt.
+
+    Returns None when neither generation exists. Raises ValueError when files
+    exist but none of them is valid, so callers can keep them for inspection
+    instead of overwriting them with defaults.
+    """
+    checksums = _read_checksums(path)
+    known = {checksums.get("current"), checksums.get("previous")} - {None} if checksums else None
+
+    found = False
+    for candidate in (path, path + BACKUP_SUFFIX):
+        try:
+            with open(candidate, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            continue
+        found = True
+
+        # Files from before checksums existed are only checked for valid JSON
+        if known is not None and _digest(data) not in known:
+            print(f"[DEBUG] Checksum mismatch in {candidate}, skipping it")
+            continue
+        try:
+            value = json.loads(data)
+        except ValueError:
+            print(f"[DEBUG] {candidate} is not valid JSON, skipping it")
+            continue
+        if candidate != path:
+            print(f"[DEBUG] Recovered {path} from its backup")
+        return value
+
+    if found:
+        raise ValueError(f"No valid copy of {path}")
+    return None
+
+def quarantine(path):
+    """Move an unreadable file aside so it is kept for inspection, not overwritten"""
+    target = f"{path}.corrupt-{int(time.time())}"
+    try:
+        os.replace(path, target)
+        print(f"[DEBUG] Moved unreadable {path} to {target}")
+    except OSError:
+        pass
@@ -0,0 +1,161 @@
+# plugins/breaker.py
+import time
+import asyncio
+from collections import deque
+from config import (
+    BREAKER_FAILURE_RATE, BREAKER_MIN_CALLS, BREAKER_WINDOW, BREAKER_OPEN_TIME, BREAKER_MAX_OPEN_TIME,
+    UPSTREAM_LIMIT_INITIAL, UPSTREAM_LIMIT_MIN, UPSTREAM_LIMIT_MAX, UPSTREAM_TARGET_LATENCY
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stops sending to the bypass bot while it is failing.
+
+    Outcomes (a reply, or an error or timeout) are kept for ``window``
+    seconds. Once at least ``min_calls`` of them fail at ``failure_rate`` or
+    more the circuit opens and requests fail fast. After ``open_time`` it
+    goes half-open and lets ``probes`` requests through: a success closes
+    it, a failure opens it again for twice as long, up to ``max_open_time``.
+    """
+
+    def __init__(self, failure_rate=BREAKER_FAILURE_RATE, min_calls=BREAKER_MIN_CALLS, window=BREAKER_WINDOW,
+                 open_time=BREAKER_OPEN_TIME, max_open_time=BREAKER_MAX_OPEN_TIME, probes=1):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_time = open_time
+        self.max_open_time = max_open_time
+        self.probes = probes
+        self.state = CLOSED
+        self.trips = 0
+        self._outcomes = deque()  # (monotonic time, ok)
+        self._failures = 0
+        self._opened_at = None
+        self._open_for = open_time
+        self._probing = 0
+
+    def _trim(self, now):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            _, ok = self._outcomes.popleft()
+            self._failures -= not ok
+
+    def _open(self, now):
+        self.state = OPEN
+        self._opened_at = now
+        self.trips += 1
+        print(f"[DEBUG] Upstream circuit opened for {self._open_for:.0f}s")
+
+    def retry_after(self):
+        """Seconds until the next probe may go out; 0 unless the circuit is open"""
+        if self.state != OPEN:
+            return 0
+        return max(0, self._open_for - (time.monotonic() - self._opened_at))
+
+    def allow(self):
+        """Whether a request may go upstream now"""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return False
+            self.state = HALF_OPEN
+            self._probing = 0
+            print("[DEBUG] Upstream circuit half-open, probing")
+        if self.state == HALF_OPEN:
+            if self._probing >= self.probes:
+                return False
+            self._probing += 1
+        return True
+
+    def record(self, ok):
+        now = time.monotonic()
+        if self.state == OPEN:
+            # Stragglers sent before the circuit opened say nothing new
+            return
+        if self.state == HALF_OPEN:
+            if ok:
+                self.state = CLOSED
+                self._open_for = self.open_time
+                self._outcomes.clear()
+                self._failures = 0
+                print("[DEBUG] Upstream circuit closed")
+            else:
+                self._open_for = min(self.max_open_time, self._open_for * 2)
+                self._open(now)
+            return
+
+        self._outcomes.append((now, ok))
+        self._failures += not ok
+        self._trim(now)
+        calls = len(self._outcomes)
+        if calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+            self._open(now)
+
+    def snapshot(self):
+        self._trim(time.monotonic())
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "failure_rate": round(self._failures / calls, 3) if calls else 0.0,
+            "calls": calls,
+            "retry_after": round(self.retry_after(), 1),
+            "trips": self.trips,
+        }
+
+
+class AIMDLimiter:
+    """Adaptive cap on requests in flight to the bypass bot.
+
+    A reply within ``target_latency`` grows the limit by 1/limit (about one
+    slot per round of replies); a slow reply or a failure multiplies it by
+    ``backoff``, at most once per ``target_latency`` so one slow burst
+    doesn't collapse it to the minimum.
+    """
+
+    def __init__(self, initial=UPSTREAM_LIMIT_INITIAL, minimum=UPSTREAM_LIMIT_MIN, maximum=UPSTREAM_LIMIT_MAX,
+                 target_latency=UPSTREAM_TARGET_LATENCY, backoff=0.7):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.inflight = 0
+        self._last_decrease = 0
+        self._freed = None
+
+    def _event(self):
+        if self._freed is None:
+            self._freed = asyncio.Event()
+        return self._freed
+
+    def try_acquire(self):
+        if self.inflight >= int(self.limit):
+            return False
+        self.inflight += 1
+        return True
+
+    async def acquire(self):
+        """Wait for a free slot"""
+        while not self.try_acquire():
+            self._event().clear()
+            await self._event().wait()
+
+    def release(self, latency=None, ok=True):
+        self.inflight = max(0, self.inflight - 1)
+        now = time.monotonic()
+        if not ok or (latency is not None and latency > self.target_latency):
+            if now - self._last_decrease >= self.target_latency:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self._last_decrease = now
+        elif latency is not None:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self._event().set()
+
+    def snapshot(self):
+        return {"limit": int(self.limit), "inflight": self.inflight}
+
+
+upstream_breaker = CircuitBreaker()
+upstream_limiter = AIMDLimiter()
@@ -3,14 +3,29 @@
 import os
 import re
 import json
+import time
 import asyncio
 from collections import deque
 from datetime import datetime, timedelta
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
-from pyrogram.enums import ChatAction, ParseMode
+from pyrogram.enums import ParseMode, MessageEntityType
 from pyrogram.errors import PeerIdInvalid, ChatAdminRequired, UserNotParticipant, FloodWait, MessageDeleteForbidden, MessageNotModified
 from .user_manager import user_manager
+from .coordination import coordinator
+from .concurrency import concurrency_limit, run_blocking
+from .session_store import attach_file_storage, warm_peer
+from .connection import UpstreamConnection
+from .ttl_cache import TTLCache
+from .season_store import season_store, extract_season, extract_show
+from .metrics import metrics
+from .urlnorm import URL_PATTERN, clean_url, dedupe, find_urls, host_of, url_key
+from .domains import domain_classifier, TYPE_EMOJI
+from .resolver_chain import resolver_chain
+from .hedging import latency_tracker, hedge_budget, hedge_delay
+from .breaker import upstream_breaker, upstream_limiter, CLOSED, OPEN
+from .negative_cache import negative_cache
+from .callback_signer import sign_callback, parse_callback
 from config import *
 
 # Initialize user client (for bypass communication only)
@@ -108,31 +123,89 @@ def make_clickable_link(text, url):
     """Create a clickable markdown link - FIXED VERSION"""
     # Clean the text and URL
     safe_text = str(text).replace('[', '\\[').replace(']', '\\]').replace('(', '\\(').replace(')', '\\)')
-    clean_url = str(url).strip()
+    safe_url = str(url).strip()
     
     # Return markdown link format
-    return f"[{safe_text}]({clean_url})"
+    return f"[{safe_text}]({safe_url})"
 
-def extract_multiple_links(text):
-    """Extract multiple links from text - supports comma, space, and newline separation"""
-    # Remove command prefix
-    text = re.sub(r'^/by\s*|^!by\s*', '', text, flags=re.IGNORECASE).strip()
-    
-    # Find all URLs in the text
-    urls = re.findall(r'https?://[^\s,\n]+', text)
-    
-    # Clean URLs (remove trailing punctuation)
-    cleaned_urls = []
-    for url in urls:
-        url = re.sub(r'[,\.\)]+$', '', url)
-        if url:
-            cleaned_urls.append(url)
-    
-    return cleaned_urls
+LINK_ENTITY_TYPES = (MessageEntityType.URL, MessageEntityType.TEXT_LINK)
+
+def entity_links(text, entities):
+    """(visible text, url) for every URL and TEXT_LINK entity, in message order.
+    
+    Telegram has already parsed these, so no regex runs. Entity offsets and
+    lengths count UTF-16 code units, hence the slicing on the encoded text.
+    """
+    if not text or not entities:
+        return []
+    encoded = None
+    links = []
+    for entity in entities:
+        if entity.type not in LINK_ENTITY_TYPES:
+            continue
+        if encoded is None:
+            encoded = text.encode("utf-16-le")
+        visible = encoded[entity.offset * 2:(entity.offset + entity.length) * 2].decode("utf-16-le", "ignore")
+        links.append((visible, entity.url if entity.type == MessageEntityType.TEXT_LINK else visible))
+    return links
+
+def raw_links(text, entities=None):
+    """Link URLs from message entities, or from the compiled regex when there are none"""
+    links = entity_links(text, entities)
+    if links:
+        return [url for _, url in links]
+    return find_urls(text)
+
+def extract_multiple_links(text, entities=None):
+    """Extract multiple links from text - supports comma, space, and newline separation.
+    
+    Links come back deduplicated by their canonical key, so repeats of the same
+    link in one request are only bypassed once, but keep the sender's spelling.
+    Hidden text links count as well.
+    """
+    return dedupe(raw_links(text, entities))
+
+def links_in_text(text, entities=None):
+    """Keys of every link mentioned in an upstream reply, for O(1) request matching"""
+    keys = set()
+    for url in raw_links(text, entities):
+        key = url_key(url)
+        if key:
+            keys.add(key)
+    return keys
+
+def upstream_links(req):
+    """Links as sent to the bypass bot: the hop a resolver reached, else the user's link"""
+    return (req.get("upstream_link") or req["original_link"]).split()
+
+def upstream_fields(deferred):
+    """Job fields for (user link, link to send) pairs; results stay keyed on the user's links"""
+    return {
+        "original_link": " ".join(url for url, _ in deferred),
+        "upstream_link": " ".join(link for _, link in deferred),
+        "link_count": len(deferred),
+    }
+
+def restore_originals(req, pairs):
+    """Put the user's links back in place of the hops the bypass bot was sent"""
+    originals = {url_key(link): url for url, link in zip(req["original_link"].split(), upstream_links(req))}
+    return [(originals.get(url_key(link), link), final) for link, final in pairs]
+
+def mentions_request(link_keys, req):
+    # The bypass bot echoes what it was sent
+    return any(url_key(link) in link_keys for link in upstream_links(req))
+
+# Process start, for the time-to-first-response report
+started_at = time.monotonic()
+first_response_at = None
+session_storage_attached = False
 
 async def init_user_client():
-    global user_client
+    global user_client, session_storage_attached
     try:
+        if not session_storage_attached:
+            session_storage_attached = True
+            await attach_file_storage(user_client, BYPASS_SESSION_STRING)
         if user_client and getattr(user_client, "is_connected", False):
             await user_client.stop()
         await user_client.start()
@@ -142,34 +215,23 @@ async def init_user_client():
         print(f"[DEBUG] Failed to initialize user client: {e}")
         return False
 
-# --- Season Storage ---
-SEASON_STORE_FILE = os.path.join(DATA_DIR, "season_store.json")
-
-def load_season_store():
-    if os.path.exists(SEASON_STORE_FILE):
-        try:
-            with open(SEASON_STORE_FILE, "r") as f:
-                return json.load(f)
-        except:
-            pass
-    return {}
+# Every (re)connect of the user session goes through this manager
+upstream = UpstreamConnection(user_client, init_user_client)
 
-def save_season_store(store):
-    try:
-        with open(SEASON_STORE_FILE, "w") as f:
-            json.dump(store, f)
-    except Exception as e:
-        print(f"Error saving season store: {e}")
+# Upstream replies already handled, so a history back-fill never replays one
+handled_responses = TTLCache(ttl=24 * 3600, max_size=5000)
+# Requests that lost a hedge, so the slower bot's late reply is recognised and dropped
+hedge_losers = TTLCache(ttl=PENDING_MAX_AGE, max_size=5000)
+# Bots that failed on a hedged job while another copy was still out, by job id
+failed_bots = TTLCache(ttl=PENDING_MAX_AGE, max_size=5000)
 
-season_store = load_season_store()
-pending_bypass_requests = {}
 bot_instance = None
 
 def set_bot_instance(bot):
     global bot_instance
     bot_instance = bot
 
-def extract_links_from_text_and_buttons(text, reply_markup):
+def extract_links_from_text_and_buttons(text, reply_markup, entities=None):
     """Enhanced function to extract links from both text and inline buttons"""
     bypassed_links = []
     title = ""
@@ -220,71 +282,64 @@ def extract_links_from_text_and_buttons(text, reply_markup):
         for row in reply_markup.inline_keyboard:
             for btn in row:
                 if hasattr(btn, 'url') and btn.url:
-                    skip_patterns = ['dd_bypass_updates', '/DD_Bypass', 'support', 'how to download']
-                    should_skip = False
+                    info = domain_classifier.classify(btn.url)
                     btn_text_lower = btn.text.lower()
-                    btn_url_lower = btn.url.lower()
                     
-                    if any(pattern in btn_url_lower for pattern in skip_patterns):
-                        should_skip = True
-                    elif any(word in btn_text_lower for word in ['update', 'channel', 'support', 'how to']):
-                        should_skip = True
-                    
-                    if should_skip:
+                    if info.skip or any(word in btn_text_lower for word in ['update', 'channel', 'support', 'how to']):
                         print(f"[DEBUG] Skipping promotional button: {btn.text} -> {btn.url}")
                         continue
                     
-                    button_links.append(btn.url)
+                    button_links.append((btn.url, info))
                     print(f"[DEBUG] Found valid button URL: {btn.text} -> {btn.url}")
         
-        for i, url in enumerate(button_links):
+        for i, (url, info) in enumerate(button_links):
             if i < len(link_types_order):
                 link_type = link_types_order[i]
             else:
-                if 'gofile' in url.lower():
-                    link_type = "GoFile"
-                elif 'mega' in url.lower():
-                    link_type = "Mega"
-                elif 't.me/' in url.lower() and 'bot' in url.lower():
-                    link_type = "Telegram"
-                elif any(x in url.lower() for x in ['drive', 'mediafire', 'download']):
-                    link_type = "Download Link"
-                else:
-                    link_type = "Link"
+                link_type = info.type or "Link"
             
             bypassed_links.append((link_type, url))
             print(f"[DEBUG] Added button link: {link_type} -> {url}")
     
-    if text:
-        markdown_matches = re.finditer(r'\[([^\]]+)\]\s*\(\s*(https?://[^)\s]+)\s*\)', text)
-        for match in markdown_matches:
-            link_text = match.group(1).strip()
-            url = match.group(2).strip()
-            url = re.sub(r'[,\.\)]+$', '', url)
-            
-            link_type = "Link"
-            url_lower = url.lower()
-            text_lower = link_text.lower()
-            
-            if 'gofile' in url_lower or 'gofile' in text_lower:
+    # Hidden links: TEXT_LINK entities, or literal markdown when the reply has no entities
+    text_links = [(visible, url) for visible, url in entity_links(text, entities) if visible != url]
+    if not text_links and text and not entities:
+        text_links = [
+            (match.group(1), match.group(2))
+            for match in re.finditer(r'\[([^\]]+)\]\s*\(\s*(https?://[^)\s]+)\s*\)', text)
+        ]
+    for link_text, url in text_links:
+        url = clean_url(url)
+        info = domain_classifier.classify(url)
+        if info.skip:
+            continue
+        
+        # The host decides; the visible label only names links on unknown hosts
+        link_type = info.type
+        if not link_type:
+            text_lower = link_text.strip().lower()
+            if 'gofile' in text_lower:
                 link_type = "GoFile"
-            elif 'mega' in url_lower or 'mega' in text_lower:
+            elif 'mega' in text_lower:
                 link_type = "Mega"
-            elif ('t.me/' in url_lower and 'bot' in url_lower) or 'telegram' in text_lower:
+            elif 'telegram' in text_lower:
                 link_type = "Telegram"
-            elif any(x in url_lower or x in text_lower for x in ['drive', 'mediafire', 'download']):
+            elif 'download' in text_lower:
                 link_type = "Download Link"
             elif 'stream' in text_lower or 'watch' in text_lower:
                 link_type = "Stream"
-            
-            bypassed_links.append((link_type, url))
+            else:
+                link_type = "Link"
+        
+        bypassed_links.append((link_type, url))
     
     if not bypassed_links and text:
-        all_urls = re.findall(r'https?://[^\s\)]+', text)
-        for url in all_urls:
-            url = re.sub(r'[,\.\)]+$', '', url)
+        for url in raw_links(text, entities):
+            url = clean_url(url)
             bypassed_links.append(("Direct Link", url))
     
+    # Preferred hosts first; sorted() is stable, so the bot's order holds otherwise
+    bypassed_links = sorted(bypassed_links, key=lambda link: not domain_classifier.classify(link[1]).preferred)
     return bypassed_links, title, size
 
 def parse_multi_link_response(text):
@@ -316,54 +371,256 @@ def parse_multi_link_response(text):
     
     return results
 
+def parse_bypass_response(text, reply_markup, is_multi_link, entities=None):
+    """Turn a final DD bypass bot reply into a JSON-safe result payload"""
+    if is_multi_link:
+        link_pairs = parse_multi_link_response(text)
+        if link_pairs:
+            return {"pairs": link_pairs}
+    
+    if "┎ 🔗 Original Link" in text and "🔓 Bypassed Link" in text:
+        original_link = ""
+        bypassed_link = ""
+        
+        for line in text.splitlines():
+            line = line.strip()
+            if "Original Link" in line and ":-" in line:
+                original_link = line.split(":-", 1)[1].strip()
+            elif "Bypassed Link" in line and ":" in line:
+                bypassed_link = line.split(":", 1)[1].strip()
+        
+        if original_link and bypassed_link:
+            return {"pairs": [(original_link, bypassed_link)], "single": True}
+    
+    bypassed_links, title, size = extract_links_from_text_and_buttons(text, reply_markup, entities)
+    return {"links": bypassed_links, "title": title, "size": size}
+
+def merge_resolved(result):
+    """Fold the links resolved natively on the frontend into the bypass bot's result"""
+    resolved = [tuple(pair) for pair in result.get("resolved") or []]
+    if not resolved:
+        return result
+    if result.get("links"):
+        links = result["links"] + [("Direct Link", final) for _, final in resolved]
+        return dict(result, links=links)
+    pairs = resolved + [tuple(pair) for pair in result.get("pairs") or []]
+    return dict(result, pairs=pairs, single=len(pairs) == 1)
+
+# Header of a final reply in which the bypass bot gives up on the links. Links it
+# echoes back are stripped first: ".../error-page" is no failure.
+FAILURE_REPLY = re.compile(r"^[\s*_]*❌[\s*_]*Bypass Failed", re.IGNORECASE | re.MULTILINE)
+
+class DDReplyParser:
+    """Request and reply format of DD_Bypass_Bot.
+
+    Each upstream bot in BYPASS_BOTS names a parser from REPLY_PARSERS; a bot
+    with a different format only needs its own class with these methods.
+    """
+
+    def request_text(self, links):
+        return f"B {links}"
+
+    def is_failure(self, text):
+        return bool(FAILURE_REPLY.search(URL_PATTERN.sub("", text)))
+
+    def is_progress(self, text):
+        return "Bypassing" in text and not self.is_failure(text)
+
+    def final_kind(self, text):
+        """"forward", "single", "multi" or "failed" for a final reply, None for anything else"""
+        if "┎ 📚 Title" in text and "┠ 💾 Size" in text:
+            print("[DEBUG] Found title and size format - will forward directly")
+            return "forward"
+        if "┎ 🔗 Original Link" in text and "🔓 Bypassed Link" in text:
+            # Check if it's multi-link response
+            if text.count("━━━━━━━✦✗✦━━━━━━━") > 0:
+                print("[DEBUG] Found multi-link bypass format")
+                return "multi"
+            print("[DEBUG] Found single bypass link format")
+            return "single"
+        if self.is_failure(text):
+            print("[DEBUG] Found bypass failure reply")
+            return "failed"
+        return None
+
+    def parse(self, text, reply_markup, kind, entities=None):
+        return parse_bypass_response(text, reply_markup, kind == "multi", entities)
+
+REPLY_PARSERS = {"dd": DDReplyParser()}
+
+def _reply_parser(name):
+    if name not in REPLY_PARSERS:
+        print(f"[DEBUG] Unknown reply parser '{name}', using 'dd'")
+    return REPLY_PARSERS.get(name, REPLY_PARSERS["dd"])
+
+# Upstream bots by username, in configured order (the first is the primary)
+UPSTREAM_BOTS = {username: _reply_parser(parser) for username, parser in BYPASS_BOTS}
+
+def format_bypass_result(result):
+    """Render a result payload as the message sent to the user, None if nothing was bypassed"""
+    result = merge_resolved(result)
+    season_line = f"**📺 Season:** {result['season']}\n\n" if result.get("season") else ""
+    
+    if result.get("pairs") and result.get("single"):
+        original_link, bypassed_link = result["pairs"][0]
+        return (
+            "✨ **Bypass Successful!** ✨\n\n"
+            f"{season_line}"
+            f"**🔗 Original Link:** {make_clickable_link('Click Here', original_link)}\n\n"
+            f"**🚀 Bypassed Link:** {make_clickable_link('Bypassed Link', bypassed_link)}\n\n"
+            f"⚡ **Powered by @Malli4U_Official2**\n"
+            f"🙍 **Requested by:** {result['user_id']}\n"
+            f"⏰ **Time:** {datetime.now().strftime('%H:%M:%S')}"
+        )
+    
+    if result.get("pairs"):
+        link_pairs = result["pairs"]
+        formatted_sections = []
+        
+        for i, (original, bypassed) in enumerate(link_pairs, 1):
+            section = (
+                f"**🔗 Link {i}:**\n"
+                f"**Original:** {make_clickable_link('Click Here', original)}\n"
+                f"**Bypassed:** {make_clickable_link('Bypassed Link', bypassed)}\n"
+            )
+            formatted_sections.append(section)
+        
+        return (
+            f"🎉 **Multi-Link Bypass Successful!** 🎉\n\n"
+            f"{season_line}"
+            f"**📊 Total Links:** {len(link_pairs)}\n\n"
+            + "\n━━━━━━━━━━━━━━━━━━━━\n\n".join(formatted_sections) +
+            f"\n\n⚡ **Powered by @Malli4U_Official2**\n"
+            f"👤 **Requested by:** {result['user_id']}\n"
+            f"⏰ **Time:** {datetime.now().strftime('%H:%M:%S')}"
+        )
+    
+    bypassed_links = result.get("links")
+    if not bypassed_links:
+        return None
+    
+    # Format message with CLICKABLE LINKS - FIXED VERSION
+    formatted = ["🎉 **Bypass Successful!** 🎉\n"]
+    formatted.append(f"**📋 Original Link:** {make_clickable_link('🔗 Click Here', result['original_link'])}\n")
+    
+    if result.get("title"):
+        formatted.append(f"**📚 Title:** {result['title']}\n")
+    if result.get("season"):
+        formatted.append(f"**📺 Season:** {result['season']}\n")
+    if result.get("size"):
+        formatted.append(f"**💾 Size:** {result['size']}\n")
+    
+    formatted.append("**🎯 Download Links:**\n")
+    
+    for i, (link_type, link_url) in enumerate(bypassed_links, 1):
+        emoji = domain_classifier.classify(link_url).emoji or TYPE_EMOJI.get(link_type, "🔗")
+        link_name = f"{emoji} Download {link_type}"
+        
+        # Create clickable link
+        clickable = make_clickable_link(link_name, link_url)
+        formatted.append(f"**{i}.** {clickable}\n")
+    
+    formatted.append(f"\n⚡ **Powered by @Malli4U_Admin_Bot**\n👤 **Requested by:** {result['user_id']}\n⏰ **Time:** {datetime.now().strftime('%H:%M:%S')}")
+    return "\n".join(formatted)
+
+def format_resolvers(summary):
+    """Render the resolver chain stats for the admin dashboard"""
+    lines = []
+    for name, totals in summary.items():
+        rate = f"{totals['success_rate'] * 100:.0f}%" if totals["success_rate"] is not None else "—"
+        latency = f"{totals['avg_latency']:.1f}s" if totals["avg_latency"] is not None else "—"
+        lines.append(f"**{name}:** {totals['attempts']} links, ✅ {rate}, ⏱️ {latency}")
+    return (
+        "🧭 **Resolvers:**\n"
+        + "".join(f"{'┗' if i == len(lines) - 1 else '┣'} {line}\n" for i, line in enumerate(lines))
+        + "\n"
+    )
+
+async def upstream_stats():
+    """Reconnects and gaps of the upstream session; frontends see what the upstream workers last shared"""
+    if BOT_ROLE in ("all", "upstream"):
+        return upstream.stats()
+    return await coordinator.cache_get("upstream")
+
+def format_upstream(stats):
+    """Render the upstream session line of the admin dashboard"""
+    if not stats:
+        return "┣ 🔌 **Upstream Session:** —\n"
+    gaps = f", last gap {stats['last_gap']}s, longest {stats['max_gap']}s" if stats["last_gap"] is not None else ""
+    state = "connected" if stats["connected"] else "down"
+    return f"┣ 🔌 **Upstream Session:** {state}, {stats['reconnects']} reconnects{gaps}\n"
+
+def format_activity(rollups):
+    """Render the metrics rollups for the admin dashboard"""
+    def line(label, window, last=False):
+        rate = f"{window['success_rate'] * 100:.0f}%" if window["success_rate"] is not None else "—"
+        latency = f"{window['avg_latency']:.1f}s" if window["avg_latency"] is not None else "—"
+        return (
+            f"{'┗' if last else '┣'} **{label}:** {window['requests']} requests, "
+            f"{window['links']} links, ✅ {rate}, ⏱️ {latency}\n"
+        )
+    
+    return (
+        f"📈 **Activity:**\n"
+        + line("Last hour", rollups["hour"])
+        + line("Last 24h", rollups["day"])
+        + line("Last 7 days", rollups["week"])
+        + f"┗ **Avg per hour (24h):** {rollups['per_hour']:.1f} requests\n\n"
+    )
+
 @user_client.on_message()
 async def handle_bypass_response(client, message):
-    if not message.chat or message.chat.username != BYPASS_BOT_USERNAME.lstrip("@"):
+    bot = (message.chat.username or "").lower() if message.chat else ""
+    parser = UPSTREAM_BOTS.get(bot)
+    if parser is None:
         return
         
+    if message.id in handled_responses:
+        return
+        
+    last_reply_at[bot] = time.time()
     text = message.text or ""
+    # A reply always comes after the request it answers, from the bot it was sent to
+    pending_bypass_requests = {
+        rid: req for rid, req in (await coordinator.pending_requests()).items()
+        if rid < message.id and req.get("bot", BYPASS_BOT_USERNAME).lower() == bot
+    }
+    
+    link_keys = links_in_text(text, message.entities)
     
     # Progress update with animation
-    if "Bypassing" in text:
+    if parser.is_progress(text):
+        handled_responses.set(message.id, None)
         for req in pending_bypass_requests.values():
-            if any(link in text for link in req["original_link"].split()) and req.get("status_msg"):
-                try:
-                    emoji = LOADING_EMOJIS[0]
-                    await req["status_msg"].edit_text(f"{emoji} **Bot is processing your links...**\n\n🔄 **Status:** In Progress\n⏰ **Please wait...**", parse_mode=ParseMode.MARKDOWN)
-                except:
-                    pass
+            if mentions_request(link_keys, req):
+                await coordinator.publish_result(dict(req, kind="progress"))
         return
     
-    is_final_result = False
-    should_forward = False
-    is_multi_link = False
-    
-    if text:
-        if "┎ 📚 Title" in text and "┠ 💾 Size" in text:
-            is_final_result = True
-            should_forward = True
-            print("[DEBUG] Found title and size format - will forward directly")
-        elif "┎ 🔗 Original Link" in text and "🔓 Bypassed Link" in text:
-            is_final_result = True
-            should_forward = False
-            # Check if it's multi-link response
-            if text.count("━━━━━━━✦✗✦━━━━━━━") > 0:
-                is_multi_link = True
-                print("[DEBUG] Found multi-link bypass format")
-            else:
-                print("[DEBUG] Found single bypass link format")
-    
-    if not is_final_result:
+    kind = parser.final_kind(text) if text else None
+    if not kind:
         return
+    should_forward = kind == "forward"
     
     # Match request
     matching_id = None
     for rid, req in pending_bypass_requests.items():
-        original_links = req["original_link"].split()
-        if any(link in text for link in original_links):
+        if mentions_request(link_keys, req):
             matching_id = rid
             break
     
+    if not matching_id:
+        # A late answer to a hedged request the other bot already won
+        for rid, req, _ in hedge_losers.items():
+            if (req.get("bot") or "").lower() == bot and mentions_request(link_keys, req):
+                handled_responses.set(message.id, rid)
+                print(f"[DEBUG] Discarding late reply from {bot} to hedged request {rid}")
+                return
+    
+    if not matching_id and kind == "failed" and len(pending_bypass_requests) > 1:
+        # An error that names no link can't be pinned on one of several requests
+        print(f"[DEBUG] Unmatched failure reply from {bot}, {len(pending_bypass_requests)} requests pending")
+        return
+    
     if not matching_id and pending_bypass_requests:
         matching_id = max(pending_bypass_requests, key=lambda k: pending_bypass_requests[k]["time_sent"])
     
@@ -371,129 +628,624 @@ async def handle_bypass_response(client, message):
         print("[DEBUG] No matching request found")
         return
     
-    req = pending_bypass_requests.pop(matching_id)
-    group_id = req["group_id"]
-    original_msg_id = req["original_msg_id"]
-    
-    # Update status to completing
-    if req.get("status_msg"):
-        try:
-            await req["status_msg"].edit_text("✅ **Bypass Complete!** Sending results...", parse_mode=ParseMode.MARKDOWN)
-            await asyncio.sleep(1)
-        except:
-            pass
-    
-    # Delete status message
-    if req.get("status_msg"):
-        try:
-            await req["status_msg"].delete()
-        except:
-            pass
+    handled_responses.set(message.id, matching_id)
+    req = await coordinator.pop_pending(matching_id)
+    if not req:
+        print(f"[DEBUG] Request {matching_id} was already answered")
+        return
+    settle_request(matching_id, True)
+    latency_tracker.record(bot, upstream_links(req), time.time() - req["time_sent"])
+    latency = time.time() - req.get("first_sent", req["time_sent"])
+    
+    if kind == "failed":
+        # The bot answered, so the breaker saw a success; the links themselves failed
+        record_answer(bot, dict(req, failed=True))
+        if await fall_through(req, bot):
+            return
+        record_outcome(req, False, latency)
+        await coordinator.publish_result(dict(req, kind="result", failed=True))
+        return
+    await discard_hedges(matching_id, req)
     
+    # The copy is made by the user session, so it has to happen on this worker
     if should_forward:
-        success = await safe_copy_message(message, group_id, original_msg_id)
+        success = await safe_copy_message(message, req["group_id"], req["original_msg_id"])
         if success:
             print("[DEBUG] Successfully forwarded the bypass result")
+            record_answer(bot, dict(req, copied=True))
+            record_outcome(req, True, latency)
+            await coordinator.publish_result(dict(req, kind="result", copied=True))
             return
         print("[DEBUG] Forward failed, will format manually")
     
-    # Handle multi-link response
-    if is_multi_link:
-        link_pairs = parse_multi_link_response(text)
-        if link_pairs:
-            formatted_sections = []
-            
-            for i, (original, bypassed) in enumerate(link_pairs, 1):
-                section = (
-                    f"**🔗 Link {i}:**\n"
-                    f"**Original:** {make_clickable_link('Click Here', original)}\n"
-                    f"**Bypassed:** {make_clickable_link('Bypassed Link', bypassed)}\n"
-                )
-                formatted_sections.append(section)
-            
-            formatted_text = (
-                f"🎉 **Multi-Link Bypass Successful!** 🎉\n\n"
-                f"**📊 Total Links:** {len(link_pairs)}\n\n"
-                + "\n━━━━━━━━━━━━━━━━━━━━\n\n".join(formatted_sections) +
-                f"\n\n⚡ **Powered by @Malli4U_Official2**\n"
-                f"👤 **Requested by:** {req['user_id']}\n"
-                f"⏰ **Time:** {datetime.now().strftime('%H:%M:%S')}"
-            )
-            
-            await safe_send_message(bot_instance, group_id, formatted_text, original_msg_id)
-            print(f"[DEBUG] Successfully sent multi-link bypass result with {len(link_pairs)} links")
+    result = parser.parse(text, message.reply_markup, kind, message.entities)
+    if result.get("pairs"):
+        result["pairs"] = restore_originals(req, result["pairs"])
+    record_answer(bot, dict(req, **result))
+    record_outcome(req, bool(result.get("pairs") or result.get("links")), latency)
+    await coordinator.publish_result(dict(req, kind="result", **result))
+
+def record_outcome(job, success, latency=None):
+    """Count a request's outcome in the metrics; a multi-link request counts once, when its message settles"""
+    if not job.get("progressive"):
+        metrics.record_result(success, latency)
+
+def record_answer(bot, result):
+    """Feed a bypass bot's answer into its per-host stats, link by link"""
+    urls = result["original_link"].split()
+    failed = set(urls) if result.get("failed") else unanswered_links(result)
+    latency = time.time() - result["time_sent"]
+    resolver_chain.record_upstream(bot, [url for url in urls if url not in failed], True, latency)
+    resolver_chain.record_upstream(bot, [url for url in urls if url in failed], False, latency)
+
+# Fields a pending request adds to its job, dropped when the job is queued again
+PENDING_FIELDS = ("bot", "time_sent", "worker", "job_id")
+
+async def fall_through(req, bot):
+    """Hand links a bot failed on to the next bot in the chain; False once every bot has failed.
+
+    A hedged copy still waiting on another bot already is that next attempt.
+    """
+    tried = [*req.get("tried", []), *failed_bots.get(req.get("job_id"), []), bot]
+    pending = await coordinator.pending_requests()
+    if any(other.get("job_id") == req.get("job_id") for other in pending.values()):
+        failed_bots.set(req.get("job_id"), tried)
+        print(f"[DEBUG] {bot} failed on job {req.get('job_id')}, waiting for its hedged copy")
+        return True
+    if not resolver_chain.rank_upstream(req["original_link"].split(), tried):
+        return False
+    job = {key: value for key, value in req.items() if key not in PENDING_FIELDS}
+    await coordinator.submit_job(dict(job, tried=tried, first_sent=req.get("first_sent", req["time_sent"])))
+    print(f"[DEBUG] {bot} failed on job {req.get('job_id')}, falling through to the next bot")
+    return True
+
+async def discard_hedges(winner_id, winner):
+    """Drop the other copies of a hedged request once one bot has answered"""
+    for rid, req in (await coordinator.pending_requests()).items():
+        if rid != winner_id and req.get("job_id") == winner.get("job_id"):
+            if await coordinator.pop_pending(rid):
+                settle_request(rid, None)
+                # The loser was at least this slow; keeps its p90 from only seeing the fast replies
+                latency_tracker.record(req["bot"], upstream_links(req), time.time() - req["time_sent"])
+                hedge_losers.set(rid, req)
+                print(f"[DEBUG] Request {winner_id} from {winner.get('bot')} won over {rid} from {req.get('bot')}")
+
+def unanswered_links(result):
+    """Links of a bypass bot answer that it didn't resolve"""
+    urls = result["original_link"].split()
+    pairs = result.get("pairs") or []
+    if result.get("copied") or result.get("links") or len(pairs) >= len(urls):
+        return set()
+    if pairs:
+        answered = {url_key(original) for original, _ in pairs}
+        return {url for url in urls if url_key(url) not in answered}
+    return set(urls)
+
+def record_link_outcomes(result):
+    """Negative-cache the links a bypass bot answer left unresolved, clear the rest"""
+    failed = unanswered_links(result)
+    for url in result["original_link"].split():
+        if url in failed:
+            negative_cache.record_failure(url)
+        else:
+            negative_cache.record_success(url)
+
+def rejected_text(retry_after):
+    if retry_after is None:
+        wait = "📞 Contact admin if you think this site should work: @Malli4U_Admin_Bot"
+    else:
+        wait = f"⏳ Please try again in about {max(1, round(retry_after / 60))} minute(s)."
+    return (
+        "❌ **Links Not Supported**\n\n"
+        "The bypass service recently failed on these links or doesn't support their site, "
+        "so they were not sent again and this request does not count towards your daily limit.\n\n"
+        f"{wait}"
+    )
+
+def circuit_open_text(retry_after):
+    return (
+        "🚧 **Bypass Service Busy**\n\n"
+        "The bypass service is not answering right now, so your links were not sent "
+        "and this request does not count towards your daily limit.\n\n"
+        f"⏳ Please try again in about {max(5, int(retry_after))} seconds.\n\n🆘 **Support:** @M4U_Admin_Bot"
+    )
+
+# --- Progressive delivery ---
+# A multi-link request keeps one message that fills in as its links resolve.
+# Finished parts live in the coordination store, so any frontend can render
+# the whole message; edits are rate-limited per message.
+
+FAILURE_REASONS = {
+    "result": "not bypassed",
+    "rejected": "recently failed",
+    "circuit_open": "service busy",
+    "unavailable": "service unavailable",
+    "send_failed": "could not be sent",
+    "expired": "timed out",
+}
+
+# Outcomes that never reached the bypass bot or got no answer from it: the
+# request reserved at /by is given back
+REFUNDED_KINDS = frozenset({"rejected", "circuit_open", "unavailable", "send_failed", "expired"})
+
+# Local edit schedule per progressive message: request key -> {"last", "dirty", "task"}
+progress_editors = {}
+
+def progress_key(job):
+    return f"{job['status_chat_id']}:{job['status_msg_id']}"
+
+async def publish_part(job, part_id, part):
+    """Store a finished part of a multi-link request and notify the frontends"""
+    await coordinator.add_progress(progress_key(job), part_id, dict(part, at=time.time()))
+    await coordinator.publish_result(dict(job, kind="part"))
+
+async def send_batch_upstream(job, deferred, batch):
+    """Queue (user link, link to send) pairs the resolvers deferred, unless the bypass bot would be asked in vain"""
+    rejected = [url for url, _ in deferred if negative_cache.check(url)]
+    if rejected:
+        await publish_part(job, f"rejected-{batch}", {"failed": rejected, "reason": "rejected", "count": len(rejected)})
+        deferred = [(url, link) for url, link in deferred if url not in rejected]
+        if not deferred:
             return
     
-    # Handle single link response (existing code)
-    if "┎ 🔗 Original Link" in text and "🔓 Bypassed Link" in text:
-        original_link = ""
-        bypassed_link = ""
+    breaker = await coordinator.cache_get("breaker")
+    if breaker and breaker["state"] == OPEN and breaker["retry_after"] > 0:
+        urls = [url for url, _ in deferred]
+        await publish_part(job, f"busy-{batch}", {"failed": urls, "reason": "circuit_open", "count": len(urls)})
+        return
+    
+    await coordinator.submit_job(dict(job, **upstream_fields(deferred)))
+
+async def resolve_progressively(job, urls):
+    """Resolve a multi-link request link by link, publishing each batch as it settles.
+
+    Links answered inline are shown right away; the ones left for the bypass
+    bot go out together with whatever else finished within
+    PROGRESS_BATCH_WINDOW, so a slow link never holds back the others.
+    """
+    pending = {asyncio.create_task(resolver_chain.resolve(url)): url for url in urls}
+    batch = 0
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if len(done) < len(pending):
+            more, _ = await asyncio.wait(set(pending) - done, timeout=PROGRESS_BATCH_WINDOW)
+            done |= more
         
-        for line in text.splitlines():
-            line = line.strip()
-            if "Original Link" in line and ":-" in line:
-                original_link = line.split(":-", 1)[1].strip()
-            elif "Bypassed Link" in line and ":" in line:
-                bypassed_link = line.split(":", 1)[1].strip()
+        batch += 1
+        pairs, deferred = [], []
+        for task in done:
+            url = pending.pop(task)
+            final, _, link = task.result()
+            if final:
+                pairs.append((url, final))
+            else:
+                deferred.append((url, link))
         
-        if original_link and bypassed_link:
-            formatted_text = (
-                "✨ **Bypass Successful!** ✨\n\n"
-                f"**🔗 Original Link:** {make_clickable_link('Click Here', original_link)}\n\n"
-                f"**🚀 Bypassed Link:** {make_clickable_link('Bypassed Link', bypassed_link)}\n\n"
-                f"⚡ **Powered by @Malli4U_Official2**\n"
-                f"🙍 **Requested by:** {req['user_id']}\n"
-                f"⏰ **Time:** {datetime.now().strftime('%H:%M:%S')}"
+        if pairs:
+            await publish_part(job, f"inline-{batch}", {"pairs": pairs, "count": len(pairs)})
+        if deferred:
+            await send_batch_upstream(job, deferred, batch)
+
+async def safe_resolve_progressively(job, urls):
+    try:
+        await resolve_progressively(job, urls)
+    except Exception as e:
+        print(f"[DEBUG] Error resolving links progressively: {e}")
+
+def format_progress(job, parts):
+    """Render a progressive result; returns (text, whether every link has settled)"""
+    parts = sorted(parts.values(), key=lambda part: part["at"])
+    total = job["total"]
+    settled = sum(part["count"] for part in parts)
+    done = settled >= total
+    failed = [(url, part.get("reason", "result")) for part in parts for url in part.get("failed", [])]
+    bypassed = settled - len(failed)
+    
+    sections = []
+    for part in parts:
+        for original, final in part.get("pairs", []):
+            sections.append(
+                f"**🔗 Link {len(sections) + 1}:**\n"
+                f"**Original:** {make_clickable_link('Click Here', original)}\n"
+                f"**Bypassed:** {make_clickable_link('Bypassed Link', final)}\n"
             )
-            
-            await safe_send_message(bot_instance, group_id, formatted_text, original_msg_id)
-            print("[DEBUG] Successfully sent formatted bypass message with clickable links")
-            return
+        if part.get("links"):
+            lines = [f"**📚 Title:** {part['title']}\n"] if part.get("title") else []
+            if part.get("size"):
+                lines.append(f"**💾 Size:** {part['size']}\n")
+            for link_type, url in part["links"]:
+                emoji = domain_classifier.classify(url).emoji or TYPE_EMOJI.get(link_type, "🔗")
+                lines.append(f"┣ {make_clickable_link(f'{emoji} Download {link_type}', url)}\n")
+            sections.append(f"**🔗 Link {len(sections) + 1}:**\n" + "".join(lines))
+        if part.get("copied"):
+            sections.append(f"📨 **{part['count']} link(s)** sent as a separate message\n")
+    
+    if not done:
+        header = f"⏳ **Bypassing {total} links...** {settled}/{total} done\n\n"
+    elif bypassed:
+        header = "🎉 **Multi-Link Bypass Successful!** 🎉\n\n"
+    else:
+        header = "❌ **Bypass Failed**\n\n"
+    if job.get("season"):
+        header += f"**📺 Season:** {job['season']}\n\n"
+    
+    body = "\n━━━━━━━━━━━━━━━━━━━━\n\n".join(sections)
+    if failed:
+        body += "\n" + "".join(
+            f"❌ {make_clickable_link('Link', url)} — {FAILURE_REASONS.get(reason, 'failed')}\n" for url, reason in failed
+        )
+    
+    if not done:
+        footer = f"\n🔄 **{total - settled} link(s) still in progress...**"
+    else:
+        footer = (
+            f"\n📊 **Summary:** ✅ {bypassed} bypassed • ❌ {len(failed)} failed • "
+            f"⏱️ {time.time() - job['submitted_at']:.1f}s\n\n"
+            f"⚡ **Powered by @Malli4U_Official2**\n"
+            f"👤 **Requested by:** {job['user_id']}\n"
+            f"⏰ **Time:** {datetime.now().strftime('%H:%M:%S')}"
+        )
+    return header + body + footer, done
+
+def schedule_progress_render(job):
+    key = progress_key(job)
+    editor = progress_editors.setdefault(key, {"last": 0.0, "dirty": False, "task": None})
+    editor["dirty"] = True
+    if editor["task"] is None:
+        editor["task"] = asyncio.create_task(render_progress(job, key, editor))
+
+async def render_progress(job, key, editor):
+    """Edit a progressive message at most once per PROGRESS_EDIT_INTERVAL, always ending on the latest parts"""
+    try:
+        while editor["dirty"]:
+            wait = editor["last"] + PROGRESS_EDIT_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            editor["dirty"] = False
+            parts = await coordinator.progress_parts(key)
+            if not parts:
+                # Already finished, e.g. by another frontend
+                progress_editors.pop(key, None)
+                return
+            text, done = format_progress(job, parts)
+            await safe_edit_message(bot_instance, job["status_chat_id"], job["status_msg_id"], text)
+            editor["last"] = time.monotonic()
+            if done:
+                await finish_progress(job, key, parts)
+                return
+    except Exception as e:
+        print(f"[DEBUG] Error rendering progressive result: {e}")
+    finally:
+        editor["task"] = None
+
+async def finish_progress(job, key, parts):
+    progress_editors.pop(key, None)
+    # Every frontend rendering this message gets here; the one that clears the parts settles it
+    if not await coordinator.clear_progress(key):
+        return
+    # A multi-link request is one request, reserved at /by and given back if nothing came through
+    bypassed = sum(part["count"] - len(part.get("failed", [])) for part in parts.values())
+    metrics.record_result(bool(bypassed), time.time() - job["submitted_at"])
+    if job.get("charge") and not bypassed:
+        await coordinator.refund_usage(job["user_id"])
+    report_first_response()
+
+async def deliver_part(result):
+    """Fold a result for one batch of a multi-link request into its progressive message"""
+    kind = result["kind"]
+    if kind in ("progress", "resumed"):
+        # The message already shows live progress
+        return
+    if kind != "part":
+        links = result["original_link"].split()
+        if kind == "result":
+            failed = sorted(unanswered_links(result))
+            part = {
+                "pairs": result.get("pairs") or [],
+                "links": result.get("links") or [],
+                "title": result.get("title"),
+                "size": result.get("size"),
+                "copied": bool(result.get("copied")),
+                "failed": failed,
+                "count": len(links),
+            }
+            if not part["pairs"] and not part["links"] and not part["copied"]:
+                part["failed"] = links
+        else:
+            part = {"failed": links, "reason": kind, "count": len(links)}
+        part["reason"] = part.get("reason", "result")
+        await coordinator.add_progress(progress_key(result), result["job_id"], dict(part, at=time.time()))
+    schedule_progress_render(result)
+
+async def show_result(result, text):
+    """Put a final text in front of the user.
+
+    With EDIT_RESULTS the status message itself becomes the result, one
+    call in place of a delete and a send. A new reply is sent instead when
+    that mode is off or the edit fails (status message gone, text too long).
+    """
+    status_chat_id = result["status_chat_id"]
+    status_msg_id = result["status_msg_id"]
+    if EDIT_RESULTS and await safe_edit_message(bot_instance, status_chat_id, status_msg_id, text):
+        return True
+    try:
+        await bot_instance.delete_messages(status_chat_id, status_msg_id)
+    except Exception:
+        pass
+    return await safe_send_message(bot_instance, result["group_id"], text, result["original_msg_id"]) is not None
+
+async def deliver_result(result):
+    """Apply a result from the bus to the user's chat through the bot API"""
+    kind = result["kind"]
+    status_chat_id = result["status_chat_id"]
+    status_msg_id = result["status_msg_id"]
+    
+    if kind == "result" and result.get("original_link"):
+        # Links the bypass bot answered: cache what it found, refuse what it failed on for a while
+        resolver_chain.remember(result.get("pairs") or ())
+        record_link_outcomes(result)
+    
+    if kind == "expired" and result.get("link_timeout"):
+        # The bot kept answering other requests but never these links
+        for url in result["original_link"].split():
+            negative_cache.record_failure(url)
+    
+    # One frontend pops each result, so this refund runs once per request
+    refunded = kind in REFUNDED_KINDS or result.get("failed")
+    if refunded and result.get("charge") and not result.get("progressive") and not result.get("resolved"):
+        await coordinator.refund_usage(result["user_id"])
+    
+    if result.get("progressive"):
+        await deliver_part(result)
+        return
     
-    # Fallback: Try to extract links and format with CLICKABLE LINKS
-    bypassed_links, title, size = extract_links_from_text_and_buttons(text, message.reply_markup)
+    if kind == "progress":
+        emoji = LOADING_EMOJIS[0]
+        await safe_edit_message(bot_instance, status_chat_id, status_msg_id, f"{emoji} **Bot is processing your links...**\n\n🔄 **Status:** In Progress\n⏰ **Please wait...**")
+        return
     
-    if not bypassed_links:
-        await safe_send_message(
-            bot_instance, 
-            group_id, 
-            "❌ **Bypass Failed**\n\nCould not process the bypass response. Please try again or contact support.\n\n🆘 **Support:** @M4U_Admin_Bot", 
-            original_msg_id
+    if kind == "resumed":
+        await safe_edit_message(bot_instance, status_chat_id, status_msg_id, "♻️ **Bot restarted, resuming your request...**\n\n🔄 **Status:** In Progress\n⏰ **Please wait...**")
+        return
+    
+    if kind == "unavailable":
+        await show_result(
+            result,
+            "❌ **Service Unavailable**\n\n"
+            "Could not connect to bypass service. Please try again later.\n\n🆘 **Support:** @M4U_Admin_Bot"
         )
         return
     
-    # Format message with CLICKABLE LINKS - FIXED VERSION
-    formatted = ["🎉 **Bypass Successful!** 🎉\n"]
-    formatted.append(f"**📋 Original Link:** {make_clickable_link('🔗 Click Here', req['original_link'])}\n")
+    if kind == "send_failed":
+        await show_result(
+            result,
+            "❌ **Request Failed**\n\n"
+            "Could not send bypass request. Please try again later.\n\n🆘 **Support:** @M4U_Admin_Bot"
+        )
+        return
     
-    if title:
-        formatted.append(f"**📚 Title:** {title}\n")
-    if size:
-        formatted.append(f"**💾 Size:** {size}\n")
+    if kind == "rejected":
+        await show_result(result, rejected_text(result.get("retry_after")))
+        return
     
-    formatted.append("**🎯 Download Links:**\n")
+    if kind == "circuit_open":
+        notice = circuit_open_text(result.get("retry_after", 0))
+        # Links answered without the bypass bot are still worth sending
+        if result.get("resolved"):
+            notice = f"{format_bypass_result(result)}\n\n{notice}"
+        await show_result(result, notice)
+        return
     
-    for i, (link_type, link_url) in enumerate(bypassed_links, 1):
-        emoji_map = {
-            "GoFile": "📂",
-            "Mega": "📦", 
-            "Telegram": "☁️",
-            "Stream": "🎥",
-            "Download Link": "🔗"
-        }
-        
-        emoji = emoji_map.get(link_type, "🔗")
-        link_name = f"{emoji} Download {link_type}"
-        
-        # Create clickable link
-        clickable = make_clickable_link(link_name, link_url)
-        formatted.append(f"**{i}.** {clickable}\n")
+    if kind == "expired":
+        await show_result(
+            result,
+            "⌛ **Request Timed Out**\n\n"
+            "No reply arrived for your links in time. Please send them again.\n\n🆘 **Support:** @M4U_Admin_Bot"
+        )
+        return
+    
+    if result.get("copied"):
+        # The bypass bot's own message was copied into the chat; the status message has nothing left to show
+        try:
+            await bot_instance.delete_messages(status_chat_id, status_msg_id)
+        except Exception:
+            pass
+        report_first_response()
+        return
     
-    formatted.append(f"\n⚡ **Powered by @Malli4U_Admin_Bot**\n👤 **Requested by:** {req['user_id']}\n⏰ **Time:** {datetime.now().strftime('%H:%M:%S')}")
-    final_text = "\n".join(formatted)
+    final_text = format_bypass_result(result)
+    if not final_text:
+        await show_result(
+            result,
+            "❌ **Bypass Failed**\n\nCould not process the bypass response. Please try again or contact support.\n\n🆘 **Support:** @M4U_Admin_Bot"
+        )
+        return
     
-    await safe_send_message(bot_instance, group_id, final_text, original_msg_id)
-    print("[DEBUG] Successfully sent formatted message with ALL CLICKABLE LINKS")
+    if result.get("skipped"):
+        final_text += f"\n\n⚠️ **Skipped {len(result['skipped'])} link(s)** the bypass service recently failed on."
+    if await show_result(result, final_text):
+        print("[DEBUG] Successfully delivered formatted bypass result with clickable links")
+    report_first_response()
+
+def report_first_response():
+    global first_response_at
+    if first_response_at is None:
+        first_response_at = time.monotonic()
+        print(f"[DEBUG] Time to first response: {first_response_at - started_at:.2f}s after start")
+
+# Upstream requests this worker sent and hasn't settled yet: message id -> (monotonic send time, bot)
+inflight_requests = {}
+# Wall time of the latest message from each upstream bot, to tell a dead bot from a dead link
+last_reply_at = {}
+
+def settle_request(request_id, ok):
+    """Release a sent request's concurrency slot and report its outcome to the breaker.
+
+    ``ok`` is None for a hedge copy that lost: it frees its slot without
+    counting as a success or a failure.
+    """
+    started, _ = inflight_requests.pop(request_id, (None, None))
+    if started is None:
+        return
+    latency = time.monotonic() - started
+    upstream_limiter.release(latency, ok is not False)
+    if ok is not None:
+        upstream_breaker.record(ok)
+
+async def fail_fast(job):
+    """Answer a job straight away while the upstream circuit is open"""
+    record_outcome(job, False)
+    await coordinator.publish_result(dict(job, kind="circuit_open", retry_after=upstream_breaker.retry_after()))
+    await coordinator.finish_job(job["job_id"])
+
+async def dispatch_job(job):
+    """Send one queued /by job to the DD bypass bot from this worker's user session"""
+    if upstream_breaker.retry_after() > 0:
+        await fail_fast(job)
+        return
+    
+    # Wait (bounded) for a reconnect in progress rather than starting another one
+    if not await upstream.wait_ready(UPSTREAM_READY_TIMEOUT):
+        upstream_breaker.record(False)
+        record_outcome(job, False)
+        await coordinator.publish_result(dict(job, kind="unavailable"))
+        await coordinator.finish_job(job["job_id"])
+        return
+    
+    # Jobs queue here while the adaptive in-flight limit is reached
+    await upstream_limiter.acquire()
+    if not upstream_breaker.allow():
+        upstream_limiter.release()
+        await fail_fast(job)
+        return
+    
+    links = upstream_links(job)
+    # Per-domain order of the bots from the resolver chain, minus those that already failed on these links
+    urls = job["original_link"].split()
+    bots = resolver_chain.rank_upstream(urls, job.get("tried", ())) or resolver_chain.rank_upstream(urls)
+    bot = bots[0]
+    try:
+        sent = await user_client.send_message(bot, UPSTREAM_BOTS[bot].request_text(" ".join(links)))
+        print(f"[DEBUG] Sent multi-link bypass request to {bot} with message ID: {sent.id} for {job['link_count']} links")
+    except Exception as e:
+        print(f"[DEBUG] Error sending message: {e}")
+        upstream_limiter.release(ok=False)
+        upstream_breaker.record(False)
+        record_outcome(job, False)
+        await coordinator.publish_result(dict(job, kind="send_failed"))
+        await coordinator.finish_job(job["job_id"])
+        return
+    
+    inflight_requests[sent.id] = (time.monotonic(), bot)
+    await coordinator.add_pending(sent.id, dict(job, bot=bot, time_sent=time.time()))
+    await coordinator.finish_job(job["job_id"])
+    print(f"[DEBUG] Added pending multi-link request: {sent.id} with {job['link_count']} links")
+    
+    hedge_budget.earn()
+    if HEDGE_REQUESTS and len(bots) > 1:
+        asyncio.create_task(safe_hedge_job(sent.id, bots[1], hedge_delay(bot, links)))
+
+async def hedge_job(request_id, bot, delay):
+    """Send a request still unanswered after ``delay`` to a second bot; the first reply wins"""
+    await asyncio.sleep(delay)
+    req = (await coordinator.pending_requests()).get(request_id)
+    if not req:
+        return
+    if upstream_breaker.state != CLOSED or not upstream_limiter.try_acquire():
+        # Hedging into an overloaded or failing upstream only adds to the load
+        return
+    if not hedge_budget.spend():
+        upstream_limiter.release()
+        print(f"[DEBUG] Hedge budget exhausted, not hedging request {request_id}")
+        return
+    
+    try:
+        sent = await user_client.send_message(bot, UPSTREAM_BOTS[bot].request_text(" ".join(upstream_links(req))))
+    except Exception:
+        upstream_limiter.release(ok=False)
+        raise
+    inflight_requests[sent.id] = (time.monotonic(), bot)
+    await coordinator.add_pending(sent.id, dict(
+        req, bot=bot, time_sent=time.time(), first_sent=req.get("first_sent", req["time_sent"])
+    ))
+    print(f"[DEBUG] Hedged request {request_id} after {delay:.1f}s with {bot} (message ID: {sent.id})")
+
+async def safe_hedge_job(request_id, bot, delay):
+    try:
+        await hedge_job(request_id, bot, delay)
+    except Exception as e:
+        print(f"[DEBUG] Error hedging request {request_id}: {e}")
+
+async def safe_dispatch_job(job):
+    try:
+        await dispatch_job(job)
+    except Exception as e:
+        print(f"[DEBUG] Error dispatching job: {e}")
+
+async def watch_upstream(interval=5):
+    """Count requests left unanswered past UPSTREAM_REPLY_TIMEOUT as failures and share the breaker state.
+
+    The pending entry stays, so a late reply is still delivered; only its
+    concurrency slot is freed. A timeout only counts against the breaker
+    when the bot has sent nothing since the request went out: if it kept
+    answering other requests, the links are at fault, not the bot. Requests
+    still unanswered after PENDING_MAX_AGE are expired. Frontends read the
+    state to fail fast.
+    """
+    rounds = 0
+    while True:
+        try:
+            now = time.monotonic()
+            for request_id, (started, bot) in list(inflight_requests.items()):
+                if now - started > UPSTREAM_REPLY_TIMEOUT:
+                    bot_alive = last_reply_at.get(bot, 0) > time.time() - (now - started)
+                    print(f"[DEBUG] No reply to request {request_id} after {UPSTREAM_REPLY_TIMEOUT:.0f}s"
+                          f"{'' if bot_alive else f', nothing from {bot} since'}")
+                    settle_request(request_id, None if bot_alive else False)
+            await coordinator.cache_set("breaker", upstream_breaker.snapshot(), ttl=interval * 6)
+            await coordinator.cache_set("upstream", upstream.stats(), ttl=interval * 6)
+            await coordinator.heartbeat()
+            rounds += 1
+            if rounds % 12 == 0:
+                await expire_requests(await coordinator.pending_requests())
+                await expire_requests(await coordinator.orphaned_requests())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[DEBUG] Error in upstream watcher: {e}")
+        await asyncio.sleep(interval)
+
+async def dispatch_jobs():
+    while True:
+        try:
+            job = await coordinator.next_job(timeout=30)
+            if job:
+                # Jobs wait for readiness side by side, bounded by the connection manager
+                asyncio.create_task(safe_dispatch_job(job))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[DEBUG] Error in job dispatcher: {e}")
+            await asyncio.sleep(1)
+
+async def safe_deliver_result(result):
+    try:
+        await deliver_result(result)
+    except Exception as e:
+        print(f"[DEBUG] Error delivering result: {e}")
+
+async def deliver_results():
+    while True:
+        try:
+            result = await coordinator.next_result(timeout=30)
+            if result:
+                # Deliveries run side by side so one slow chat doesn't hold up the rest
+                asyncio.create_task(safe_deliver_result(result))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[DEBUG] Error reading results: {e}")
+            await asyncio.sleep(1)
 
 # SIMPLIFIED Start command - NO SESSION MANAGEMENT
 @Client.on_message(filters.command("start"))
@@ -513,7 +1265,7 @@ async def start_command(bot: Client, message: Message):
     # Get user info
     is_premium = user_manager.is_premium(user_id)
     is_admin = user_manager.is_admin(user_id)
-    daily_usage = user_manager.get_daily_usage(user_id)
+    daily_usage = await coordinator.get_usage(user_id)
     
     status_emoji = "👑" if is_admin else "💎" if is_premium else "🆓"
     status_text = "Admin" if is_admin else "Premium User" if is_premium else "Free User"
@@ -522,12 +1274,12 @@ async def start_command(bot: Client, message: Message):
     # SIMPLE keyboard with URL buttons and basic callback buttons
     keyboard = InlineKeyboardMarkup([
         [
-            InlineKeyboardButton("📚 How to Use", callback_data="howto"),
-            InlineKeyboardButton("💎 Premium Details", callback_data="premium")
+            InlineKeyboardButton("📚 How to Use", callback_data=sign_callback("howto", user_id)),
+            InlineKeyboardButton("💎 Premium Details", callback_data=sign_callback("premium", user_id))
         ],
         [
-            InlineKeyboardButton("📊 My Stats", callback_data="stats"),
-            InlineKeyboardButton("🌟 Features", callback_data="features")
+            InlineKeyboardButton("📊 My Stats", callback_data=sign_callback("stats", user_id)),
+            InlineKeyboardButton("🌟 Features", callback_data=sign_callback("features", user_id))
         ],
         [
             InlineKeyboardButton("👨‍💻 Developer", url="http://t.me/Malli4U_Admin_Bot"),
@@ -587,9 +1339,11 @@ async def help_command(bot: Client, message: Message):
     if message.from_user and user_manager.is_banned(message.from_user.id):
         return await message.reply("❌ You are banned from using this bot.")
     
+    user_id = message.from_user.id
+    
     keyboard = InlineKeyboardMarkup([
         [
-            InlineKeyboardButton("🔙 Back to Start", callback_data="back_start"),
+            InlineKeyboardButton("🔙 Back to Start", callback_data=sign_callback("back_start", user_id)),
             InlineKeyboardButton("💎 Get Premium", url="https://t.me/M4U_Admin_Bot")
         ]
     ])
@@ -649,20 +1403,27 @@ async def stats_command(bot: Client, message: Message):
     
     keyboard = InlineKeyboardMarkup([
         [
-            InlineKeyboardButton("🔙 Back to Start", callback_data="back_start"),
+            InlineKeyboardButton("🔙 Back to Start", callback_data=sign_callback("back_start", user_id)),
             InlineKeyboardButton("💎 Upgrade Premium", url="http://t.me/Malli4U_Admin_Bot")
         ]
     ])
     
     if user_manager.is_admin(user_id):
         stats = user_manager.get_stats()
+        seasons = season_store.stats()
+        negatives = negative_cache.stats()
         stats_text = (
             "👑 **Admin Dashboard** 👑\n\n"
             f"📊 **Bot Statistics:**\n"
             f"┣ 👥 **Total Users:** {stats['total_users']}\n"
             f"┣ 💎 **Premium Users:** {stats['premium_users']}\n"
             f"┣ 🚫 **Banned Users:** {stats['banned_users']}\n"
+            f"┣ 📺 **Season Store:** {seasons['entries']}/{seasons['max_entries']} ({seasons['memory_bytes'] / 1024:.1f} KB)\n"
+            f"┣ ⛔ **Negative Cache:** {negatives['links']} links, {negatives['domains']} domains, {negatives['hits']} hits\n"
+            f"{format_upstream(await upstream_stats())}"
             f"┗ 🤖 **Bot Status:** Online ✅\n\n"
+            f"{format_activity(metrics.rollups())}"
+            f"{format_resolvers(resolver_chain.summary())}"
             f"⚡ **System Info:**\n"
             f"┣ 🌟 **Your Role:** Administrator\n"
             f"┣ 🔑 **Access Level:** Full Control\n"
@@ -677,7 +1438,7 @@ async def stats_command(bot: Client, message: Message):
             f"┗ Full access to all features"
         )
     else:
-        daily_usage = user_manager.get_daily_usage(user_id)
+        daily_usage = await coordinator.get_usage(user_id)
         is_premium = user_manager.is_premium(user_id)
         
         stats_text = (
@@ -731,14 +1492,16 @@ async def commands_menu(bot: Client, message: Message):
     if message.from_user and user_manager.is_banned(message.from_user.id):
         return await message.reply("❌ You are banned from using this bot.")
     
+    user_id = message.from_user.id
+    
     keyboard = InlineKeyboardMarkup([
         [
-            InlineKeyboardButton("🔙 Back to Start", callback_data="back_start"),
+            InlineKeyboardButton("🔙 Back to Start", callback_data=sign_callback("back_start", user_id)),
             InlineKeyboardButton("📞 Contact Support", url="http://t.me/Malli4U_Admin_Bot")
         ]
     ])
     
-    is_admin = user_manager.is_admin(message.from_user.id)
+    is_admin = user_manager.is_admin(user_id)
     
     commands_text = (
         "📋 **Complete Commands List** 📋\n\n"
@@ -792,16 +1555,30 @@ async def commands_menu(bot: Client, message: Message):
     
     await safe_send_message(bot, message.chat.id, commands_text, reply_markup=keyboard)
 
-# SIMPLIFIED Callback Query Handler - NO SESSIONS
+# Callback Query Handler - buttons are signed, so no sessions are stored
 @Client.on_callback_query()
 async def handle_callbacks(bot: Client, callback_query):
-    data = callback_query.data
     user_id = callback_query.from_user.id
     message = callback_query.message
     
+    # Ownership and age are checked from the signed callback_data alone, on any replica
+    session = parse_callback(callback_query.data)
+    if not session:
+        await callback_query.answer("❌ Invalid button! Please use /start again.", show_alert=True)
+        return
+    
+    data, owner_id, issued_at = session
+    if user_id != owner_id:
+        await callback_query.answer("❌ Not yours! Only the person who requested can use these buttons.", show_alert=True)
+        return
+    
+    if time.time() - issued_at > SESSION_TTL:
+        await callback_query.answer("❌ Session expired! Please use /start again.", show_alert=True)
+        return
+    
     # Back buttons
     back_keyboard = InlineKeyboardMarkup([
-        [InlineKeyboardButton("🔙 Back to Start", callback_data="back_start")]
+        [InlineKeyboardButton("🔙 Back to Start", callback_data=sign_callback("back_start", user_id))]
     ])
     
     if data == "howto":
@@ -872,7 +1649,7 @@ async def handle_callbacks(bot: Client, callback_query):
         premium_keyboard = InlineKeyboardMarkup([
             [
                 InlineKeyboardButton("💎 Buy Premium", url="http://t.me/Malli4U_Admin_Bot"),
-                InlineKeyboardButton("🔙 Back", callback_data="back_start")
+                InlineKeyboardButton("🔙 Back", callback_data=sign_callback("back_start", user_id))
             ]
         ])
         
@@ -887,7 +1664,10 @@ async def handle_callbacks(bot: Client, callback_query):
                 f"┣ 👥 **Total Users:** {stats['total_users']}\n"
                 f"┣ 💎 **Premium Users:** {stats['premium_users']}\n"
                 f"┣ 🚫 **Banned Users:** {stats['banned_users']}\n"
+                f"{format_upstream(await upstream_stats())}"
                 f"┗ 🤖 **Bot Status:** Online ✅\n\n"
+                f"{format_activity(metrics.rollups())}"
+                f"{format_resolvers(resolver_chain.summary())}"
                 f"⚡ **System Info:**\n"
                 f"┣ 🌟 **Your Role:** Administrator\n"
                 f"┣ 🔑 **Access Level:** Full Control\n"
@@ -901,7 +1681,7 @@ async def handle_callbacks(bot: Client, callback_query):
                 f"┗ All admin functions active"
             )
         else:
-            daily_usage = user_manager.get_daily_usage(user_id)
+            daily_usage = await coordinator.get_usage(user_id)
             is_premium = user_manager.is_premium(user_id)
             
             stats_text = (
@@ -996,12 +1776,10 @@ async def handle_callbacks(bot: Client, callback_query):
     
     elif data == "back_start":
         # Go back to start message
-        user_id = callback_query.from_user.id
-        
         # Get user info
         is_premium = user_manager.is_premium(user_id)
         is_admin = user_manager.is_admin(user_id)
-        daily_usage = user_manager.get_daily_usage(user_id)
+        daily_usage = await coordinator.get_usage(user_id)
         
         status_emoji = "👑" if is_admin else "💎" if is_premium else "🆓"
         status_text = "Admin" if is_admin else "Premium User" if is_premium else "Free User"
@@ -1010,12 +1788,12 @@ async def handle_callbacks(bot: Client, callback_query):
         # SIMPLE keyboard with URL buttons and basic callback buttons
         keyboard = InlineKeyboardMarkup([
             [
-                InlineKeyboardButton("📚 How to Use", callback_data="howto"),
-                InlineKeyboardButton("💎 Premium Details", callback_data="premium")
+                InlineKeyboardButton("📚 How to Use", callback_data=sign_callback("howto", user_id)),
+                InlineKeyboardButton("💎 Premium Details", callback_data=sign_callback("premium", user_id))
             ],
             [
-                InlineKeyboardButton("📊 My Stats", callback_data="stats"),
-                InlineKeyboardButton("🌟 Features", callback_data="features")
+                InlineKeyboardButton("📊 My Stats", callback_data=sign_callback("stats", user_id)),
+                InlineKeyboardButton("🌟 Features", callback_data=sign_callback("features", user_id))
             ],
             [
                 InlineKeyboardButton("👨‍💻 Developer", url="http://t.me/Malli4U_Admin_Bot"),
@@ -1065,6 +1843,7 @@ async def handle_callbacks(bot: Client, callback_query):
 
 # Admin Commands
 @Client.on_message(filters.command(["addpre"]) & filters.user(ADMIN_ID))
+@concurrency_limit("admin", ADMIN_CONCURRENCY)
 async def handle_add_premium(bot: Client, message: Message):
     if len(message.command) < 2:
         return await message.reply("❌ Usage: `/addpre <user_id> [days]`")
@@ -1087,6 +1866,7 @@ async def handle_add_premium(bot: Client, message: Message):
         await message.reply(f"ℹ️ User `{user_id}` is already a premium user.")
 
 @Client.on_message(filters.command(["removepre", "rp"]) & filters.user(ADMIN_ID))
+@concurrency_limit("admin", ADMIN_CONCURRENCY)
 async def handle_remove_premium(bot: Client, message: Message):
     if len(message.command) != 2:
         return await message.reply("❌ Usage: `/removepre <user_id>`")
@@ -1108,6 +1888,7 @@ async def handle_remove_premium(bot: Client, message: Message):
         await message.reply(f"ℹ️ User `{user_id}` is not a premium user.")
 
 @Client.on_message(filters.command(["ban"]) & filters.user(ADMIN_ID))
+@concurrency_limit("admin", ADMIN_CONCURRENCY)
 async def handle_ban_user(bot: Client, message: Message):
     if len(message.command) != 2:
         return await message.reply("❌ Usage: `/ban <user_id>`")
@@ -1126,6 +1907,7 @@ async def handle_ban_user(bot: Client, message: Message):
     )
 
 @Client.on_message(filters.command(["unban"]) & filters.user(ADMIN_ID))
+@concurrency_limit("admin", ADMIN_CONCURRENCY)
 async def handle_unban_user(bot: Client, message: Message):
     if len(message.command) != 2:
         return await message.reply("❌ Usage: `/unban <user_id>`")
@@ -1145,6 +1927,7 @@ async def handle_unban_user(bot: Client, message: Message):
 
 # Broadcast Command
 @Client.on_message(filters.command(["broadcast"]) & filters.user(ADMIN_ID))
+@concurrency_limit("broadcast", BROADCAST_CONCURRENCY, background=True)
 async def handle_broadcast(bot: Client, message: Message):
     if len(message.command) < 2:
         return await message.reply("❌ Usage: `/broadcast <message>`")
@@ -1158,10 +1941,8 @@ async def handle_broadcast(bot: Client, message: Message):
     success_count = 0
     failed_count = 0
     
-    # Get all users from user_manager
-    users = user_manager.get_all_users()  # You'll need to implement this method
-    
-    for user_id in users:
+    # Users are read in fixed-size batches, so memory use doesn't grow with the userbase
+    async for user_id in user_manager.iter_users():
         result = await safe_send_message(
             bot,
             user_id,
@@ -1184,6 +1965,7 @@ async def handle_broadcast(bot: Client, message: Message):
 
 # ENHANCED Main Bypass Handler with Multi-Link Support
 @Client.on_message(filters.command(["by", "!by"]))
+@concurrency_limit("by", BY_CONCURRENCY)
 async def handle_by(bot: Client, message: Message):
     global bot_instance
     bot_instance = bot
@@ -1201,8 +1983,7 @@ async def handle_by(bot: Client, message: Message):
         )
     
     # Extract multiple links from the message text
-    text = message.text.replace("/by", "").replace("!by", "").strip()
-    urls = extract_multiple_links(message.text)
+    urls = extract_multiple_links(message.text, message.entities)
     
     if not urls:
         return await message.reply(
@@ -1215,10 +1996,11 @@ async def handle_by(bot: Client, message: Message):
             parse_mode=ParseMode.MARKDOWN
         )
     
-    # Block softurl.in links
-    if any("softurl.in" in url.lower() for url in urls):
+    # Block hosts the domain table marks as blocked (softurl.in and friends)
+    blocked = next((url for url in urls if domain_classifier.classify(url).blocked), None)
+    if blocked:
         return await message.reply(
-            "⚠️ **Softurl.in links are not supported!**\n\n"
+            f"⚠️ **{host_of(blocked)} links are not supported!**\n\n"
             "These links cannot be bypassed for security reasons.\n\n"
             "📞 Contact admin for more information: @Malli4U_Admin_Bot"
         )
@@ -1246,8 +2028,12 @@ async def handle_by(bot: Client, message: Message):
             return
     
     # Rate limit for free users (counts as 1 request regardless of number of links)
-    if not (user_manager.is_premium(uid) or user_manager.is_admin(message.from_user.id)):
-        if user_manager.get_daily_usage(message.from_user.id) >= 3:
+    is_free = not (user_manager.is_premium(uid) or user_manager.is_admin(message.from_user.id))
+    if is_free:
+        # The request is reserved up front, so /by commands sent back to back can't all
+        # pass the check; outcomes that come to nothing give it back (REFUNDED_KINDS)
+        if await coordinator.incr_usage(message.from_user.id) > 3:
+            await coordinator.refund_usage(message.from_user.id)
             return await message.reply(
                 "⚠️ **Daily Limit Reached!** 😔\n\n"
                 "You have reached your daily limit of **3 requests**.\n\n"
@@ -1264,79 +2050,180 @@ async def handle_by(bot: Client, message: Message):
                 parse_mode=ParseMode.MARKDOWN
             )
     
-    # Extract season
-    season = re.search(r"season\s*\d+", message.text, re.IGNORECASE)
+    # Remember the season a user mentions so later results for the same show or links are labelled
+    season = extract_season(message.text)
+    show = extract_show(message.text)
+    link_keys = [url_key(url) for url in urls]
     if season:
-        key = f"{message.chat.id}:{message.from_user.id}"
-        season_store[key] = season.group(0)
-        save_season_store(season_store)
-    
-    await message.reply_chat_action(ChatAction.TYPING)
-    
-    # Ensure user client connected
-    if not getattr(user_client, "is_connected", False):
-        if not await init_user_client():
-            return await message.reply(
-                "❌ **Service Unavailable**\n\n"
-                "Could not connect to bypass service. Please try again later.\n\n🆘 **Support:** @M4U_Admin_Bot", 
-                parse_mode=ParseMode.MARKDOWN
-            )
-    
-    # Join multiple links with spaces for DD bypass bot
-    links_str = " ".join(urls)
-    link_count = len(urls)
+        season_store.set(message.chat.id, season, show, link_keys)
+    else:
+        season = season_store.get(message.chat.id, show, link_keys)
     
-    # Create initial status message with animation
+    # Create initial status message
     status_msg = await message.reply(
-        f"🚀 **Initiating bypass process for {link_count} link(s)...**\n\n⏱️ **Status:** Starting...", 
+        f"🚀 **Initiating bypass process for {len(urls)} link(s)...**\n\n⏱️ **Status:** Starting...", 
         parse_mode=ParseMode.MARKDOWN
     )
+    metrics.record_request(len(urls))
     
-    try:
-        sent = await user_client.send_message(BYPASS_BOT_USERNAME, f"B {links_str}")
-        print(f"[DEBUG] Sent multi-link bypass request with message ID: {sent.id} for {link_count} links")
-    except Exception as e:
-        print(f"[DEBUG] Error sending message: {e}")
-        await status_msg.delete()
-        return await message.reply(
-            "❌ **Request Failed**\n\n"
-            "Could not send bypass request. Please try again later.\n\n🆘 **Support:** @M4U_Admin_Bot", 
-            parse_mode=ParseMode.MARKDOWN
-        )
-    
-    if not (user_manager.is_premium(uid) or user_manager.is_admin(message.from_user.id)):
-        user_manager.increment_usage(message.from_user.id)
-    
-    # Store all original links as a single string (space-separated)
-    pending_bypass_requests[sent.id] = {
+    job = {
         "group_id": group_id,
         "user_id": message.from_user.id,
         "original_msg_id": message.id,
-        "original_link": links_str,  # All links as space-separated string
-        "link_count": link_count,
-        "time_sent": asyncio.get_event_loop().time(),
-        "status_msg": status_msg,
-        "chat_type": chat_type
+        "status_chat_id": status_msg.chat.id,
+        "status_msg_id": status_msg.id,
+        "chat_type": getattr(chat_type, "value", chat_type),
+        "charge": is_free,  # a request was reserved from the free quota
+        "season": season,
+        "submitted_at": time.time()
     }
     
-    # Start animation task
-    asyncio.create_task(animate_processing_message(status_msg, 20))
+    if len(urls) > 1:
+        # Several links share this message, which fills in as each one settles
+        job.update(progressive=True, total=len(urls))
+        asyncio.create_task(safe_resolve_progressively(job, urls))
+        return
+    
+    # Cached and plain redirect links are answered here; only the rest need the bypass bot
+    resolved, deferred = await resolver_chain.resolve_many(urls)
+    if resolved:
+        job["resolved"] = [(url, resolved[url]) for url in urls if url in resolved]
+    
+    # Links the bypass bot recently failed on aren't sent again until their TTL runs out
+    rejected = {url: hit for url, _ in deferred if (hit := negative_cache.check(url))}
+    if rejected:
+        job["skipped"] = list(rejected)
+        deferred = [(url, link) for url, link in deferred if url not in rejected]
+        if not deferred and not resolved:
+            waits = [left for _, left in rejected.values()]
+            retry_after = None if None in waits else max(waits)
+            await coordinator.publish_result(dict(job, kind="rejected", retry_after=retry_after))
+            return
+    
+    if not deferred:
+        metrics.record_result(True, time.time() - job["submitted_at"])
+        await coordinator.publish_result(dict(job, kind="result"))
+        return
+    
+    # Fail fast instead of queueing behind a bypass bot that isn't answering
+    breaker = await coordinator.cache_get("breaker")
+    if breaker and breaker["state"] == OPEN and breaker["retry_after"] > 0:
+        metrics.record_result(False)
+        await coordinator.publish_result(dict(job, kind="circuit_open", retry_after=breaker["retry_after"]))
+        return
     
-    print(f"[DEBUG] Added pending multi-link request: {sent.id} with {link_count} links")
+    # The user's links key the result and caches; the hops a resolver reached are what gets sent
+    job.update(upstream_fields(deferred))
+    
+    # Queue the job; an upstream worker sends it to the bypass bot
+    await coordinator.submit_job(job)
+    
+    if not EDIT_RESULTS:
+        # The animation would race the result edit, so it only runs when the result is a new message
+        asyncio.create_task(animate_processing_message(status_msg, 20))
+
+async def backfill_responses():
+    """Replay bypass bot replies that arrived while the session was offline"""
+    pending = await coordinator.pending_requests()
+    if not pending:
+        return
+    
+    for bot in UPSTREAM_BOTS:
+        waiting = [rid for rid, req in pending.items() if req.get("bot", BYPASS_BOT_USERNAME).lower() == bot]
+        if not waiting:
+            continue
+        
+        oldest_request = min(waiting)
+        missed = []
+        async for msg in user_client.get_chat_history(bot, limit=BACKFILL_LIMIT):
+            if msg.id <= oldest_request:
+                break
+            if not msg.outgoing and msg.id not in handled_responses:
+                missed.append(msg)
+        
+        print(f"[DEBUG] Back-filling {len(missed)} messages from {bot} for {len(waiting)} pending requests")
+        for msg in reversed(missed):
+            await handle_bypass_response(user_client, msg)
+
+upstream.on_connected.append(backfill_responses)
+
+async def expire_requests(pending):
+    """Give up on pending requests older than PENDING_MAX_AGE; returns the ids too old to resume"""
+    now = time.time()
+    expired = {rid for rid, req in pending.items() if now - req.get("time_sent", now) > PENDING_MAX_AGE}
+    for rid in expired:
+        if await coordinator.pop_pending(rid):
+            req = pending[rid]
+            settle_request(rid, None)
+            record_outcome(req, False)
+            resolver_chain.record_upstream(req.get("bot"), req["original_link"].split(), False, now - req.get("time_sent", now))
+            # Only this worker saw the bot's other replies; orphans of a dead worker can't tell
+            link_timeout = last_reply_at.get(req.get("bot"), 0) > req.get("time_sent", now)
+            await coordinator.publish_result(dict(req, kind="expired", link_timeout=link_timeout))
+    return expired
+
+async def recover_inflight():
+    """Pick up requests that were in flight when the previous process stopped.
+
+    Pending requests come back from the coordination store by message id and
+    are reconciled by the history back-fill on connect; whatever is still
+    unanswered gets its status message re-attached, or a timeout notice once
+    it is older than PENDING_MAX_AGE. Jobs that never reached the bypass bot
+    are queued again.
+    """
+    await coordinator.heartbeat()
+    pending = await coordinator.pending_requests()
+    expired = await expire_requests(pending)
+    for rid, req in pending.items():
+        if rid not in expired:
+            await coordinator.publish_result(dict(req, kind="resumed"))
+    # Requests of workers that are gone for good can't be reconciled, only answered
+    await expire_requests(await coordinator.orphaned_requests())
+    
+    requeued = await coordinator.recover_jobs()
+    for job in requeued:
+        await coordinator.publish_result(dict(job, kind="resumed"))
+    
+    if pending or requeued:
+        print(f"[DEBUG] Recovered {len(pending)} pending requests and {len(requeued)} queued jobs")
+
+async def warm_peers(client, peers):
+    """Pre-resolve peers at startup so the first /by doesn't pay for the lookup"""
+    for peer in peers:
+        try:
+            elapsed = await warm_peer(client, peer)
+            print(f"[DEBUG] Resolved peer {peer} in {elapsed * 1000:.0f}ms")
+        except Exception as e:
+            print(f"[DEBUG] Could not pre-resolve peer {peer}: {e}")
 
 # Initialization tasks
+background_tasks = []
+
+async def connect_upstream():
+    """Log the bypass session in and resolve the bypass bot, unless already connected"""
+    if not await upstream.wait_ready(UPSTREAM_READY_TIMEOUT):
+        print("[DEBUG] User client not ready yet, reconnecting in the background")
+        return False
+    print("[DEBUG] Bypass handler initialized successfully")
+    await warm_peers(user_client, list(UPSTREAM_BOTS))
+    return True
+
 async def start_tasks():
-    if await init_user_client():
-        print("[DEBUG] Bypass handler initialized successfully")
-        print("[DEBUG] Enhanced animation system activated")
-        print("[DEBUG] Multi-link support enabled")
-        print("[DEBUG] Clickable links system enabled")
-        print("[DEBUG] SIMPLIFIED start system activated")
-        print("[DEBUG] Error handling system active")
-        print("[DEBUG] Auto-delete system enabled")
-        print("[DEBUG] All systems operational")
-    else:
-        print("[DEBUG] Failed to initialize user client")
+    # The upstream session is connected by its own startup phase; the watchdog keeps it up
+    if BOT_ROLE in ("all", "upstream"):
+        await recover_inflight()
+        background_tasks.append(asyncio.create_task(dispatch_jobs()))
+        background_tasks.append(asyncio.create_task(watch_upstream()))
+        background_tasks.append(asyncio.create_task(upstream.watch(WATCHDOG_INTERVAL)))
+    
+    if BOT_ROLE in ("all", "frontend"):
+        if bot_instance:
+            await warm_peers(bot_instance, [TARGET_GROUP_ID])
+        background_tasks.append(asyncio.create_task(deliver_results()))
+    
+    background_tasks.append(asyncio.create_task(metrics.run()))
+    print(f"[DEBUG] Worker {WORKER_ID} running as '{BOT_ROLE}'")
+    print("[DEBUG] All systems operational")
 
 async def check_premium_expiry():
     while True:
@@ -0,0 +1,52 @@
+# plugins/callback_signer.py
+import hmac
+import time
+import base64
+import hashlib
+from config import BOT_TOKEN, CALLBACK_SECRET
+
+# Telegram rejects callback_data longer than 64 bytes
+MAX_CALLBACK_DATA = 64
+SIGNATURE_BYTES = 9
+
+# Every replica derives the same key, so any of them can verify a button
+_key = hashlib.sha256((CALLBACK_SECRET or BOT_TOKEN or "").encode()).digest()
+
+def _b36(number):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        number, rem = divmod(number, 36)
+        out = digits[rem] + out
+        if not number:
+            return out
+
+def _signature(payload):
+    digest = hmac.new(_key, payload.encode(), hashlib.sha256).digest()[:SIGNATURE_BYTES]
+    return base64.urlsafe_b64encode(digest).decode()
+
+def sign_callback(action, user_id, issued_at=None):
+    """Build callback_data carrying action, owner and issue time, signed with HMAC"""
+    issued_at = int(time.time() if issued_at is None else issued_at)
+    payload = f"{action}.{_b36(int(user_id))}.{_b36(issued_at)}"
+    data = f"{payload}.{_signature(payload)}"
+    if len(data.encode()) > MAX_CALLBACK_DATA:
+        raise ValueError(f"callback_data too long for action {action!r}")
+    return data
+
+def parse_callback(data):
+    """Return (action, user_id, issued_at) for a genuine payload, None otherwise"""
+    # Clients can send any callback_data, including bytes that are not UTF-8
+    if not isinstance(data, str):
+        return None
+    parts = data.split(".")
+    if len(parts) != 4:
+        return None
+    action, owner, issued, signature = parts
+    payload = f"{action}.{owner}.{issued}"
+    if not hmac.compare_digest(signature.encode(), _signature(payload).encode()):
+        return None
+    try:
+        return action, int(owner, 36), int(issued, 36)
+    except ValueError:
+        return None
@@ -0,0 +1,52 @@
+# plugins/concurrency.py
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from config import BLOCKING_WORKERS
+
+# Bounded pool for file I/O and parsing so it never runs on the event loop
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking")
+
+_semaphores = {}
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking callable on the bounded executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(func, *args, **kwargs))
+
+def _semaphore(name, limit):
+    if name not in _semaphores:
+        _semaphores[name] = asyncio.Semaphore(limit)
+    return _semaphores[name]
+
+def concurrency_limit(name, limit, background=False):
+    """Cap how many instances of a handler run at once.
+
+    With ``background=True`` the handler is moved off the Pyrogram worker into
+    its own task, so long jobs like /broadcast never hold a worker that /by needs.
+    """
+    def decorator(func):
+        async def limited(*args, **kwargs):
+            async with _semaphore(name, limit):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    if not background:
+                        raise
+                    print(f"[DEBUG] Background handler {name} failed: {e}")
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if background:
+                asyncio.create_task(limited(*args, **kwargs))
+                return
+            return await limited(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def running_in_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
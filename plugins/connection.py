@@ -0,0 +1,129 @@
+# plugins/connection.py
+import time
+import random
+import asyncio
+from collections import deque
+from config import RECONNECT_BASE_DELAY, RECONNECT_MAX_DELAY, UPSTREAM_MAX_WAITERS
+
+
+class UpstreamConnection:
+    """Single owner of (re)connecting the bypass user session.
+
+    Only one reconnect runs at a time; every request that finds the session
+    down waits on the same readiness event instead of calling stop()/start()
+    itself. Waiting is bounded both in time and in the number of waiters.
+    Failed attempts back off exponentially with full jitter.
+    """
+
+    def __init__(self, client, connect, max_waiters=UPSTREAM_MAX_WAITERS,
+                 base_delay=RECONNECT_BASE_DELAY, max_delay=RECONNECT_MAX_DELAY):
+        self.client = client
+        self._connect = connect
+        self.max_waiters = max_waiters
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.waiters = 0
+        self.failed_attempts = 0
+        self.reconnects = 0
+        self.gaps = deque(maxlen=50)
+        self.last_ok = None
+        self.down_since = None
+        # Coroutines run after every successful (re)connect, e.g. history back-fill
+        self.on_connected = []
+        self._ready = None
+        self._task = None
+
+    @property
+    def is_connected(self):
+        return bool(getattr(self.client, "is_connected", False))
+
+    def _event(self):
+        if self._ready is None:
+            self._ready = asyncio.Event()
+        return self._ready
+
+    def ensure_reconnect(self):
+        """Start a reconnect unless one is already running; returns its task"""
+        if self._task is None or self._task.done():
+            self._event().clear()
+            self._task = asyncio.create_task(self._reconnect_loop())
+        return self._task
+
+    async def wait_ready(self, timeout):
+        """Wait until the session is connected; False on timeout or when too many are waiting"""
+        if self.is_connected and (self._task is None or self._task.done()):
+            return True
+        if self.waiters >= self.max_waiters:
+            print(f"[DEBUG] Upstream wait queue full ({self.waiters} waiting)")
+            return False
+
+        self.waiters += 1
+        try:
+            self.ensure_reconnect()
+            await asyncio.wait_for(self._event().wait(), timeout)
+            return self.is_connected
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiters -= 1
+
+    def mark_down(self):
+        """Record the start of an outage: the last moment the session was known good"""
+        if self.down_since is None and self.last_ok is not None:
+            self.down_since = self.last_ok
+
+    async def _reconnect_loop(self):
+        self.mark_down()
+        attempt = 0
+        while True:
+            if await self._connect():
+                break
+            attempt += 1
+            self.failed_attempts += 1
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            print(f"[DEBUG] Upstream connect attempt {attempt} failed, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        
+        self.last_ok = time.monotonic()
+        if self.down_since is not None:
+            gap = self.last_ok - self.down_since
+            self.gaps.append(gap)
+            self.reconnects += 1
+            self.down_since = None
+            print(f"[DEBUG] Upstream reconnected after a {gap:.1f}s gap (reconnect #{self.reconnects})")
+        self._event().set()
+        
+        for hook in self.on_connected:
+            try:
+                await hook()
+            except Exception as e:
+                print(f"[DEBUG] Upstream on_connected hook failed: {e}")
+
+    async def _probe(self, timeout):
+        try:
+            await asyncio.wait_for(self.client.get_me(), timeout)
+            return True
+        except Exception:
+            return False
+
+    async def watch(self, interval, probe_timeout=10):
+        """Watchdog: probe the session periodically and reconnect before a request notices"""
+        while True:
+            await asyncio.sleep(interval)
+            if self._task is not None and not self._task.done():
+                continue
+            if self.is_connected and await self._probe(probe_timeout):
+                self.last_ok = time.monotonic()
+                continue
+            print("[DEBUG] Upstream session looks down, reconnecting proactively")
+            self.ensure_reconnect()
+
+    def stats(self):
+        return {
+            "connected": self.is_connected,
+            "reconnects": self.reconnects,
+            "failed_attempts": self.failed_attempts,
+            "waiters": self.waiters,
+            "last_gap": round(self.gaps[-1], 1) if self.gaps else None,
+            "max_gap": round(max(self.gaps), 1) if self.gaps else None,
+        }
@@ -0,0 +1,358 @@
+# plugins/coordination.py
+import os
+import json
+import time
+import uuid
+import asyncio
+from datetime import datetime
+from config import COORDINATION_URL, COORDINATION_NAMESPACE, WORKER_ID, WORKER_HEARTBEAT_TTL, DATA_DIR
+from .user_manager import user_manager
+from .concurrency import run_blocking
+from .atomic_file import write_atomic, load_json
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # optional dependency, only needed for shared deployments
+    aioredis = None
+
+JOBS_QUEUE = "jobs"
+JOBS_HASH = "inflight_jobs"
+RESULTS_QUEUE = "results"
+PENDING_HASH = "pending"
+
+# Hashes that hold in-flight work and must survive a restart of a single process
+PERSISTED_HASHES = (JOBS_HASH, PENDING_HASH)
+INFLIGHT_FILE = os.path.join(DATA_DIR, "inflight.json")
+
+
+class MemoryBackend:
+    """In-process backend: dicts and asyncio queues, for single-process deployments"""
+
+    shared = False
+
+    def __init__(self, persist_path=None):
+        self._hashes = {}
+        self._values = {}
+        self._queues = {}
+        self.persist_path = persist_path
+        self._dirty = False
+        self._writer = None
+        if persist_path:
+            self._hashes = self._load()
+
+    def _load(self):
+        try:
+            data = load_json(self.persist_path) or {}
+            return {name: data.get(name, {}) for name in PERSISTED_HASHES}
+        except Exception as e:
+            print(f"[DEBUG] Could not load in-flight requests: {e}")
+            return {}
+
+    def _changed(self, name):
+        if not self.persist_path or name not in PERSISTED_HASHES:
+            return
+        self._dirty = True
+        if self._writer is None:
+            self._writer = asyncio.ensure_future(self._write_pending())
+
+    async def _write_pending(self):
+        try:
+            while self._dirty:
+                self._dirty = False
+                snapshot = {name: self._hashes.get(name, {}) for name in PERSISTED_HASHES}
+                payload = json.dumps(snapshot, separators=(",", ":"))
+                await run_blocking(self._write_file, payload)
+        finally:
+            self._writer = None
+
+    def _write_file(self, payload):
+        try:
+            write_atomic(self.persist_path, payload)
+        except Exception as e:
+            print(f"[DEBUG] Could not save in-flight requests: {e}")
+
+    def _queue(self, name):
+        if name not in self._queues:
+            self._queues[name] = asyncio.Queue()
+        return self._queues[name]
+
+    async def hset(self, name, key, value):
+        self._hashes.setdefault(name, {})[str(key)] = value
+        self._changed(name)
+
+    async def hget(self, name, key):
+        return self._hashes.get(name, {}).get(str(key))
+
+    async def hdel(self, name, key):
+        value = self._hashes.get(name, {}).pop(str(key), None)
+        if value is not None:
+            self._changed(name)
+        return value
+
+    async def hgetall(self, name):
+        return dict(self._hashes.get(name, {}))
+
+    async def hclear(self, name):
+        if self._hashes.pop(name, None):
+            self._changed(name)
+            return True
+        return False
+
+    async def get(self, key):
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= asyncio.get_event_loop().time():
+            del self._values[key]
+            return None
+        return value
+
+    async def set(self, key, value, ttl=None):
+        expires_at = asyncio.get_event_loop().time() + ttl if ttl else None
+        self._values[key] = (value, expires_at)
+
+    async def incr(self, key, amount=1, ttl=None):
+        value = (await self.get(key) or 0) + amount
+        entry = self._values.get(key)
+        if entry is not None and entry[1] is not None:
+            self._values[key] = (value, entry[1])
+        else:
+            await self.set(key, value, ttl)
+        return value
+
+    async def push(self, queue, item):
+        self._queue(queue).put_nowait(item)
+
+    async def pop(self, queue, timeout=None):
+        try:
+            return await asyncio.wait_for(self._queue(queue).get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        while self._writer is not None:
+            await self._writer
+
+
+class RedisBackend:
+    """Shared backend for any Redis-compatible server (Redis, KeyDB, Valkey, ...)"""
+
+    shared = True
+
+    def __init__(self, url, namespace):
+        if aioredis is None:
+            raise RuntimeError("COORDINATION_URL is set but the 'redis' package is not installed")
+        self.client = aioredis.from_url(url, decode_responses=True)
+        self.namespace = namespace
+
+    def _key(self, name):
+        return f"{self.namespace}:{name}"
+
+    async def hset(self, name, key, value):
+        await self.client.hset(self._key(name), str(key), json.dumps(value))
+
+    async def hget(self, name, key):
+        raw = await self.client.hget(self._key(name), str(key))
+        return json.loads(raw) if raw is not None else None
+
+    async def hdel(self, name, key):
+        # HGET + HDEL in one transaction so only one replica wins the entry
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hget(self._key(name), str(key))
+            pipe.hdel(self._key(name), str(key))
+            raw, removed = await pipe.execute()
+        return json.loads(raw) if raw is not None and removed else None
+
+    async def hgetall(self, name):
+        raw = await self.client.hgetall(self._key(name))
+        return {k: json.loads(v) for k, v in raw.items()}
+
+    async def hclear(self, name):
+        # DEL is atomic, so only one replica sees the hash go
+        return await self.client.delete(self._key(name)) > 0
+
+    async def get(self, key):
+        raw = await self.client.get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key, value, ttl=None):
+        await self.client.set(self._key(key), json.dumps(value), ex=ttl)
+
+    async def incr(self, key, amount=1, ttl=None):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.incrby(self._key(key), amount)
+            if ttl:
+                pipe.expire(self._key(key), ttl)
+            results = await pipe.execute()
+        return results[0]
+
+    async def push(self, queue, item):
+        await self.client.rpush(self._key(queue), json.dumps(item))
+
+    async def pop(self, queue, timeout=None):
+        # BLPOP treats 0 as "block forever"
+        result = await self.client.blpop(self._key(queue), timeout=timeout or 0)
+        return json.loads(result[1]) if result else None
+
+    async def close(self):
+        # redis-py 5 renamed close() to aclose()
+        await getattr(self.client, "aclose", self.client.close)()
+
+
+class Coordinator:
+    """Shared state for bot replicas: pending requests, the job/result bus, caches and quotas.
+
+    Frontends turn /by commands into jobs and deliver results through the bot API.
+    Upstream workers own a user session, send jobs to the bypass bot and publish
+    parsed replies as results. With the memory backend both roles run in one process.
+    """
+
+    def __init__(self, backend, worker_id=WORKER_ID):
+        self.backend = backend
+        self.worker_id = worker_id
+
+    # --- Pending upstream requests ---
+    async def add_pending(self, request_id, record):
+        record = dict(record, worker=self.worker_id)
+        await self.backend.hset(PENDING_HASH, request_id, record)
+
+    async def pop_pending(self, request_id):
+        return await self.backend.hdel(PENDING_HASH, request_id)
+
+    async def pending_requests(self):
+        """Pending requests sent by this worker's upstream session, keyed by message id.
+
+        In-process every entry belongs to this process's session, whatever
+        worker id it was written under.
+        """
+        pending = await self.backend.hgetall(PENDING_HASH)
+        return {
+            int(rid): req for rid, req in pending.items()
+            if not self.backend.shared or req.get("worker") == self.worker_id
+        }
+
+    async def orphaned_requests(self):
+        """Pending requests of other workers that stopped sending heartbeats, keyed by message id"""
+        if not self.backend.shared:
+            return {}
+        pending = await self.backend.hgetall(PENDING_HASH)
+        alive = {}
+        orphaned = {}
+        for rid, req in pending.items():
+            worker = req.get("worker")
+            if worker not in alive:
+                alive[worker] = await self.worker_alive(worker)
+            if not alive[worker]:
+                orphaned[int(rid)] = req
+        return orphaned
+
+    # --- Worker liveness ---
+    async def heartbeat(self, ttl=WORKER_HEARTBEAT_TTL):
+        await self.backend.set(f"worker:{self.worker_id}", time.time(), ttl)
+
+    async def worker_alive(self, worker_id):
+        return worker_id == self.worker_id or await self.backend.get(f"worker:{worker_id}") is not None
+
+    # --- Progressive delivery ---
+    async def add_progress(self, request_key, part_id, part):
+        """Store one finished part of a multi-link request; each part is its own field, so writers never race"""
+        await self.backend.hset(f"progress:{request_key}", part_id, part)
+
+    async def progress_parts(self, request_key):
+        return await self.backend.hgetall(f"progress:{request_key}")
+
+    async def clear_progress(self, request_key):
+        """Drop a finished request's parts; True only for the one caller that removed them"""
+        return await self.backend.hclear(f"progress:{request_key}")
+
+    # --- Job / result bus ---
+    async def submit_job(self, job):
+        # Jobs are also tracked in a hash until sent, so a crash between
+        # popping a job and sending it doesn't lose the request
+        job = dict(job, job_id=uuid.uuid4().hex[:12])
+        await self.backend.hset(JOBS_HASH, job["job_id"], job)
+        await self.backend.push(JOBS_QUEUE, job)
+        return job["job_id"]
+
+    async def next_job(self, timeout=None):
+        job = await self.backend.pop(JOBS_QUEUE, timeout)
+        if job:
+            await self.backend.hset(JOBS_HASH, job["job_id"], dict(job, claimed_by=self.worker_id))
+        return job
+
+    async def finish_job(self, job_id):
+        await self.backend.hdel(JOBS_HASH, job_id)
+
+    async def recover_jobs(self):
+        """Re-queue jobs left unsent by a previous run of this worker and return them.
+
+        With a shared store only jobs claimed by this worker, or by a worker
+        that stopped sending heartbeats, are re-queued; unclaimed ones are
+        still on the shared queue. In-process, the queue itself was lost, so
+        every tracked job goes back on it.
+        """
+        requeued = []
+        for job_id, job in (await self.backend.hgetall(JOBS_HASH)).items():
+            if self.backend.shared:
+                claimer = job.get("claimed_by")
+                if claimer is None or (claimer != self.worker_id and await self.worker_alive(claimer)):
+                    continue
+            job.pop("claimed_by", None)
+            await self.backend.hset(JOBS_HASH, job_id, job)
+            await self.backend.push(JOBS_QUEUE, job)
+            requeued.append(job)
+        return requeued
+
+    async def publish_result(self, result):
+        await self.backend.push(RESULTS_QUEUE, result)
+
+    async def next_result(self, timeout=None):
+        return await self.backend.pop(RESULTS_QUEUE, timeout)
+
+    # --- Caches ---
+    async def cache_get(self, key):
+        return await self.backend.get(f"cache:{key}")
+
+    async def cache_set(self, key, value, ttl=None):
+        await self.backend.set(f"cache:{key}", value, ttl)
+
+    # --- Quotas ---
+    async def get_usage(self, user_id):
+        if not self.backend.shared:
+            return user_manager.get_daily_usage(user_id)
+        return await self.backend.get(self._usage_key(user_id)) or 0
+
+    async def incr_usage(self, user_id):
+        if not self.backend.shared:
+            return user_manager.increment_usage(user_id)
+        return await self.backend.incr(self._usage_key(user_id), ttl=2 * 24 * 3600)
+
+    async def refund_usage(self, user_id):
+        """Give back a request reserved with incr_usage that came to nothing"""
+        if not self.backend.shared:
+            return user_manager.refund_usage(user_id)
+        key = self._usage_key(user_id)
+        count = await self.backend.incr(key, -1, ttl=2 * 24 * 3600)
+        if count < 0:
+            # The reservation was made yesterday and today's counter started at zero
+            await self.backend.incr(key, -count, ttl=2 * 24 * 3600)
+            count = 0
+        return count
+
+    @staticmethod
+    def _usage_key(user_id):
+        return f"usage:{datetime.now().strftime('%Y-%m-%d')}:{user_id}"
+
+    async def close(self):
+        """Flush in-flight state and release the backend"""
+        await self.backend.close()
+
+
+def create_backend():
+    if COORDINATION_URL:
+        return RedisBackend(COORDINATION_URL, COORDINATION_NAMESPACE)
+    return MemoryBackend(persist_path=INFLIGHT_FILE)
+
+
+coordinator = Coordinator(create_backend())
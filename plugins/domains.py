@@ -0,0 +1,220 @@
+# plugins/domains.py
+import os
+import time
+import threading
+from urllib.parse import urlsplit
+from config import DOMAIN_TABLE_FILE, DOMAIN_RELOAD_INTERVAL
+from .urlnorm import canonicalize
+from .atomic_file import load_json
+
+# Policies: "blocked" links are refused, "skip" links (promotion, support
+# channels) are left out of results and "preferred" links are listed first.
+# "resolver": "native" marks plain redirect shorteners that are followed
+# locally instead of going through the bypass bot, and "route" pins the
+# resolvers tried for a host, e.g. ["cache", "upstream"] ("upstream" is every
+# bypass bot, "upstream:<username>" a single one).
+DEFAULT_TABLE = {
+    "gofile.io": {"type": "GoFile", "emoji": "📂", "policy": "preferred"},
+    "mega.nz": {"type": "Mega", "emoji": "📦"},
+    "mega.co.nz": {"type": "Mega", "emoji": "📦"},
+    "t.me": {"type": "Telegram", "emoji": "☁️"},
+    "telegram.me": {"type": "Telegram", "emoji": "☁️"},
+    "drive.google.com": {"type": "Download Link", "emoji": "🔗"},
+    "mediafire.com": {"type": "Download Link", "emoji": "🔗"},
+    "softurl.in": {"policy": "blocked"},
+    "t.me/dd_bypass_updates": {"policy": "skip"},
+    "t.me/dd_bypass": {"policy": "skip"},
+    "t.me/dd_bypass_support": {"policy": "skip"},
+    "bit.ly": {"resolver": "native"},
+    "t.co": {"resolver": "native"},
+    "tinyurl.com": {"resolver": "native"},
+    "is.gd": {"resolver": "native"},
+    "v.gd": {"resolver": "native"},
+    "rb.gy": {"resolver": "native"},
+    "ow.ly": {"resolver": "native"},
+    "buff.ly": {"resolver": "native"},
+    "tiny.cc": {"resolver": "native"},
+}
+
+# Emoji for link types the upstream bot names itself, whatever the host
+TYPE_EMOJI = {
+    "GoFile": "📂",
+    "Mega": "📦",
+    "Telegram": "☁️",
+    "Stream": "🎥",
+    "Download Link": "🔗",
+}
+
+
+class DomainInfo:
+    __slots__ = ("type", "emoji", "policy", "resolver", "route")
+
+    def __init__(self, type=None, emoji=None, policy=None, resolver=None, route=None):
+        self.type = type
+        self.emoji = emoji
+        self.policy = policy
+        self.resolver = resolver
+        self.route = route
+
+    @property
+    def blocked(self):
+        return self.policy == "blocked"
+
+    @property
+    def skip(self):
+        return self.policy == "skip"
+
+    @property
+    def preferred(self):
+        return self.policy == "preferred"
+
+    @property
+    def native(self):
+        return self.resolver == "native"
+
+
+UNKNOWN = DomainInfo()
+
+POLICIES = frozenset({"blocked", "skip", "preferred"})
+TEXT_FIELDS = ("type", "emoji", "resolver")
+
+
+def entry_error(pattern, fields):
+    """Why a domain table entry can't be used, or None when it is valid"""
+    if not isinstance(pattern, str) or not pattern.strip("./"):
+        return "the key is not a host"
+    if not isinstance(fields, dict):
+        return f"expected an object, got {type(fields).__name__}"
+    for name in TEXT_FIELDS:
+        if fields.get(name) is not None and not isinstance(fields[name], str):
+            return f'"{name}" must be a string'
+    if fields.get("policy") is not None and fields["policy"] not in POLICIES:
+        return f'unknown policy {fields["policy"]!r}'
+    route = fields.get("route")
+    if route is not None and (not isinstance(route, list) or not all(isinstance(name, str) for name in route)):
+        return '"route" must be a list of resolver names'
+    return None
+
+
+class _Node:
+    __slots__ = ("children", "info", "paths")
+
+    def __init__(self):
+        self.children = {}
+        self.info = None
+        self.paths = []  # (lowercase path prefix, info), longest first
+
+
+class DomainClassifier:
+    """Maps a URL's host to its link type, emoji and policy.
+
+    Hosts are stored in a trie keyed by reversed labels (io -> gofile), so a
+    lookup walks the labels of one host once and the deepest match wins:
+    an entry for "mega.nz" also covers "www.mega.nz". An entry may add a path
+    prefix ("t.me/some_channel") to single out part of a site; it only beats
+    entries for the same host or a parent, never a more specific host. The table is
+    DEFAULT_TABLE overlaid with DOMAIN_TABLE_FILE, which is re-read when it
+    changes on disk.
+    """
+
+    def __init__(self, path=DOMAIN_TABLE_FILE, reload_interval=DOMAIN_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._mtime = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        self._root = self._build(DEFAULT_TABLE)
+
+    @staticmethod
+    def _build(table):
+        root = _Node()
+        for pattern, fields in table.items():
+            error = entry_error(pattern, fields)
+            if error:
+                print(f"[DEBUG] Skipping domain table entry {pattern!r}: {error}")
+                continue
+            host, _, path = pattern.lower().partition("/")
+            node = root
+            for label in reversed(host.split(".")):
+                node = node.children.setdefault(label, _Node())
+            info = DomainInfo(
+                fields.get("type"), fields.get("emoji"), fields.get("policy"),
+                fields.get("resolver"), fields.get("route")
+            )
+            if path:
+                node.paths.append(("/" + path, info))
+                node.paths.sort(key=lambda entry: len(entry[0]), reverse=True)
+            else:
+                node.info = info
+        return root
+
+    def reload(self):
+        """Rebuild the trie from the defaults and the table file; returns the number of entries"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        table = dict(DEFAULT_TABLE)
+        if mtime is not None:
+            try:
+                overrides = load_json(self.path) or {}
+                if not isinstance(overrides, dict):
+                    raise ValueError(f"expected an object of hosts, got {type(overrides).__name__}")
+                table.update(overrides)
+            except ValueError as e:
+                print(f"[DEBUG] Could not load domain table: {e}")
+                return None
+        try:
+            root = self._build(table)
+        except Exception as e:
+            # A bad table must never break classify(); keep serving the previous one
+            print(f"[DEBUG] Could not build domain table, keeping the previous one: {e}")
+            return None
+        self._root = root
+        self._mtime = mtime
+        print(f"[DEBUG] Domain table loaded with {len(table)} entries")
+        return len(table)
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            if now - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self.reload()
+
+    def classify(self, url):
+        """DomainInfo for a URL; UNKNOWN when no entry covers its host"""
+        self._maybe_reload()
+        canonical = canonicalize(url)
+        if canonical is None:
+            return UNKNOWN
+        parts = urlsplit(canonical)
+
+        nodes = []
+        node = self._root
+        for label in reversed(parts.hostname.split(".")):
+            node = node.children.get(label)
+            if node is None:
+                break
+            nodes.append(node)
+
+        # The most specific host decides; its path entries come before its own entry
+        path = parts.path.lower()
+        for node in reversed(nodes):
+            for prefix, info in node.paths:
+                if path == prefix or path.startswith(prefix + "/"):
+                    return info
+            if node.info is not None:
+                return node.info
+        return UNKNOWN
+
+
+domain_classifier = DomainClassifier()
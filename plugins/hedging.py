@@ -0,0 +1,79 @@
+# plugins/hedging.py
+from collections import deque
+from config import HEDGE_BUDGET, HEDGE_MIN_DELAY, HEDGE_DEFAULT_DELAY
+from .ttl_cache import TTLCache
+from .urlnorm import host_of
+
+# Replies needed for a domain before its p90 replaces HEDGE_DEFAULT_DELAY
+MIN_SAMPLES = 5
+
+
+class LatencyTracker:
+    """Recent upstream reply times per (bot, domain).
+
+    Keeps the last ``window`` samples of each pair; pairs that see no
+    traffic for a week age out of the bounded cache.
+    """
+
+    def __init__(self, window=50, max_size=5000):
+        self.window = window
+        self._samples = TTLCache(7 * 24 * 3600, max_size, sliding=True)
+
+    def record(self, bot, urls, latency):
+        for host in {host_of(url) for url in urls}:
+            samples = self._samples.get((bot, host))
+            if samples is None:
+                samples = deque(maxlen=self.window)
+                self._samples.set((bot, host), samples)
+            samples.append(latency)
+
+    def p90(self, bot, host):
+        samples = self._samples.get((bot, host))
+        if not samples or len(samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(0.9 * (len(ordered) - 1))]
+
+    def expected(self, bot, urls):
+        """p90 of the slowest domain among the links, HEDGE_DEFAULT_DELAY when unknown"""
+        known = [self.p90(bot, host_of(url)) for url in urls]
+        if not known or None in known:
+            return HEDGE_DEFAULT_DELAY
+        return max(known)
+
+
+class HedgeBudget:
+    """Token bucket capping extra upstream load.
+
+    Every primary send earns ``ratio`` of a token and a hedge spends a whole
+    one, so hedges stay below ``ratio`` of upstream traffic over time while
+    ``burst`` lets a short slow spell be hedged in full.
+    """
+
+    def __init__(self, ratio=HEDGE_BUDGET, burst=5):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+        self.sent = 0
+        self.denied = 0
+
+    def earn(self):
+        # Rounded so ten earns of 0.1 make a whole token despite float error
+        self.tokens = min(self.burst, round(self.tokens + self.ratio, 6))
+
+    def spend(self):
+        if self.tokens < 1:
+            self.denied += 1
+            return False
+        self.tokens -= 1
+        self.sent += 1
+        return True
+
+
+latency_tracker = LatencyTracker()
+hedge_budget = HedgeBudget()
+
+
+def hedge_delay(bot, urls):
+    """How long to wait for ``bot`` before sending the same links to another one"""
+    return max(HEDGE_MIN_DELAY, latency_tracker.expected(bot, urls))
@@ -0,0 +1,136 @@
+# plugins/metrics.py
+import time
+import json
+import asyncio
+from config import METRICS_FILE, METRICS_FLUSH_INTERVAL
+from .concurrency import run_blocking
+from .atomic_file import write_atomic, load_json, quarantine
+
+# Counters kept per bucket, in the order they are stored on disk
+FIELDS = ("requests", "links", "success", "failed", "latency_ms", "latency_n")
+
+
+class RingSeries:
+    """Fixed number of time buckets of ``width`` seconds, reused in a ring.
+
+    Each slot remembers which bucket it holds, so a slot left over from a
+    previous lap is reset on first write instead of being swept in advance.
+    """
+
+    def __init__(self, width, size):
+        self.width = width
+        self.size = size
+        self.buckets = [None] * size  # [bucket number, *FIELDS]
+
+    def _slot(self, now):
+        number = int(now // self.width)
+        index = number % self.size
+        bucket = self.buckets[index]
+        if bucket is None or bucket[0] != number:
+            bucket = self.buckets[index] = [number] + [0] * len(FIELDS)
+        return bucket
+
+    def add(self, now, **counts):
+        bucket = self._slot(now)
+        for i, field in enumerate(FIELDS, 1):
+            if field in counts:
+                bucket[i] += counts[field]
+
+    def total(self, now, span=None):
+        """Sum the buckets covering the last ``span`` buckets (all of them by default)"""
+        newest = int(now // self.width)
+        oldest = newest - (span or self.size) + 1
+        totals = dict.fromkeys(FIELDS, 0)
+        for bucket in self.buckets:
+            if bucket is not None and oldest <= bucket[0] <= newest:
+                for i, field in enumerate(FIELDS, 1):
+                    totals[field] += bucket[i]
+        return totals
+
+
+class MetricsAggregator:
+    """Request, success and upstream latency counters rolled up per minute, hour and day.
+
+    Every event updates one bucket in each series, so reading a rollup costs
+    at most a series' size no matter how much traffic it covers. The series
+    are written to METRICS_FILE periodically and restored on startup.
+    """
+
+    def __init__(self, path=METRICS_FILE):
+        self.path = path
+        self.series = {
+            "minute": RingSeries(60, 60),
+            "hour": RingSeries(3600, 24),
+            "day": RingSeries(86400, 30),
+        }
+        self._dirty = False
+
+    def _add(self, **counts):
+        now = time.time()
+        for series in self.series.values():
+            series.add(now, **counts)
+        self._dirty = True
+
+    def record_request(self, links):
+        self._add(requests=1, links=links)
+
+    def record_result(self, success, latency=None):
+        if latency is not None:
+            self._add(success=int(success), failed=int(not success),
+                      latency_ms=int(latency * 1000), latency_n=1)
+        else:
+            self._add(success=int(success), failed=int(not success))
+
+    def rollup(self, name, span=None):
+        totals = self.series[name].total(time.time(), span)
+        answered = totals["success"] + totals["failed"]
+        totals["success_rate"] = totals["success"] / answered if answered else None
+        totals["avg_latency"] = totals["latency_ms"] / totals["latency_n"] / 1000 if totals["latency_n"] else None
+        return totals
+
+    def rollups(self):
+        """Last hour, last 24 hours and last 7 days, plus the hourly request rate"""
+        day = self.rollup("hour")
+        return {
+            "hour": self.rollup("minute"),
+            "day": day,
+            "week": self.rollup("day", 7),
+            "per_hour": day["requests"] / 24,
+        }
+
+    def load(self):
+        try:
+            data = load_json(self.path) or {}
+        except ValueError as e:
+            print(f"[DEBUG] Could not load metrics: {e}")
+            quarantine(self.path)
+            return
+        for name, series in self.series.items():
+            for bucket in data.get(name, []):
+                if len(bucket) == len(FIELDS) + 1:
+                    series.buckets[bucket[0] % series.size] = bucket
+
+    def _write_file(self, payload):
+        try:
+            write_atomic(self.path, payload)
+        except Exception as e:
+            print(f"[DEBUG] Could not save metrics: {e}")
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        snapshot = {
+            name: [bucket for bucket in series.buckets if bucket is not None]
+            for name, series in self.series.items()
+        }
+        await run_blocking(self._write_file, json.dumps(snapshot, separators=(",", ":")))
+
+    async def run(self, interval=METRICS_FLUSH_INTERVAL):
+        """Background task: persist the rollups every ``interval`` seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+
+metrics = MetricsAggregator()
@@ -0,0 +1,162 @@
+# plugins/negative_cache.py
+import os
+import math
+import time
+import hashlib
+from collections import OrderedDict
+from config import (
+    NEGATIVE_TTL, NEGATIVE_MAX_TTL, NEGATIVE_CACHE_SIZE, DOMAIN_FAILURE_THRESHOLD,
+    UNSUPPORTED_DOMAINS_FILE, BLOOM_ERROR_RATE
+)
+from .urlnorm import url_key, host_of
+
+
+class BloomFilter:
+    """Fixed-size set membership test with no false negatives.
+
+    Sized for ``capacity`` items at ``error_rate`` false positives; k bit
+    positions per item come from one blake2b digest by double hashing.
+    """
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class _Strike:
+    __slots__ = ("count", "expires_at", "forget_at")
+
+    def __init__(self, count, expires_at, forget_at):
+        self.count = count
+        self.expires_at = expires_at
+        self.forget_at = forget_at
+
+
+class NegativeCache:
+    """Links and domains the bypass bot recently failed on, answered without asking it again.
+
+    A failed link is refused for NEGATIVE_TTL, doubling with every repeat
+    failure up to NEGATIVE_MAX_TTL; the strike count outlives the refusal so
+    a link that keeps failing backs off further each time. A domain is
+    refused once DOMAIN_FAILURE_THRESHOLD of its links fail with no success
+    in between, on the same schedule. Every refusal expires, since a site
+    can start working again; only the domains listed in
+    UNSUPPORTED_DOMAINS_FILE are refused for good, through a Bloom filter
+    checked before anything else.
+    """
+
+    def __init__(self, ttl=NEGATIVE_TTL, max_ttl=NEGATIVE_MAX_TTL, max_size=NEGATIVE_CACHE_SIZE,
+                 domain_threshold=DOMAIN_FAILURE_THRESHOLD, unsupported_file=UNSUPPORTED_DOMAINS_FILE):
+        self.ttl = ttl
+        self.max_ttl = max_ttl
+        self.max_size = max_size
+        self.domain_threshold = domain_threshold
+        self.unsupported_file = unsupported_file
+        self._links = OrderedDict()    # url_key -> _Strike
+        self._domains = OrderedDict()  # host -> _Strike
+        self._domain_failures = OrderedDict()  # host -> failures since its last success
+        self.unsupported = BloomFilter(0)
+        self.hits = 0
+
+    def load(self):
+        """Build the unsupported-domain filter from UNSUPPORTED_DOMAINS_FILE, if there is one"""
+        if not self.unsupported_file or not os.path.exists(self.unsupported_file):
+            return 0
+        with open(self.unsupported_file, encoding="utf-8") as f:
+            domains = [line.strip().lower() for line in f if line.strip() and not line.startswith("#")]
+        self.unsupported = BloomFilter(len(domains))
+        for domain in domains:
+            self.unsupported.add(domain)
+        print(f"[DEBUG] Loaded {len(domains)} unsupported domains")
+        return len(domains)
+
+    def _bounded(self, table):
+        while len(table) > self.max_size:
+            table.popitem(last=False)
+
+    def _strike(self, table, key, now):
+        strike = table.pop(key, None)
+        count = strike.count + 1 if strike and strike.forget_at > now else 1
+        ttl = min(self.max_ttl, self.ttl * 2 ** (count - 1))
+        # Strikes are remembered twice as long as they block, so repeats back off further
+        table[key] = _Strike(count, now + ttl, now + 2 * ttl)
+        self._bounded(table)
+        return ttl
+
+    @staticmethod
+    def _blocked_for(table, key, now):
+        strike = table.get(key)
+        return max(0, strike.expires_at - now) if strike else 0
+
+    def _domain_unsupported(self, host):
+        # Also match parent domains, so an unsupported domain covers its subdomains
+        labels = host.split(".")
+        return any(".".join(labels[i:]) in self.unsupported for i in range(len(labels) - 1))
+
+    def check(self, url):
+        """(reason, seconds left) when the link should not be sent upstream, else None"""
+        host = host_of(url)
+        if host is None:
+            return None
+        if self._domain_unsupported(host):
+            self.hits += 1
+            return "unsupported", None
+        now = time.monotonic()
+        for reason, table, key in (("link", self._links, url_key(url)), ("domain", self._domains, host)):
+            left = self._blocked_for(table, key, now)
+            if left > 0:
+                self.hits += 1
+                return reason, left
+        return None
+
+    def record_failure(self, url):
+        host = host_of(url)
+        if host is None:
+            return
+        now = time.monotonic()
+        ttl = self._strike(self._links, url_key(url), now)
+        print(f"[DEBUG] Negative-caching {url} for {ttl:.0f}s")
+
+        failures = self._domain_failures.pop(host, 0) + 1
+        self._domain_failures[host] = failures
+        self._bounded(self._domain_failures)
+        if failures >= self.domain_threshold:
+            self._domain_failures[host] = 0
+            ttl = self._strike(self._domains, host, now)
+            print(f"[DEBUG] Negative-caching domain {host} for {ttl:.0f}s")
+
+    def record_success(self, url):
+        host = host_of(url)
+        if host is None:
+            return
+        self._links.pop(url_key(url), None)
+        self._domain_failures.pop(host, None)
+        self._domains.pop(host, None)
+
+    def stats(self):
+        return {
+            "links": len(self._links),
+            "domains": len(self._domains),
+            "unsupported": self.unsupported.count,
+            "hits": self.hits,
+        }
+
+
+negative_cache = NegativeCache()
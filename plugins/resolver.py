@@ -0,0 +1,139 @@
+# plugins/resolver.py
+import time
+import asyncio
+from urllib.parse import urljoin
+import aiohttp
+from config import RESOLVER_MAX_HOPS, RESOLVER_TIMEOUT, RESOLVER_POOL_SIZE, RESOLVER_PER_HOST, RESOLVER_DNS_TTL
+from .urlnorm import canonicalize
+from .domains import domain_classifier
+
+REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+# Some shorteners refuse HEAD; those get the same request as a GET
+HEAD_REFUSED = frozenset({400, 403, 405, 501})
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+
+class ResolveError(Exception):
+    pass
+
+
+class Deferral:
+    """A redirect chain that ended on another shortener: ``url`` still needs the bypass bot"""
+
+    __slots__ = ("url",)
+
+    def __init__(self, url):
+        self.url = url
+
+    def __repr__(self):
+        return f"Deferral({self.url!r})"
+
+
+class RedirectResolver:
+    """Follows plain redirect shorteners (bit.ly, t.co, ...) without the bypass bot.
+
+    All lookups share one ClientSession, so connections and DNS answers are
+    pooled across requests and the connector caps requests in flight per
+    host. Only hosts the domain table marks with "resolver": "native" are
+    followed; the chain stops as soon as it leaves those hosts, and gives up
+    after RESOLVER_MAX_HOPS redirects or RESOLVER_TIMEOUT seconds so the
+    caller can fall back to the bypass bot. A chain counts as solved only
+    when it lands on a host the table gives a link type (a file host,
+    Telegram, ...); anywhere else may be another ad shortener, so the last
+    hop comes back as a Deferral for the bypass bot.
+    """
+
+    def __init__(self, max_hops=RESOLVER_MAX_HOPS, timeout=RESOLVER_TIMEOUT, pool_size=RESOLVER_POOL_SIZE,
+                 per_host=RESOLVER_PER_HOST, dns_ttl=RESOLVER_DNS_TTL):
+        self.max_hops = max_hops
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.dns_ttl = dns_ttl
+        self._session = None
+
+    def _get_session(self):
+        # Created lazily: a ClientSession has to be made inside the running loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.per_host,
+                ttl_dns_cache=self.dns_ttl
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"User-Agent": USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    @staticmethod
+    def can_resolve(url):
+        return domain_classifier.classify(url).native
+
+    @staticmethod
+    def is_destination(url):
+        return domain_classifier.classify(url).type is not None
+
+    async def _next_hop(self, session, url):
+        """Location the URL redirects to, or None when it answers without redirecting"""
+        for method in ("HEAD", "GET"):
+            async with session.request(method, url, allow_redirects=False) as resp:
+                if method == "HEAD" and resp.status in HEAD_REFUSED:
+                    continue
+                if resp.status in REDIRECT_STATUSES:
+                    location = resp.headers.get("Location")
+                    if not location:
+                        raise ResolveError(f"{resp.status} without a Location header")
+                    return location
+                if resp.status >= 400:
+                    raise ResolveError(f"HTTP {resp.status}")
+                return None
+
+    async def _follow(self, url):
+        session = self._get_session()
+        current = url
+        seen = {canonicalize(url)}
+        for _ in range(self.max_hops):
+            location = await self._next_hop(session, current)
+            if location is None:
+                # Answered without redirecting: there was nothing to follow
+                if current == url:
+                    raise ResolveError("not a redirect")
+                # A shortener page that wants more than a redirect
+                return Deferral(current)
+            current = urljoin(current, location)
+            canonical = canonicalize(current)
+            if canonical is None:
+                raise ResolveError("redirected to a non-http URL")
+            if canonical in seen:
+                raise ResolveError("redirect loop")
+            seen.add(canonical)
+            if not self.can_resolve(current):
+                # Left the shortener; don't load the destination itself
+                return current if self.is_destination(current) else Deferral(current)
+        raise ResolveError(f"more than {self.max_hops} redirects")
+
+    async def resolve(self, url):
+        """Destination of a shortened URL, a Deferral when the bypass bot must finish it
+        from a later hop, or None when the bypass bot should get the URL itself"""
+        started = time.monotonic()
+        try:
+            final = await asyncio.wait_for(self._follow(url), self.timeout)
+        except (ResolveError, aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            print(f"[DEBUG] Native resolve failed for {url}: {e or type(e).__name__}")
+            return None
+        print(f"[DEBUG] Native resolve {url} -> {final} in {(time.monotonic() - started) * 1000:.0f}ms")
+        return final
+
+    async def resolve_many(self, urls):
+        """{url: destination} for the URLs that resolved; the rest are left out"""
+        finals = await asyncio.gather(*(self.resolve(url) for url in urls))
+        return {url: final for url, final in zip(urls, finals) if final and not isinstance(final, Deferral)}
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+resolver = RedirectResolver()
@@ -0,0 +1,252 @@
+# plugins/resolver_chain.py
+import time
+import asyncio
+from config import NATIVE_RESOLVER, RESOLVER_TIMEOUT, RESOLVE_CACHE_TTL, RESOLVE_CACHE_SIZE, BYPASS_BOTS
+from .ttl_cache import TTLCache
+from .urlnorm import url_key, host_of
+from .domains import domain_classifier
+from .resolver import resolver as redirect_resolver, Deferral
+
+# Weight of the newest sample in the per-domain averages
+STATS_ALPHA = 0.2
+# Worst success rate a score divides by, so a failing resolver still gets ranked
+MIN_SUCCESS_RATE = 0.05
+# Every Nth route ignores the stats, so a resolver ranked behind the bypass bot gets retried
+EXPLORE_EVERY = 20
+
+
+class Resolver:
+    """One way of turning a link into its destination.
+
+    ``capabilities`` are the link kinds it can handle ("redirect" for plain
+    shorteners, "shortener" for anything needing a bypass), ``cost`` is the
+    expected seconds per link before any stats exist and ``timeout`` bounds
+    a single attempt. A ``deferred`` resolver can't answer inline: links
+    routed to it are handed back to the caller, which queues them for the
+    bypass bot, so nothing after it in a route is tried. ``resolve`` may
+    also return a Deferral: the link got partway, and the rest of the route
+    carries on from Deferral.url.
+    """
+
+    name = None
+    capabilities = frozenset()
+    cost = 1.0
+    timeout = None
+    deferred = False
+
+    async def resolve(self, url):
+        raise NotImplementedError
+
+
+class CacheResolver(Resolver):
+    name = "cache"
+    capabilities = frozenset({"redirect", "shortener"})
+    cost = 0.0
+
+    def __init__(self, ttl=RESOLVE_CACHE_TTL, max_size=RESOLVE_CACHE_SIZE):
+        self.cache = TTLCache(ttl, max_size)
+
+    def remember(self, url, final):
+        self.cache.set(url_key(url), final)
+
+    async def resolve(self, url):
+        return self.cache.get(url_key(url))
+
+
+class NativeResolver(Resolver):
+    name = "native"
+    capabilities = frozenset({"redirect"})
+    cost = 0.3
+    timeout = RESOLVER_TIMEOUT
+
+    async def resolve(self, url):
+        return await redirect_resolver.resolve(url)
+
+
+class UpstreamResolver(Resolver):
+    """One bypass bot, reached through the job queue"""
+
+    capabilities = frozenset({"redirect", "shortener"})
+    cost = 10.0
+    deferred = True
+
+    def __init__(self, bot_username):
+        self.bot_username = bot_username
+        self.name = upstream_name(bot_username)
+
+
+def upstream_name(bot_username):
+    return f"upstream:{bot_username}"
+
+
+class _Stats:
+    __slots__ = ("success", "latency")
+
+    def __init__(self, cost):
+        self.success = 1.0
+        self.latency = cost
+
+    def add(self, success, latency):
+        self.success += STATS_ALPHA * (float(success) - self.success)
+        self.latency += STATS_ALPHA * (latency - self.latency)
+
+    def score(self):
+        # Expected seconds until a link is resolved, retries included
+        return self.latency / max(self.success, MIN_SUCCESS_RATE)
+
+
+class ResolverChain:
+    """Tries resolvers in turn for each link until one succeeds.
+
+    A host's route comes from its "route" entry in the domain table, or else
+    from every resolver whose capabilities cover the host's kind. Within a
+    route, resolvers are ordered by their measured latency and success rate
+    on that host (their declared cost until there is data), so a resolver
+    that keeps failing for a domain drops behind the bypass bot there.
+
+    Every bypass bot is a resolver of its own. They can't answer inline, so
+    the chain stops at the first one; the job queue then sends the links to
+    the bots in ``rank_upstream`` order, falling through to the next bot
+    when one fails on them. "upstream" in a route stands for all of them.
+    """
+
+    def __init__(self, resolvers, stats_size=10000):
+        self.resolvers = {r.name: r for r in resolvers}
+        self.cache = self.resolvers.get("cache")
+        self.upstream = [r for r in resolvers if isinstance(r, UpstreamResolver)]
+        # Per (resolver, host) averages; idle hosts age out
+        self._stats = TTLCache(7 * 24 * 3600, stats_size, sliding=True)
+        self._totals = {name: {"attempts": 0, "success": 0, "seconds": 0.0} for name in self.resolvers}
+        self._routed = 0
+
+    def _host_stats(self, resolver, host):
+        key = (resolver.name, host)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = _Stats(resolver.cost)
+            self._stats.set(key, stats)
+        return stats
+
+    def _candidates(self, url):
+        info = domain_classifier.classify(url)
+        if not info.route:
+            kind = "redirect" if info.native else "shortener"
+            return [r for r in self.resolvers.values() if kind in r.capabilities]
+        candidates = []
+        for name in info.route:
+            if name == "upstream":
+                candidates.extend(self.upstream)
+            elif name in self.resolvers:
+                candidates.append(self.resolvers[name])
+        return candidates
+
+    def route(self, url):
+        """Resolvers to try for a URL, best first"""
+        candidates = self._candidates(url)
+        self._routed += 1
+        if self._routed % EXPLORE_EVERY == 0:
+            return sorted(candidates, key=lambda r: r.cost)
+        host = host_of(url)
+        # sorted() is stable, so ties keep the declared order
+        return sorted(candidates, key=lambda r: self._host_stats(r, host).score())
+
+    def record(self, name, url, success, latency):
+        resolver = self.resolvers.get(name)
+        if resolver is None or resolver is self.cache:
+            return
+        self._host_stats(resolver, host_of(url)).add(success, latency)
+        totals = self._totals[name]
+        totals["attempts"] += 1
+        totals["success"] += int(success)
+        totals["seconds"] += latency
+
+    async def _attempt(self, resolver, url):
+        started = time.monotonic()
+        try:
+            final = await asyncio.wait_for(resolver.resolve(url), resolver.timeout)
+        except asyncio.TimeoutError:
+            final = None
+        except Exception as e:
+            print(f"[DEBUG] Resolver {resolver.name} failed for {url}: {e}")
+            final = None
+        self.record(resolver.name, url, bool(final), time.monotonic() - started)
+        return final
+
+    async def resolve(self, url):
+        """(destination, None, url) on an inline success, else (None, deferred resolver or
+        None, link to hand on): the link itself, or the hop a resolver got it to"""
+        link = url
+        for resolver in self.route(url):
+            if resolver.deferred:
+                return None, resolver, link
+            final = await self._attempt(resolver, link)
+            if isinstance(final, Deferral):
+                link = final.url
+            elif final:
+                if self.cache and resolver is not self.cache:
+                    self.cache.remember(url, final)
+                return final, None, link
+        return None, None, link
+
+    async def resolve_many(self, urls):
+        """Resolve links side by side: ({url: destination}, [(url, link to hand on)] left for
+        the bypass bot). The link to hand on is the url itself or the hop a resolver reached."""
+        outcomes = await asyncio.gather(*(self.resolve(url) for url in urls))
+        resolved = {url: final for url, (final, _, _) in zip(urls, outcomes) if final}
+        deferred = [(url, link) for url, (final, _, link) in zip(urls, outcomes) if not final]
+        return resolved, deferred
+
+    def rank_upstream(self, urls, tried=()):
+        """Usernames of the bypass bots to send these links to, best first, minus the ones tried.
+
+        A bot routed out for any of the links is left out, unless that leaves
+        none. Bots are ordered by their worst score among the links' hosts.
+        """
+        allowed = None
+        for url in urls:
+            names = {r.name for r in self._candidates(url) if r in self.upstream}
+            allowed = names if allowed is None else allowed & names
+        candidates = [
+            r for r in self.upstream
+            if r.bot_username not in tried and (not allowed or r.name in allowed)
+        ]
+        hosts = {host_of(url) for url in urls}
+        return [
+            r.bot_username for r in sorted(
+                candidates, key=lambda r: max((self._host_stats(r, host).score() for host in hosts), default=0)
+            )
+        ]
+
+    def record_upstream(self, bot, urls, success, latency):
+        """Feed a bypass bot's answer on these links back into its stats"""
+        for url in urls:
+            self.record(upstream_name(bot), url, success, latency)
+
+    def remember(self, pairs):
+        """Cache destinations the bypass bot found"""
+        if self.cache:
+            for original, final in pairs:
+                self.cache.remember(original, final)
+
+    def summary(self):
+        """Attempts, success rate and average latency per resolver, for the dashboard"""
+        return {
+            name: dict(
+                totals,
+                success_rate=totals["success"] / totals["attempts"] if totals["attempts"] else None,
+                avg_latency=totals["seconds"] / totals["attempts"] if totals["attempts"] else None
+            )
+            for name, totals in self._totals.items()
+            if name != "cache"
+        }
+
+
+def build_chain():
+    resolvers = [CacheResolver()]
+    if NATIVE_RESOLVER:
+        resolvers.append(NativeResolver())
+    resolvers.extend(UpstreamResolver(username) for username, _ in BYPASS_BOTS)
+    return ResolverChain(resolvers)
+
+
+resolver_chain = build_chain()
@@ -0,0 +1,144 @@
+# plugins/season_store.py
+import os
+import re
+import json
+import time
+import asyncio
+from config import DATA_DIR, SEASON_TTL, SEASON_MAX_ENTRIES, SEASON_SAVE_DELAY
+from .ttl_cache import TTLCache
+from .concurrency import run_blocking
+from .atomic_file import write_atomic, load_json, quarantine
+from .urlnorm import URL_PATTERN
+
+SEASON_PATTERN = re.compile(r"season\s*(\d+)", re.IGNORECASE)
+COMMAND_PATTERN = re.compile(r"^\s*[/!]\w+(@\w+)?")
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+def extract_season(text):
+    """Return the season mentioned in a message as "Season N", or None"""
+    match = SEASON_PATTERN.search(text or "")
+    return f"Season {int(match.group(1))}" if match else None
+
+
+def extract_show(text):
+    """Title a message names besides its links, lower-cased ("/by Dark Season 2 <link>" -> "dark"), or None"""
+    text = COMMAND_PATTERN.sub(" ", URL_PATTERN.sub(" ", text or ""))
+    # The title is whatever comes before the season mention
+    title = SEASON_PATTERN.split(text, maxsplit=1)[0]
+    return " ".join(WORD_PATTERN.findall(title.lower())) or None
+
+
+class SeasonStore:
+    """Season last mentioned for a show or a link, used to label later results for it.
+
+    A season is remembered under the show title it came with (per chat) and
+    under each link it was sent with, and a later request is only labelled
+    when it names the same show or resends one of those links. Entries live
+    in a sliding TTL cache: O(1) get/set, least recently used entries are
+    evicted past ``max_size`` and idle ones expire after ``ttl``. Changes,
+    including the refreshed expiry of a hit, are written to disk at most
+    once per ``save_delay`` seconds.
+    """
+
+    def __init__(self, path, ttl=SEASON_TTL, max_size=SEASON_MAX_ENTRIES, save_delay=SEASON_SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self._cache = TTLCache(ttl, max_size, sliding=True)
+        self._dirty = False
+        self._writer = None
+        self._flush_now = None
+
+    @staticmethod
+    def _keys(chat_id, show, link_keys):
+        keys = [f"show:{chat_id}:{show}"] if show else []
+        return keys + [f"link:{key}" for key in link_keys]
+
+    def get(self, chat_id, show=None, link_keys=()):
+        """Season remembered for the show in this chat, else for any of the links"""
+        for key in self._keys(chat_id, show, link_keys):
+            season = self._cache.get(key)
+            if season:
+                # The hit slid the entry's expiry; save it so a restart keeps it
+                self._schedule_save()
+                return season
+        return None
+
+    def set(self, chat_id, season, show=None, link_keys=()):
+        keys = self._keys(chat_id, show, link_keys)
+        for key in keys:
+            self._cache.set(key, season)
+        if keys:
+            self._schedule_save()
+
+    def load(self):
+        """Restore saved entries with their remaining lifetime"""
+        try:
+            data = load_json(self.path) or {}
+        except ValueError as e:
+            print(f"Error loading season store: {e}")
+            quarantine(self.path)
+            return
+
+        now = time.time()
+        entries = []
+        for key, value in data.items():
+            if not key.startswith(("show:", "link:")):
+                # Older files keyed seasons by chat and user, which labelled unrelated links
+                continue
+            season, expires_at = value
+            if expires_at > now:
+                entries.append((expires_at, key, season))
+        for expires_at, key, season in sorted(entries):
+            self._cache.set(key, season, ttl=expires_at - now)
+
+    def _schedule_save(self):
+        self._dirty = True
+        if self._writer is None:
+            if self._flush_now is None:
+                self._flush_now = asyncio.Event()
+            self._writer = asyncio.ensure_future(self._write_pending())
+
+    async def _write_pending(self):
+        try:
+            while self._dirty:
+                try:
+                    await asyncio.wait_for(self._flush_now.wait(), self.save_delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._dirty = False
+                now = time.time()
+                snapshot = {key: [season, round(now + left)] for key, season, left in self._cache.items()}
+                await run_blocking(self._write_file, json.dumps(snapshot, separators=(",", ":")))
+        finally:
+            self._writer = None
+
+    def _write_file(self, payload):
+        try:
+            write_atomic(self.path, payload)
+        except Exception as e:
+            print(f"Error saving season store: {e}")
+
+    async def flush(self):
+        """Write pending changes now instead of after the debounce delay"""
+        if self._writer is None:
+            return
+        self._flush_now.set()
+        try:
+            await self._writer
+        finally:
+            self._flush_now.clear()
+
+    def memory_bytes(self):
+        """Approximate memory held by the store: mapping, entries, keys and values"""
+        return self._cache.memory_bytes()
+
+    def stats(self):
+        return {
+            "entries": self._cache.expire(),
+            "max_entries": self._cache.max_size,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+season_store = SeasonStore(os.path.join(DATA_DIR, "season_store.json"))
@@ -0,0 +1,65 @@
+# plugins/session_store.py
+import os
+import time
+from pathlib import Path
+from pyrogram.storage import FileStorage, MemoryStorage
+from config import SESSION_DIR
+
+SESSION_FIELDS = ("dc_id", "api_id", "test_mode", "auth_key", "user_id", "is_bot")
+
+async def _seed_from_string(storage, name, session_string):
+    """Copy the auth data of a session string into a freshly opened file storage"""
+    seed = MemoryStorage(name, session_string)
+    await seed.open()
+    try:
+        for field in SESSION_FIELDS:
+            await getattr(storage, field)(await getattr(seed, field)())
+        await storage.date(0)
+        await storage.save()
+    finally:
+        await seed.close()
+
+async def attach_file_storage(client, session_string=None):
+    """Swap a client's in-memory storage for a session file under SESSION_DIR.
+
+    The file keeps the auth key and the peer cache, so a restart neither
+    re-authorizes nor has to resolve usernames again. When a session string
+    is given it stays the source of truth: a file holding a different auth
+    key (e.g. after the string was rotated) is discarded and re-seeded.
+    """
+    if not SESSION_DIR:
+        return False
+
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    storage = FileStorage(client.name, Path(SESSION_DIR))
+
+    if session_string:
+        seed = MemoryStorage(client.name, session_string)
+        await seed.open()
+        expected_key = await seed.auth_key()
+        await seed.close()
+
+        await storage.open()
+        if await storage.auth_key() != expected_key:
+            if await storage.auth_key() is not None:
+                print(f"[DEBUG] Session file for {client.name} is stale, re-seeding it")
+                await storage.close()
+                await storage.delete()
+                await storage.open()
+            await _seed_from_string(storage, client.name, session_string)
+        await storage.close()
+
+    client.storage = storage
+    client.in_memory = False
+    print(f"[DEBUG] Using persistent session {storage.database}")
+    return True
+
+async def warm_peer(client, peer_id):
+    """Resolve a peer up front so the first real request finds it cached; returns seconds taken"""
+    started = time.monotonic()
+    try:
+        await client.resolve_peer(peer_id)
+    except Exception:
+        # Not cached yet (e.g. a channel id the bot has never seen): fetch it once
+        await client.get_chat(peer_id)
+    return time.monotonic() - started
@@ -0,0 +1,93 @@
+# plugins/ttl_cache.py
+import sys
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at")
+
+    def __init__(self, value, expires_at):
+        self.value = value
+        self.expires_at = expires_at
+
+
+class TTLCache:
+    """Bounded mapping whose entries expire after a fixed time-to-live.
+
+    Every entry gets the same TTL, so insertion order is also expiry order:
+    expired entries are always at the front and can be dropped in O(1)
+    without scanning. With ``sliding=True`` a hit refreshes the entry and
+    moves it to the back, which turns the cache into an LRU with idle expiry.
+    """
+
+    def __init__(self, ttl, max_size=10000, sliding=False):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.sliding = sliding
+        self._data = OrderedDict()
+
+    def _expire(self, now):
+        data = self._data
+        while data:
+            entry = data[next(iter(data))]
+            if entry.expires_at > now:
+                break
+            data.popitem(last=False)
+
+    def set(self, key, value, ttl=None):
+        """Store a value; a shorter ``ttl`` is only for restoring entries in expiry order"""
+        now = time.monotonic()
+        self._expire(now)
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+        data[key] = _Entry(value, now + min(ttl, self.ttl) if ttl is not None else now + self.ttl)
+        while len(data) > self.max_size:
+            data.popitem(last=False)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        now = time.monotonic()
+        if entry.expires_at <= now:
+            del self._data[key]
+            return default
+        if self.sliding:
+            entry.expires_at = now + self.ttl
+            self._data.move_to_end(key)
+        return entry.value
+
+    def pop(self, key, default=None):
+        entry = self._data.pop(key, None)
+        if entry is None or entry.expires_at <= time.monotonic():
+            return default
+        return entry.value
+
+    def expire(self):
+        """Drop expired entries and return the number still cached"""
+        self._expire(time.monotonic())
+        return len(self._data)
+
+    def items(self):
+        """Live entries as (key, value, seconds left), soonest to expire first"""
+        now = time.monotonic()
+        self._expire(now)
+        return [(key, entry.value, entry.expires_at - now) for key, entry in self._data.items()]
+
+    def memory_bytes(self):
+        """Approximate memory held: the mapping plus each entry, key and value (shallow)"""
+        total = sys.getsizeof(self._data)
+        for key, entry in self._data.items():
+            total += sys.getsizeof(key) + sys.getsizeof(entry) + sys.getsizeof(entry.value)
+        return total
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+
+_MISSING = object()
@@ -0,0 +1,118 @@
+# plugins/urlnorm.py
+import re
+import hashlib
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, quote
+
+# Query parameters that only identify where a click came from
+TRACKING_PARAMS = frozenset({
+    "utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content", "utm_id",
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref_src", "_ga",
+})
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+URL_PATTERN = re.compile(r"https?://[^\s<>\"'`,]+", re.IGNORECASE)
+MARKDOWN_LINK = re.compile(r"^\[[^\]]*\]\((\S+?)\)$")
+TRAILING_PUNCTUATION = ",.;:!?'\"*_`>]}"
+PERCENT_ESCAPE = re.compile(r"%[0-9A-Fa-f]{2}")
+# RFC 3986 unreserved characters never need escaping, so %41 and A are the same link
+UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+
+
+def clean_url(raw):
+    """Strip markdown and chat punctuation wrapped around a URL"""
+    url = raw.strip()
+    match = MARKDOWN_LINK.match(url)
+    if match:
+        url = match.group(1)
+    url = url.lstrip("(<*_`").rstrip("<>*_`")
+    while url and url[-1] in TRAILING_PUNCTUATION + ")":
+        # Keep a closing parenthesis that belongs to the URL, e.g. wiki/Foo_(bar)
+        if url[-1] == ")" and url.count("(") >= url.count(")"):
+            break
+        url = url[:-1]
+    return url
+
+
+def _normalize_escapes(part, safe):
+    def fix(match):
+        char = chr(int(match.group(0)[1:], 16))
+        return char if char in UNRESERVED else match.group(0).upper()
+    # Decode needless escapes, upper-case the rest, then escape anything still unsafe
+    return quote(PERCENT_ESCAPE.sub(fix, part), safe=safe + "%")
+
+
+def _normalize_host(host):
+    host = host.rstrip(".").lower()
+    try:
+        return host.encode("idna").decode("ascii")
+    except UnicodeError:
+        return host
+
+
+@lru_cache(maxsize=8192)
+def canonicalize(url):
+    """Canonical form of a link: the one spelling every index, cache and comparison uses.
+
+    Only for keys and comparisons; links are sent on in their original spelling.
+
+    Folds scheme and host case, IDNA-encodes the host, drops default ports and
+    fragments, normalizes percent-escapes and strips tracking parameters.
+    Returns None for anything that isn't an http(s) URL with a host.
+    """
+    try:
+        parts = urlsplit(clean_url(url))
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+
+    netloc = _normalize_host(parts.hostname)
+    if port and port != DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+    path = _normalize_escapes(parts.path, safe="/:@!$&'()*+,;=") or "/"
+    query = urlencode(
+        [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in TRACKING_PARAMS],
+        quote_via=quote, safe="/:@!$'()*,;"
+    )
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def url_key(url):
+    """Compact hashable key for a link; http and https spellings of it share the key"""
+    canonical = canonicalize(url)
+    if canonical is None:
+        return None
+    return hashlib.blake2b(canonical.split("://", 1)[1].encode("utf-8"), digest_size=8).hexdigest()
+
+
+def host_of(url):
+    canonical = canonicalize(url)
+    return urlsplit(canonical).hostname if canonical else None
+
+
+def find_urls(text):
+    """Raw http(s) URLs in free text, before cleanup"""
+    return URL_PATTERN.findall(text or "")
+
+
+def dedupe(urls):
+    """URLs in first-seen order, without duplicates or invalid entries.
+
+    Links are compared by url_key but come back as the sender spelled them,
+    minus wrapping punctuation: fragments, bare query keys and parameters a
+    shortener reads all have to reach whoever opens the link.
+    """
+    seen = set()
+    unique = []
+    for url in urls:
+        key = url_key(url)
+        if key is None:
+            continue
+        if key not in seen:
+            seen.add(key)
+            unique.append(clean_url(url))
+    return unique
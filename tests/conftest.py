@@ -0,0 +1,11 @@
+# tests/conftest.py
+import os
+import asyncio
+
+# config.py refuses to import without a bot token; tests never reach Telegram
+os.environ.setdefault("BOT_TOKEN", "123456:test-token")
+
+
+def run(coro):
+    """Run a coroutine to completion on a fresh event loop"""
+    return asyncio.run(coro)
@@ -0,0 +1,59 @@
+# tests/test_atomic_file.py
+import os
+import json
+import pytest
+
+from plugins.atomic_file import write_atomic, load_json, BACKUP_SUFFIX, CHECKSUM_SUFFIX
+from database.json_store import JSONStorage
+
+
+def test_round_trip_keeps_the_previous_generation(tmp_path):
+    path = str(tmp_path / "data.json")
+    assert load_json(path) is None
+    write_atomic(path, json.dumps({"generation": 1}))
+    write_atomic(path, json.dumps({"generation": 2}))
+    assert load_json(path) == {"generation": 2}
+    with open(path + BACKUP_SUFFIX) as f:
+        assert json.load(f) == {"generation": 1}
+
+
+def test_corrupt_primary_falls_back_to_the_backup(tmp_path):
+    path = str(tmp_path / "data.json")
+    write_atomic(path, json.dumps({"generation": 1}))
+    write_atomic(path, json.dumps({"generation": 2}))
+    with open(path, "w") as f:
+        f.write('{"generation": 2, "us')  # torn mid-write
+
+    assert load_json(path) == {"generation": 1}
+
+
+def test_checksum_mismatch_is_quarantined(tmp_path):
+    path = str(tmp_path / "user_data.json")
+    write_atomic(path, json.dumps({"total_users": ["1", "2"], "banned_users": ["2"]}))
+    # Valid JSON, but not what the sidecar vouches for, and no backup to fall back on
+    with open(path, "w") as f:
+        json.dump({"total_users": []}, f)
+
+    with pytest.raises(ValueError):
+        load_json(path)
+
+    store = JSONStorage(path)
+    store.open()
+    assert store.data["total_users"] == []
+    quarantined = [name for name in os.listdir(tmp_path) if name.startswith("user_data.json.corrupt-")]
+    assert len(quarantined) == 1
+    with open(tmp_path / quarantined[0]) as f:
+        assert json.load(f) == {"total_users": []}
+
+
+def test_missing_sidecar_still_loads(tmp_path):
+    path = str(tmp_path / "data.json")
+    write_atomic(path, json.dumps({"generation": 1}))
+    os.remove(path + CHECKSUM_SUFFIX)
+    assert load_json(path) == {"generation": 1}
+
+    # Files written before checksums existed
+    legacy = str(tmp_path / "legacy.json")
+    with open(legacy, "w") as f:
+        json.dump({"old": True}, f)
+    assert load_json(legacy) == {"old": True}
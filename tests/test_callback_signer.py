@@ -0,0 +1,61 @@
+# tests/test_callback_signer.py
+import re
+import pytest
+from pathlib import Path
+
+from plugins import callback_signer
+from plugins.callback_signer import sign_callback, parse_callback, MAX_CALLBACK_DATA
+
+ISSUED = 1_700_000_000
+
+
+def test_round_trip():
+    data = sign_callback("howto", 7901412493, issued_at=ISSUED)
+    assert parse_callback(data) == ("howto", 7901412493, ISSUED)
+
+
+@pytest.mark.parametrize("field", [0, 1, 2])
+def test_tampered_fields_are_rejected(field):
+    parts = sign_callback("stats", 42, issued_at=ISSUED).split(".")
+    parts[field] = {0: "premium", 1: "2a", 2: "zzzzzz"}[field]
+    assert parse_callback(".".join(parts)) is None
+
+
+def test_tampered_signature_is_rejected():
+    data = sign_callback("stats", 42, issued_at=ISSUED)
+    flipped = data[:-1] + ("A" if data[-1] != "A" else "B")
+    assert parse_callback(flipped) is None
+
+
+@pytest.mark.parametrize("data", [
+    None, "", "howto", "stats", "a.b.c", "a.b.c.d.e", "....", "howto.16.!!.sig",
+    "howto.16.16.é", b"\xff\xfe", "\x00" * 64,
+])
+def test_garbage_returns_none(data):
+    assert parse_callback(data) is None
+
+
+def test_truncated_payloads_return_none():
+    data = sign_callback("back_start", 42, issued_at=ISSUED)
+    for end in range(len(data)):
+        assert parse_callback(data[:end]) is None
+
+
+def test_another_secret_rejects_the_token(monkeypatch):
+    data = sign_callback("features", 42, issued_at=ISSUED)
+    monkeypatch.setattr(callback_signer, "_key", b"another replica's secret")
+    assert parse_callback(data) is None
+
+
+def test_longest_menu_action_fits_telegram_limit():
+    source = Path(callback_signer.__file__).with_name("bypass_handler.py").read_text(encoding="utf-8")
+    actions = set(re.findall(r'sign_callback\("([^"]+)"', source))
+    assert actions
+    # Largest user id Telegram hands out (52 bits) and an issue time far in the future
+    longest = max(actions, key=len)
+    data = sign_callback(longest, (1 << 52) - 1, issued_at=1 << 34)
+    assert len(data.encode()) <= MAX_CALLBACK_DATA
+    assert parse_callback(data) == (longest, (1 << 52) - 1, 1 << 34)
+
+    with pytest.raises(ValueError):
+        sign_callback("x" * MAX_CALLBACK_DATA, 42)
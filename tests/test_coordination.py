@@ -0,0 +1,227 @@
+# tests/test_coordination.py
+import asyncio
+import pytest
+from conftest import run
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from plugins import coordination
+from plugins.coordination import RedisBackend, Coordinator
+
+
+@pytest.fixture
+def redis_backend(monkeypatch):
+    """RedisBackend talking to an in-process fakeredis server"""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        coordination.aioredis, "from_url",
+        lambda url, **kwargs: fakeredis.aioredis.FakeRedis(server=server, **kwargs)
+    )
+
+    def make(namespace="test"):
+        return RedisBackend("redis://stand-in", namespace)
+    return make
+
+
+def test_hash_round_trip(redis_backend):
+    async def scenario():
+        backend = redis_backend()
+        await backend.hset("pending", 42, {"user_id": 7, "links": ["https://a.example/x"]})
+        await backend.hset("pending", "43", {"user_id": 8})
+
+        assert await backend.hget("pending", "42") == {"user_id": 7, "links": ["https://a.example/x"]}
+        assert await backend.hgetall("pending") == {"42": {"user_id": 7, "links": ["https://a.example/x"]}, "43": {"user_id": 8}}
+        assert await backend.hget("pending", 99) is None
+        await backend.close()
+    run(scenario())
+
+
+def test_hdel_has_a_single_winner(redis_backend):
+    async def scenario():
+        backend = redis_backend()
+        await backend.hset("pending", 1, {"user_id": 7})
+        first, second = await asyncio.gather(backend.hdel("pending", 1), backend.hdel("pending", 1))
+        assert [first, second].count(None) == 1
+        assert {"user_id": 7} in (first, second)
+        await backend.close()
+    run(scenario())
+
+
+def test_hclear_and_namespaces(redis_backend):
+    async def scenario():
+        ours, theirs = redis_backend("ours"), redis_backend("theirs")
+        await ours.hset("progress:1:2", "a", {"count": 1})
+        await theirs.hset("progress:1:2", "a", {"count": 2})
+        await ours.hclear("progress:1:2")
+
+        assert await ours.hgetall("progress:1:2") == {}
+        assert await theirs.hgetall("progress:1:2") == {"a": {"count": 2}}
+        await ours.close()
+        await theirs.close()
+    run(scenario())
+
+
+def test_only_one_frontend_clears_a_finished_request(redis_backend):
+    async def scenario():
+        frontends = [Coordinator(redis_backend(), worker_id=name) for name in ("a", "b", "c")]
+        await frontends[0].add_progress("1:2", "inline-1", {"count": 2})
+        claims = await asyncio.gather(*(f.clear_progress("1:2") for f in frontends))
+        assert sorted(claims) == [False, False, True]
+        for frontend in frontends:
+            await frontend.close()
+    run(scenario())
+
+
+def test_values_and_counters(redis_backend):
+    async def scenario():
+        backend = redis_backend()
+        await backend.set("cache:breaker", {"state": "open"}, ttl=30)
+        assert await backend.get("cache:breaker") == {"state": "open"}
+        assert await backend.get("cache:missing") is None
+
+        assert await backend.incr("usage:1", ttl=60) == 1
+        assert await backend.incr("usage:1", amount=2, ttl=60) == 3
+        assert await backend.incr("usage:1", amount=-1) == 2
+        assert 0 < await backend.client.ttl(backend._key("usage:1")) <= 60
+        await backend.close()
+    run(scenario())
+
+
+def test_queue_is_fifo_and_pop_times_out(redis_backend):
+    async def scenario():
+        backend = redis_backend()
+        for n in range(3):
+            await backend.push("results", {"n": n})
+        assert [(await backend.pop("results", timeout=1))["n"] for _ in range(3)] == [0, 1, 2]
+        assert await backend.pop("results", timeout=0.1) is None
+        await backend.close()
+    run(scenario())
+
+
+def test_pop_wakes_up_on_push_from_another_replica(redis_backend):
+    async def scenario():
+        consumer, producer = redis_backend(), redis_backend()
+        waiter = asyncio.create_task(consumer.pop("results", timeout=5))
+        await asyncio.sleep(0.05)
+        await producer.push("results", {"kind": "result"})
+        assert await asyncio.wait_for(waiter, 5) == {"kind": "result"}
+        await consumer.close()
+        await producer.close()
+    run(scenario())
+
+
+def test_job_to_result_round_trip(redis_backend):
+    async def scenario():
+        frontend = Coordinator(redis_backend(), worker_id="frontend-1")
+        upstream = Coordinator(redis_backend(), worker_id="upstream-1")
+
+        job_id = await frontend.submit_job({"user_id": 7, "original_link": "https://a.example/x"})
+        job = await upstream.next_job(timeout=1)
+        assert job["job_id"] == job_id
+        assert (await upstream.backend.hget("inflight_jobs", job_id))["claimed_by"] == "upstream-1"
+
+        await upstream.add_pending(1001, dict(job, bot="DD_Bypass_Bot"))
+        await upstream.finish_job(job_id)
+        assert await upstream.backend.hget("inflight_jobs", job_id) is None
+
+        req = await upstream.pop_pending(1001)
+        assert req["worker"] == "upstream-1"
+        await upstream.publish_result(dict(req, kind="result", pairs=[["https://a.example/x", "https://b.example/y"]]))
+
+        result = await frontend.next_result(timeout=1)
+        assert result["kind"] == "result"
+        assert result["job_id"] == job_id
+        assert result["pairs"] == [["https://a.example/x", "https://b.example/y"]]
+        await frontend.close()
+        await upstream.close()
+    run(scenario())
+
+
+def test_recover_jobs_only_requeues_own_claims(redis_backend):
+    async def scenario():
+        frontend = Coordinator(redis_backend(), worker_id="frontend-1")
+        mine = Coordinator(redis_backend(), worker_id="upstream-1")
+        other = Coordinator(redis_backend(), worker_id="upstream-2")
+        await other.heartbeat()
+
+        first = await frontend.submit_job({"n": 1})
+        second = await frontend.submit_job({"n": 2})
+        assert (await mine.next_job(timeout=1))["job_id"] == first
+        assert (await other.next_job(timeout=1))["job_id"] == second
+
+        requeued = await mine.recover_jobs()
+        assert [job["job_id"] for job in requeued] == [first]
+        assert (await other.next_job(timeout=1))["job_id"] == first
+        for coordinator in (frontend, mine, other):
+            await coordinator.close()
+    run(scenario())
+
+
+def test_shared_quota(redis_backend):
+    async def scenario():
+        a = Coordinator(redis_backend(), worker_id="a")
+        b = Coordinator(redis_backend(), worker_id="b")
+        assert await a.get_usage(7) == 0
+        await a.incr_usage(7)
+        await b.incr_usage(7)
+        assert await b.get_usage(7) == 2
+        await a.close()
+        await b.close()
+    run(scenario())
+
+
+def test_refunds_never_go_below_zero(redis_backend):
+    async def scenario():
+        coordinator = Coordinator(redis_backend(), worker_id="a")
+        assert await coordinator.incr_usage(7) == 1
+        assert await coordinator.incr_usage(7) == 2
+        assert await coordinator.refund_usage(7) == 1
+        assert await coordinator.refund_usage(7) == 0
+        assert await coordinator.refund_usage(7) == 0
+        assert await coordinator.get_usage(7) == 0
+        await coordinator.close()
+    run(scenario())
+
+
+def test_memory_backend_recovers_entries_of_a_renamed_worker(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "inflight.json")
+        before = Coordinator(coordination.MemoryBackend(persist_path=path), worker_id="old-hostname")
+        await before.add_pending(1001, {"user_id": 7, "time_sent": 0})
+        await before.close()
+
+        after = Coordinator(coordination.MemoryBackend(persist_path=path), worker_id="new-hostname")
+        assert list(await after.pending_requests()) == [1001]
+        assert await after.orphaned_requests() == {}
+    run(scenario())
+
+
+def test_orphans_are_requests_of_workers_without_heartbeat(redis_backend):
+    async def scenario():
+        alive = Coordinator(redis_backend(), worker_id="upstream-1")
+        gone = Coordinator(redis_backend(), worker_id="upstream-2")
+        me = Coordinator(redis_backend(), worker_id="upstream-3")
+        await alive.heartbeat()
+        await alive.add_pending(1, {"user_id": 7})
+        await gone.add_pending(2, {"user_id": 8})
+        await me.add_pending(3, {"user_id": 9})
+
+        assert list(await me.pending_requests()) == [3]
+        assert list(await me.orphaned_requests()) == [2]
+        for coordinator in (alive, gone, me):
+            await coordinator.close()
+    run(scenario())
+
+
+def test_recover_jobs_takes_over_claims_of_dead_workers(redis_backend):
+    async def scenario():
+        frontend = Coordinator(redis_backend(), worker_id="frontend-1")
+        dead = Coordinator(redis_backend(), worker_id="upstream-old")
+        me = Coordinator(redis_backend(), worker_id="upstream-new")
+
+        job_id = await frontend.submit_job({"n": 1})
+        assert (await dead.next_job(timeout=1))["job_id"] == job_id
+        assert [job["job_id"] for job in await me.recover_jobs()] == [job_id]
+        for coordinator in (frontend, dead, me):
+            await coordinator.close()
+    run(scenario())
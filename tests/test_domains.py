@@ -0,0 +1,61 @@
+# tests/test_domains.py
+import json
+from plugins.domains import DomainClassifier
+
+
+def write_table(path, table):
+    path.write_text(json.dumps(table), encoding="utf-8")
+
+
+def test_bad_entries_are_skipped(tmp_path):
+    path = tmp_path / "domains.json"
+    write_table(path, {
+        "pixeldrain.com": {"type": "Download Link", "emoji": "💧"},
+        "broken.example": "blocked",
+        "odd.example": {"policy": "sometimes"},
+        "routed.example": {"route": "upstream"},
+        "shrinkme.io": {"policy": "blocked"},
+    })
+    classifier = DomainClassifier(str(path), reload_interval=0)
+
+    assert classifier.classify("https://pixeldrain.com/u/abc").type == "Download Link"
+    assert classifier.classify("https://shrinkme.io/x").blocked
+    assert classifier.classify("https://broken.example/x").policy is None
+    assert classifier.classify("https://odd.example/x").policy is None
+    assert classifier.classify("https://routed.example/x").route is None
+    assert classifier.classify("https://bit.ly/x").native
+
+
+def test_unusable_table_keeps_the_previous_one(tmp_path, monkeypatch):
+    path = tmp_path / "domains.json"
+    write_table(path, {"shrinkme.io": {"policy": "blocked"}})
+    classifier = DomainClassifier(str(path), reload_interval=0)
+    assert classifier.classify("https://shrinkme.io/x").blocked
+
+    write_table(path, ["shrinkme.io"])
+    assert classifier.reload() is None
+    assert classifier.classify("https://shrinkme.io/x").blocked
+
+    def broken(table):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(DomainClassifier, "_build", staticmethod(broken))
+    write_table(path, {"other.example": {"policy": "blocked"}})
+    assert classifier.reload() is None
+    assert classifier.classify("https://shrinkme.io/x").blocked
+    assert not classifier.classify("https://other.example/x").blocked
+
+
+def test_a_deeper_host_wins_over_a_path_entry_of_its_parent(tmp_path):
+    path = tmp_path / "domains.json"
+    write_table(path, {
+        "example.com/go": {"policy": "blocked"},
+        "cdn.example.com": {"type": "CDN", "emoji": "📦"},
+        "cdn.example.com/go/private": {"policy": "skip"},
+    })
+    classifier = DomainClassifier(str(path), reload_interval=0)
+
+    assert classifier.classify("https://cdn.example.com/go/file").type == "CDN"
+    assert classifier.classify("https://cdn.example.com/go/private/x").policy == "skip"
+    assert classifier.classify("https://example.com/go/file").blocked
+    assert classifier.classify("https://www.example.com/go/file").blocked
+    assert classifier.classify("https://example.com/other").policy is None
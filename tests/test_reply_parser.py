@@ -0,0 +1,27 @@
+# tests/test_reply_parser.py
+from plugins.bypass_handler import DDReplyParser
+
+parser = DDReplyParser()
+
+
+def test_progress_reply_echoing_an_error_link_is_progress():
+    text = "⏳ Bypassing your link...\n\nhttps://site.example/error-page?invalid=1&status=failed"
+    assert parser.is_progress(text)
+    assert parser.final_kind(text) is None
+
+
+def test_failure_header_is_a_failure():
+    for text in (
+        "❌ Bypass Failed\n\nhttps://gplinks.co/abc",
+        "**❌ Bypass Failed**\nThis link is not supported.",
+        "Bypassing...\n❌ Bypass Failed",
+    ):
+        assert parser.final_kind(text) == "failed"
+        assert not parser.is_progress(text)
+
+
+def test_failure_words_outside_the_header_are_not_a_failure():
+    assert parser.final_kind("Unable to reach https://a.example/x, retrying") is None
+    assert parser.final_kind("See https://a.example/❌-Bypass-Failed") is None
+    single = "┎ 🔗 Original Link:- https://a.example/error\n┖ 🔓 Bypassed Link:- https://b.example/failed"
+    assert parser.final_kind(single) == "single"
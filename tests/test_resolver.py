@@ -0,0 +1,149 @@
+# tests/test_resolver.py
+import json
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from conftest import run
+
+from plugins import resolver as resolver_module
+from plugins import resolver_chain as chain_module
+from plugins.domains import DomainClassifier
+from plugins.resolver import RedirectResolver, Deferral
+from plugins.resolver_chain import ResolverChain, Resolver, UpstreamResolver
+
+
+@pytest.fixture(autouse=True)
+def local_table(tmp_path, monkeypatch):
+    """Everything runs on 127.0.0.1, so the domain table tells the sites apart by path"""
+    path = tmp_path / "domains.json"
+    path.write_text(json.dumps({
+        "127.0.0.1/short": {"resolver": "native"},
+        "127.0.0.1/file": {"type": "Download Link", "emoji": "🔗"},
+    }), encoding="utf-8")
+    classifier = DomainClassifier(str(path), reload_interval=0)
+    monkeypatch.setattr(resolver_module, "domain_classifier", classifier)
+    monkeypatch.setattr(chain_module, "domain_classifier", classifier)
+
+
+def redirect(location):
+    async def handler(request):
+        raise web.HTTPFound(location)
+    return handler
+
+
+def make_app():
+    async def chain(request):
+        left = int(request.match_info["n"])
+        raise web.HTTPFound(f"/short/chain/{left - 1}" if left > 1 else "/file/deep")
+
+    async def slow(request):
+        await asyncio.sleep(5)
+        raise web.HTTPFound("/file/late")
+
+    async def no_head(request):
+        if request.method == "HEAD":
+            raise web.HTTPMethodNotAllowed("HEAD", ["GET"])
+        raise web.HTTPFound("/file/got")
+
+    async def page(request):
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_route("*", "/short/a", redirect("/short/b"))
+    app.router.add_route("*", "/short/b", redirect("/file/x"))
+    app.router.add_route("*", "/short/loop1", redirect("/short/loop2"))
+    app.router.add_route("*", "/short/loop2", redirect("/short/loop1"))
+    app.router.add_route("*", "/short/chain/{n}", chain)
+    app.router.add_route("*", "/short/ad", redirect("/ads/gate?id=7"))
+    app.router.add_route("*", "/short/interstitial", redirect("/short/page"))
+    app.router.add_route("*", "/short/page", page)
+    app.router.add_route("*", "/short/plain", page)
+    app.router.add_route("*", "/short/slow", slow)
+    app.router.add_route("*", "/short/nohead", no_head)
+    app.router.add_route("*", "/short/missing", redirect("mailto:someone@example.com"))
+    return app
+
+
+def with_server(check, **options):
+    async def scenario():
+        resolver = RedirectResolver(**dict({"max_hops": 5, "timeout": 2}, **options))
+        async with TestServer(make_app()) as server:
+            try:
+                await check(resolver, lambda path: str(server.make_url(path)))
+            finally:
+                await resolver.close()
+    run(scenario())
+
+
+def test_follows_a_chain_to_its_destination():
+    async def check(resolver, url):
+        assert await resolver.resolve(url("/short/a")) == url("/file/x")
+        assert await resolver.resolve(url("/short/nohead")) == url("/file/got")
+    with_server(check)
+
+
+def test_loops_and_too_many_hops_go_to_the_bypass_bot():
+    async def check(resolver, url):
+        assert await resolver.resolve(url("/short/loop1")) is None
+        assert await resolver.resolve(url("/short/chain/5")) == url("/file/deep")
+        assert await resolver.resolve(url("/short/chain/6")) is None
+    with_server(check, max_hops=5)
+
+
+def test_leaving_the_shorteners_for_an_unknown_site_is_deferred():
+    async def check(resolver, url):
+        ad = await resolver.resolve(url("/short/ad"))
+        assert isinstance(ad, Deferral) and ad.url == url("/ads/gate?id=7")
+        page = await resolver.resolve(url("/short/interstitial"))
+        assert isinstance(page, Deferral) and page.url == url("/short/page")
+    with_server(check)
+
+
+def test_non_redirects_and_bad_targets_are_left_alone():
+    async def check(resolver, url):
+        assert await resolver.resolve(url("/short/plain")) is None
+        assert await resolver.resolve(url("/short/missing")) is None
+    with_server(check)
+
+
+def test_a_slow_shortener_times_out():
+    async def check(resolver, url):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert await resolver.resolve(url("/short/slow")) is None
+        assert loop.time() - started < 2
+    with_server(check, timeout=0.3)
+
+
+def test_the_chain_sends_the_resolved_hop_upstream():
+    async def check(redirects, url):
+        class Native(Resolver):
+            name = "native"
+            capabilities = frozenset({"redirect"})
+
+            async def resolve(self, link):
+                return await redirects.resolve(link)
+
+        upstream = UpstreamResolver("stand_in_bot")
+        chain = ResolverChain([Native(), upstream])
+
+        assert await chain.resolve(url("/short/a")) == (url("/file/x"), None, url("/short/a"))
+        assert await chain.resolve(url("/short/ad")) == (None, upstream, url("/ads/gate?id=7"))
+        resolved, deferred = await chain.resolve_many([url("/short/a"), url("/short/ad"), url("/short/plain")])
+        assert resolved == {url("/short/a"): url("/file/x")}
+        assert deferred == [(url("/short/ad"), url("/ads/gate?id=7")), (url("/short/plain"), url("/short/plain"))]
+    with_server(check)
+
+
+def test_bypass_bots_are_ranked_per_host_and_tried_ones_left_out():
+    chain = ResolverChain([UpstreamResolver("first_bot"), UpstreamResolver("second_bot")])
+    urls = ["https://gplinks.co/abc"]
+    assert chain.rank_upstream(urls) == ["first_bot", "second_bot"]
+
+    for _ in range(5):
+        chain.record_upstream("first_bot", urls, False, 10)
+    assert chain.rank_upstream(urls) == ["second_bot", "first_bot"]
+    assert chain.rank_upstream(["https://other.example/x"]) == ["first_bot", "second_bot"]
+    assert chain.rank_upstream(urls, tried=["second_bot"]) == ["first_bot"]
+    assert chain.rank_upstream(urls, tried=["first_bot", "second_bot"]) == []
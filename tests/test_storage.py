@@ -0,0 +1,225 @@
+# tests/test_storage.py
+import json
+import time
+import sqlite3
+import pytest
+
+from database.storage import CachedStorage
+from database.json_store import JSONStorage
+from database.sqlite_store import SQLiteStore
+
+DAY = "2026-01-02"
+
+
+def json_store(tmp_path):
+    return JSONStorage(str(tmp_path / "user_data.json"))
+
+
+def sqlite_store(tmp_path):
+    return SQLiteStore(str(tmp_path / "users.db"))
+
+
+def cached_sqlite_store(tmp_path):
+    return CachedStorage(SQLiteStore(str(tmp_path / "users.db")), ttl=300, max_size=100)
+
+
+@pytest.fixture(params=[json_store, sqlite_store, cached_sqlite_store], ids=["json", "sqlite", "cached-sqlite"])
+def store(request, tmp_path):
+    """Every engine the bot can run on, opened on an empty file"""
+    storage = request.param(tmp_path)
+    storage.open()
+    yield storage
+    storage.close()
+
+
+def all_users(store, limit):
+    users, cursor = [], None
+    while True:
+        page, cursor = store.page_users(cursor, limit)
+        users.extend(page)
+        if cursor is None:
+            return users
+
+
+def test_users_are_added_once_and_paged_in_full(store):
+    assert store.count_users() == 0
+    assert store.add_user(1) is True
+    assert store.add_user("1") is False
+    for uid in range(2, 8):
+        store.add_user(uid)
+
+    assert store.count_users() == 7
+    assert sorted(all_users(store, 3)) == [str(uid) for uid in range(1, 8)]
+    assert sorted(all_users(store, 7)) == [str(uid) for uid in range(1, 8)]
+
+
+def test_premium_expiry_and_removal(store):
+    assert store.is_premium(5) is False
+    assert store.get_premium_expiry(5) is None
+
+    store.set_premium_expiry(5, 1000.0)
+    store.set_premium_expiry(6, 3000.0)
+    assert store.is_premium("5") is True
+    assert store.get_premium_expiry(5) == 1000.0
+    assert store.count_premium() == 2
+
+    store.set_premium_expiry(5, 2000.0)
+    assert store.get_premium_expiry(5) == 2000.0
+    assert store.count_premium() == 2
+    assert sorted(store.expired_premium(2500.0)) == ["5"]
+
+    assert store.remove_premium(5) is True
+    assert store.remove_premium(5) is False
+    assert store.is_premium(5) is False
+    assert store.count_premium() == 1
+
+
+def test_premium_without_expiry_never_expires(store):
+    store.set_premium_expiry(9, None)
+    assert store.is_premium(9) is True
+    assert store.get_premium_expiry(9) is None
+    assert store.count_premium() == 1
+    assert store.expired_premium(float("inf")) == []
+
+
+def test_bans(store):
+    assert store.is_banned(3) is False
+    assert store.ban(3) is True
+    assert store.ban(3) is False
+    assert store.is_banned("3") is True
+    assert store.count_banned() == 1
+    assert store.unban(3) is True
+    assert store.unban(3) is False
+    assert store.is_banned(3) is False
+    assert store.count_banned() == 0
+
+
+def test_daily_usage(store):
+    assert store.get_usage(4, DAY) == 0
+    assert store.incr_usage(4, DAY) == 1
+    assert store.incr_usage(4, DAY) == 2
+    assert store.get_usage(4, DAY) == 2
+
+    store.set_usage(4, "2026-01-01", 3)
+    assert store.get_usage(4, "2026-01-01") == 3
+    assert store.prune_usage(DAY) == 1
+    assert store.get_usage(4, DAY) == 2
+
+
+def test_meta_and_cursors(store):
+    assert store.get_meta("admin_id") is None
+    assert store.is_empty() is (store.name != "json")
+
+    store.set_meta("admin_id", "42")
+    assert store.get_meta("admin_id") == "42"
+    assert store.is_empty() is False
+
+    assert store.get_cursor("broadcast") is None
+    store.set_cursor("broadcast", {"offset": "17", "sent": 3})
+    assert store.get_cursor("broadcast") == {"offset": "17", "sent": 3}
+
+
+def test_batch_groups_writes(store):
+    with store.batch():
+        store.add_user(1)
+        store.ban(1)
+        store.incr_usage(1, DAY)
+    assert store.count_users() == 1
+    assert store.is_banned(1) is True
+    assert store.get_usage(1, DAY) == 1
+
+
+def test_json_batch_writes_the_file_once(tmp_path, monkeypatch):
+    from database import json_store as json_module
+    writes = []
+    monkeypatch.setattr(json_module, "write_atomic", lambda path, payload: writes.append(payload))
+    store = json_store(tmp_path)
+    store.open()
+    with store.batch():
+        for uid in range(50):
+            store.add_user(uid)
+        with store.batch():
+            store.ban(1)
+        assert writes == []
+    assert len(writes) == 1
+    assert len(json.loads(writes[0])["total_users"]) == 50
+
+
+def test_import_user_data(store):
+    data = {
+        "total_users": [1, "2"],
+        "premium_users": ["2", 3, "4"],
+        # User 4 is premium with no expiry entry: premium with no end date
+        "premium_expiry": {"2": 5000, "3": "100.5"},
+        "banned_users": [1],
+        "daily_usage": {"5": {DAY: 2}},
+        "admin_id": "42",
+    }
+    assert store.import_user_data(data) == 5
+
+    assert sorted(all_users(store, 2)) == ["1", "2", "3", "4", "5"]
+    assert store.count_users() == 5
+    assert store.count_premium() == 3
+    assert store.get_premium_expiry(2) == 5000.0
+    assert store.get_premium_expiry(3) == 100.5
+    assert store.is_premium(4) is True
+    assert store.get_premium_expiry(4) is None
+    assert sorted(store.expired_premium(1000.0)) == ["3"]
+    assert store.is_banned(1) is True
+    assert store.get_usage(5, DAY) == 2
+    assert store.get_meta("admin_id") == "42"
+
+
+def test_sqlite_file_with_not_null_expiry_is_migrated(tmp_path):
+    path = str(tmp_path / "users.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE premium (user_id TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+    conn.execute("INSERT INTO premium VALUES ('1', 1000.0)")
+    conn.commit()
+    conn.close()
+
+    store = SQLiteStore(path)
+    store.open()
+    assert store.get_premium_expiry(1) == 1000.0
+    store.set_premium_expiry(2, None)
+    assert store.is_premium(2) is True
+    assert store.expired_premium(2000.0) == ["1"]
+    store.close()
+
+
+# Generous per-call ceilings for the hot paths: they catch an engine that scans
+# the userbase or rewrites it per lookup, not a slow disk
+READ_BUDGET = 0.002
+WRITE_BUDGET = 0.05
+
+
+def test_hot_paths_stay_within_budget(store):
+    users = [str(1_000_000 + n) for n in range(5000)]
+    store.import_user_data({
+        "total_users": users,
+        "premium_users": users[::20],
+        "premium_expiry": {uid: 5000.0 for uid in users[::20]},
+        "banned_users": users[::100],
+        "daily_usage": {uid: {DAY: 1} for uid in users[::10]},
+    })
+    active = users[::25]
+
+    started = time.perf_counter()
+    for uid in active:
+        store.is_banned(uid)
+        store.is_premium(uid)
+        store.get_usage(uid, DAY)
+    reads = (time.perf_counter() - started) / (3 * len(active))
+
+    started = time.perf_counter()
+    for uid in active[:20]:
+        store.incr_usage(uid, DAY)
+    writes = (time.perf_counter() - started) / 20
+
+    started = time.perf_counter()
+    assert len(all_users(store, 1000)) == len(users)
+    page_through = time.perf_counter() - started
+
+    assert reads < READ_BUDGET, f"{store.name}: {reads * 1e6:.0f}us per lookup"
+    assert writes < WRITE_BUDGET, f"{store.name}: {writes * 1e3:.1f}ms per quota increment"
+    assert page_through < 1.0, f"{store.name}: {page_through:.2f}s to page through {len(users)} users"
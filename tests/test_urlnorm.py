@@ -0,0 +1,21 @@
+# tests/test_urlnorm.py
+from plugins.urlnorm import canonicalize, url_key, dedupe, find_urls
+
+
+def test_dedupe_keeps_the_sender_spelling():
+    text = "/by https://mega.nz/file/AbC#Key, https://x.example/a?xyz&b=1+2&utm_source=tg."
+    assert dedupe(find_urls(text)) == [
+        "https://mega.nz/file/AbC#Key",
+        "https://x.example/a?xyz&b=1+2&utm_source=tg",
+    ]
+
+
+def test_dedupe_drops_repeats_by_key():
+    urls = ["[a](https://Bit.ly/Abc)", "https://bit.ly:443/Abc?utm_source=x", "https://bit.ly/abc", "ftp://bit.ly/Abc"]
+    assert dedupe(urls) == ["https://Bit.ly/Abc", "https://bit.ly/abc"]
+
+
+def test_keys_ignore_spelling_differences():
+    assert url_key("HTTPS://Bit.LY/%41bc#top") == url_key("http://bit.ly/Abc?fbclid=1")
+    assert canonicalize("https://Bit.LY/%41bc?fbclid=1#top") == "https://bit.ly/Abc"
+    assert url_key("mailto:someone@example.com") is None